@@ -1,7 +1,39 @@
 from django.contrib import admin
-from .models import Product, Supplier, ReorderAlert
+from .models import (
+    Product, Supplier, ReorderAlert, StockMovement, DemandStats,
+    Job, PurchaseOrder, PurchaseOrderLine,
+)
 
 admin.site.register(Product)
 admin.site.register(Supplier)
 admin.site.register(ReorderAlert)
 
+admin.site.register(StockMovement)
+admin.site.register(DemandStats)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress", "attempts", "run_after", "started_at", "finished_at", "worker")
+    list_filter = ("status", "kind")
+    readonly_fields = ("progress_done", "progress_total", "attempts", "worker", "message",
+                       "created_at", "started_at", "heartbeat_at", "finished_at")
+
+    @admin.display(description="Progress")
+    def progress(self, job):
+        if job.progress_total:
+            return f"{job.percent()}% ({job.progress_done}/{job.progress_total})"
+        return f"{job.percent()}%"
+
+
+class PurchaseOrderLineInline(admin.TabularInline):
+    model = PurchaseOrderLine
+    raw_id_fields = ("product",)
+    extra = 0
+
+
+@admin.register(PurchaseOrder)
+class PurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = ("id", "supplier", "status", "total_units", "total_cost", "created_at")
+    list_filter = ("status",)
+    inlines = [PurchaseOrderLineInline]
@@ -1,53 +1,142 @@
 import math
+from functools import total_ordering
 from typing import Optional
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, key_sort falls back to sorted()
+    np = None
 
-def merge_sort(product_list, field):
-    # base case
-    if len(product_list) <= 1:
-        return product_list
-
-    midpoint = len(product_list) // 2
 
-    left_half = merge_sort(product_list[:midpoint], field)
-    right_half = merge_sort(product_list[midpoint:], field)
+# one key function per sort/search field. built once at import so sorting
+# doesn't rebuild the lookup table on every comparison
+FIELD_KEYS = {
+    "sku": lambda o: o.sku.lower(),
+    "name": lambda o: o.name.lower(),
+    "category": lambda o: o.category.lower(),
+    # products without a supplier sort first, same as the database order
+    "supplier": lambda o: o.supplier.name.lower() if o.supplier else "",
+    "quantity": lambda o: o.quantity,
+    "reorder": lambda o: o.reorder_level,
+    "price": lambda o: o.unit_price,
+    "contact_person": lambda o: o.contact_person.lower()
+}
 
-    return merge_lists(left_half, right_half, field)
+# fields whose keys are plain numbers, these can go through numpy argsort
+NUMERIC_FIELDS = {"quantity", "reorder", "price"}
 
 
 def get_field_value(obj, field):
-    # Product fields
-
-    field_map = {
-        "sku": lambda o: o.sku.lower(),
-        "name": lambda o: o.name.lower(),
-        "category": lambda o: o.category.lower(),
-        "supplier": lambda o: o.supplier.name.lower(),
-        "quantity": lambda o: o.quantity,
-        "reorder": lambda o: o.reorder_level,
-        "price": lambda o: o.unit_price,
-        "contact_person": lambda o: o.contact_person.lower()
-    }
-
     # basically If field exists in dictionary, call the stuff
-    if field in field_map:
-        return field_map[field](obj)
+    key = FIELD_KEYS.get(field)
+    if key is not None:
+        return key(obj)
 
     return ""
 
 
+def parse_sort_spec(spec):
+    """
+    "category,-quantity,name" -> [("category", False), ("quantity", True), ("name", False)]
+
+    A leading "-" sorts that field descending. Unknown and repeated fields
+    are dropped, so "" or "bogus" gives [] (keep the original order).
+    """
+    fields = []
+    seen = set()
+    for part in (spec or "").split(","):
+        part = part.strip()
+        descending = part.startswith("-")
+        name = part.lstrip("-").strip()
+        if name in FIELD_KEYS and name not in seen:
+            seen.add(name)
+            fields.append((name, descending))
+    return fields
+
+
+@total_ordering
+class Descending:
+    """Sort key wrapper that compares the other way round (for text fields)."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
 
 
-def merge_lists(left_list, right_list, field):
+def descending_key(field):
+    key = FIELD_KEYS[field]
+    if field in NUMERIC_FIELDS:
+        return lambda o: -key(o)
+    return lambda o: Descending(key(o))
+
+
+def extract_keys(items, field):
+    """
+    Decorate step: pull the sort key out of every row exactly once.
+
+    field is a single field or a sort spec ("category,-quantity,name", see
+    parse_sort_spec). Several fields give one tuple per row so the sort
+    compares them all in a single pass, descending fields compare reversed.
+    Unknown fields give "" for every row (same as get_field_value), so the
+    original order is kept.
+    Complexity: O(n * fields)
+    """
+    spec = parse_sort_spec(field)
+    if not spec:
+        return [""] * len(items)
+    keys = [descending_key(name) if descending else FIELD_KEYS[name] for name, descending in spec]
+    if len(keys) == 1:
+        return [keys[0](o) for o in items]
+    return [tuple(key(o) for key in keys) for o in items]
+
+
+def merge_sort(product_list, field):
+    """
+    Stable merge sort of product_list by field, or by a sort spec like
+    "category,-quantity,name".
+
+    Keys are extracted once up front (decorate-sort-undecorate), the merge
+    only compares the cached keys.
+    Complexity: O(n log n) comparisons, O(n) key extractions
+    """
+    if len(product_list) <= 1:
+        return list(product_list)
+
+    keys = extract_keys(product_list, field)
+    order = _merge_sort_indices(keys, list(range(len(product_list))))
+    return [product_list[i] for i in order]
+
+
+def _merge_sort_indices(keys, indices):
+    # base case
+    if len(indices) <= 1:
+        return indices
+
+    midpoint = len(indices) // 2
+
+    left_half = _merge_sort_indices(keys, indices[:midpoint])
+    right_half = _merge_sort_indices(keys, indices[midpoint:])
+
+    return merge_lists(left_half, right_half, keys)
+
+
+def merge_lists(left_list, right_list, keys):
     merged_list = []
 
     left_index = 0
     right_index = 0
 
     while left_index < len(left_list) and right_index < len(right_list):
-        left_value = get_field_value(left_list[left_index], field)
-        right_value = get_field_value(right_list[right_index], field)
+        left_value = keys[left_list[left_index]]
+        right_value = keys[right_list[right_index]]
 
+        # <= keeps equal keys in their original order (stable)
         if left_value <= right_value:
             merged_list.append(left_list[left_index])
             left_index += 1
@@ -56,16 +145,43 @@ def merge_lists(left_list, right_list, field):
             right_index += 1
 
     # add any remaining items
-    while left_index < len(left_list):
-        merged_list.append(left_list[left_index])
-        left_index += 1
-
-    while right_index < len(right_list):
-        merged_list.append(right_list[right_index])
-        right_index += 1
+    merged_list.extend(left_list[left_index:])
+    merged_list.extend(right_list[right_index:])
 
     return merged_list
 
+
+def key_sort(items, field):
+    """
+    Fast path for the same fields and sort specs as merge_sort, same stable
+    result.
+
+    When every field is numeric and numpy is installed the columns go
+    through a stable numpy argsort/lexsort, everything else uses the
+    built-in (Timsort) sort on the cached (composite) keys.
+    Complexity: O(n log n)
+    """
+    items = list(items)
+    spec = parse_sort_spec(field)
+
+    if np is not None and spec and items and all(name in NUMERIC_FIELDS for name, _ in spec):
+        columns = [
+            np.asarray([float(FIELD_KEYS[name](o)) for o in items], dtype=np.float64)
+            * (-1.0 if descending else 1.0)
+            for name, descending in spec
+        ]
+        if len(columns) == 1:
+            order = np.argsort(columns[0], kind="stable")
+        else:
+            # lexsort's last key is the primary one
+            order = np.lexsort(columns[::-1])
+        return [items[i] for i in order.tolist()]
+
+    keys = extract_keys(items, field)
+    order = sorted(range(len(items)), key=keys.__getitem__)
+    return [items[i] for i in order]
+
+
 def binary_search(sorted_list, target, field):
     left = 0
     right = len(sorted_list) - 1
@@ -153,3 +269,28 @@ def reorder_point(lead_time: Optional[float],
         return lt * avg + ss
     except Exception:
         return ss
+
+
+def welford_merge(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """
+    Combine two running (count, mean, M2) summaries into one (Chan et al.).
+    Adding one value x is welford_merge(n, mean, m2, 1, x, 0); adding k days
+    of zero demand is welford_merge(n, mean, m2, k, 0, 0).
+
+    variance = M2 / (count - 1)
+    Complexity: O(1)
+    """
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return n, mean, m2
+
+
+def sample_std(n, m2) -> float:
+    # standard deviation from a Welford summary, 0.0 until there are 2 values
+    if n < 2 or m2 <= 0:
+        return 0.0
+    return math.sqrt(m2 / (n - 1))
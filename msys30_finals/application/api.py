@@ -0,0 +1,256 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+
+from . import catalog_io, table_versions
+from .models import Product, ReorderAlert, Supplier
+from .pagination import keyset_page, page_links
+from .queries import product_queryset, supplier_queryset
+from .reorder import reorder_alerts
+
+
+# JSON API for scanners and the ERP sync.
+#
+# GET takes the same sort/search_field/search_query/after/before params as
+# the HTML lists, plus ?fields=sku,name,quantity to pick the columns (one
+# .values() query, nothing else is loaded) and ?page_size=. Responses carry
+# an ETag and Last-Modified from the tables' TableVersion rows
+# (table_versions.py), so polling with If-None-Match / If-Modified-Since
+# gets a 304 for one primary key lookup.
+# POST upserts a JSON array through catalog_io, like a file import. The
+# callers are machines, not browsers: writes are csrf_exempt and
+# authenticated by settings.API_TOKEN instead of a session
+# (token_required), so a logged-in browser can't be made to send them.
+
+MAX_PAGE_SIZE = 500
+
+# API field -> ORM path for .values()
+PRODUCT_API_FIELDS = {
+    "id": "id",
+    "sku": "sku",
+    "name": "name",
+    "category": "category",
+    "supplier": "supplier__name",
+    "supplier_id": "supplier_id",
+    "quantity": "quantity",
+    "reorder_level": "reorder_level",
+    "unit_price": "unit_price",
+    "last_updated": "last_updated",
+}
+
+SUPPLIER_API_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "contact_person": "contact_person",
+    "phone": "phone",
+    "email": "email",
+    "address": "address",
+    "lead_time_days": "lead_time_days",
+    "last_updated": "last_updated",
+}
+
+REORDER_API_FIELDS = {
+    "product_id": "product_id",
+    "sku": "product__sku",
+    "name": "product__name",
+    "quantity": "quantity",
+    "safety_stock": "safety_stock",
+    "reorder_point": "reorder_point",
+    "updated_at": "updated_at",
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+# ----------------------------
+# CONDITIONAL GET
+# ----------------------------
+TABLES = {
+    "products": Product,
+    "suppliers": Supplier,
+    "reorder": ReorderAlert,
+}
+
+# what each endpoint's rows are built from, eg. a product row shows its
+# supplier's name so renaming the supplier is a change too
+DEPENDS_ON = {
+    "products": ("products", "suppliers"),
+    "suppliers": ("suppliers",),
+    "reorder": ("reorder", "products"),
+}
+
+
+def versions(request, endpoint):
+    # TableVersion per table, read once per request for both the ETag and
+    # Last-Modified
+    if not hasattr(request, "_api_versions"):
+        request._api_versions = table_versions.read(*TABLES.values())
+    return [(name, request._api_versions[TABLES[name]]) for name in DEPENDS_ON[endpoint]]
+
+
+def etag(request, endpoint):
+    # changed_at too: a restored database can repeat a version number
+    return "-".join(
+        f"{name}.{v.version}.{v.changed_at.timestamp() if v.changed_at else 0}"
+        for name, v in versions(request, endpoint)
+    )
+
+
+def last_modified(request, endpoint):
+    times = [v.changed_at for _, v in versions(request, endpoint) if v.changed_at]
+    return max(times) if times else None
+
+
+# ----------------------------
+# READ
+# ----------------------------
+def selected_fields(request, api_fields):
+    names = [f.strip() for f in request.GET.get("fields", "").split(",") if f.strip()]
+    if not names:
+        return list(api_fields)
+    unknown = [f for f in names if f not in api_fields]
+    if unknown:
+        raise BadRequest(f"unknown fields {', '.join(unknown)}; choose from {', '.join(api_fields)}")
+    return names
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get("page_size", settings.INVENTORY_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("page_size must be a whole number")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def project(queryset, api_fields, names):
+    """
+    .values() with just the requested fields plus the pagination key
+    (sort_0, id...). Returns (queryset, output name -> row key).
+    """
+    columns = {name: api_fields[name] for name in names}
+    keys = [name.lstrip("-") for name in queryset.query.order_by] + ["id"]
+    extra = [key for key in keys if key not in columns.values()]
+    return queryset.values(*columns.values(), *dict.fromkeys(extra)), columns
+
+
+def page_response(request, queryset, api_fields):
+    try:
+        names = selected_fields(request, api_fields)
+        size = page_size(request)
+    except BadRequest as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    queryset, columns = project(queryset, api_fields, names)
+    page = keyset_page(
+        queryset,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+        page_size=size,
+    )
+    links = page_links(request, page)
+    return JsonResponse({
+        "results": [{name: row[key] for name, key in columns.items()} for row in page.rows],
+        "next": links["next_url"],
+        "previous": links["prev_url"],
+    })
+
+
+def list_params(request):
+    return (
+        request.GET.get("sort", "id"),
+        request.GET.get("search_field", "name"),
+        request.GET.get("search_query", "").strip(),
+    )
+
+
+@condition(etag_func=lambda request: etag(request, "products"),
+           last_modified_func=lambda request: last_modified(request, "products"))
+def product_list(request):
+    sort_field, search_field, search_text = list_params(request)
+    return page_response(request, product_queryset(sort_field, search_field, search_text),
+                         PRODUCT_API_FIELDS)
+
+
+@condition(etag_func=lambda request: etag(request, "suppliers"),
+           last_modified_func=lambda request: last_modified(request, "suppliers"))
+def supplier_list(request):
+    sort_field, search_field, search_text = list_params(request)
+    return page_response(request, supplier_queryset(sort_field, search_field, search_text),
+                         SUPPLIER_API_FIELDS)
+
+
+@require_http_methods(["GET", "HEAD"])
+@condition(etag_func=lambda request: etag(request, "reorder"),
+           last_modified_func=lambda request: last_modified(request, "reorder"))
+def reorder(request):
+    return page_response(request, reorder_alerts(), REORDER_API_FIELDS)
+
+
+# ----------------------------
+# WRITE
+# ----------------------------
+def token_required(view):
+    """
+    Let GET/HEAD through, other methods need "Authorization: Bearer
+    <settings.API_TOKEN>". 401 for a missing or wrong token, 403 when no
+    token is configured (writes are off).
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            if not settings.API_TOKEN:
+                return JsonResponse({"error": "API writes are off, set MSYS_API_TOKEN"}, status=403)
+            sent = request.headers.get("Authorization", "")
+            if not constant_time_compare(sent, f"Bearer {settings.API_TOKEN}"):
+                response = JsonResponse({"error": "missing or wrong API token"}, status=401)
+                response["WWW-Authenticate"] = "Bearer"
+                return response
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+def bulk_upsert(request, kind):
+    """
+    POST a JSON array of objects (or {"<kind>": [...]}) with the import
+    columns, products are matched on sku and suppliers on name.
+    """
+    try:
+        rows = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({"error": f"bad JSON: {e}"}, status=400)
+    if isinstance(rows, dict):
+        rows = rows.get(kind)
+    if not isinstance(rows, list):
+        return JsonResponse({"error": f"send a JSON array of {kind}"}, status=400)
+
+    result = catalog_io.IMPORTERS[kind](enumerate(rows, start=1))
+    return JsonResponse({
+        "created": result.created,
+        "updated": result.updated,
+        "errors": [{"row": line, "error": message} for line, message in result.errors],
+    }, status=400 if result.errors and not (result.created or result.updated) else 200)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD", "POST"])
+@token_required
+def products(request):
+    if request.method == "POST":
+        return bulk_upsert(request, "products")
+    return product_list(request)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD", "POST"])
+@token_required
+def suppliers(request):
+    if request.method == "POST":
+        return bulk_upsert(request, "suppliers")
+    return supplier_list(request)
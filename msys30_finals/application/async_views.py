@@ -0,0 +1,138 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+from django.utils import timezone
+
+from . import dashboard_cache, reports
+from .models import Product
+from .pagination import akeyset_page, page_links
+from .queries import product_queryset, supplier_queryset
+from .reorder import reorder_alerts
+from .views import python_product_list, python_supplier_list
+
+
+# Async versions of the read-heavy pages, used in place of the ones in
+# views.py when ASYNC_VIEWS is on (see urls.py). Under an ASGI server
+# (uvicorn msys30_finals.asgi:application) a request waiting on the
+# database doesn't hold a worker thread, so one process can keep many
+# dashboard hits in flight. Templates only get fully loaded lists, nothing
+# in them may touch the database. Streamed pages and reports go through
+# reports.astreaming_page, which sends each chunk as it is read.
+
+
+async def recent_products():
+    return [
+        p async for p in Product.objects.only("sku", "name", "category").order_by("-id")[:10]
+    ]
+
+
+async def dashboard(request):
+    # the cached numbers and the recent list don't depend on each other
+    totals, reorder_count, category_summary, recent = await asyncio.gather(
+        dashboard_cache.atotals(),
+        dashboard_cache.areorder_count(),
+        dashboard_cache.acategory_summary(),
+        recent_products(),
+    )
+    return render(request, "myapp/dashboard.html", {
+        **totals,
+        "reorder_count": reorder_count,
+        "category_summary": category_summary,
+        "recent_products": recent,
+    })
+
+
+async def list_queryset(build, sort_field, selected_field, search_text):
+    # a text search checks (and may rebuild) search_index, which reads the
+    # database synchronously
+    if search_text:
+        return await sync_to_async(build)(sort_field, selected_field, search_text)
+    return build(sort_field)
+
+
+def list_params(request):
+    sort_field = request.GET.get("sort", "name")
+    selected_field = request.GET.get("search_field", "name")
+    search_text = request.GET.get("search_query", "").strip()
+    return sort_field, selected_field, search_text
+
+
+async def list_context(request, name, build, python_fallback):
+    sort_field, selected_field, search_text = list_params(request)
+    context = {
+        "selected_field": selected_field,
+        "sort_field": sort_field,
+        "search_query": search_text,
+    }
+
+    if settings.INVENTORY_QUERY_MODE == "python":
+        context[name] = await sync_to_async(python_fallback)(sort_field, selected_field, search_text)
+    else:
+        page = await akeyset_page(
+            await list_queryset(build, sort_field, selected_field, search_text),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            page_size=settings.INVENTORY_PAGE_SIZE,
+        )
+        context[name] = page.rows
+        context.update(page_links(request, page))
+    return context
+
+
+async def inventory_list(request):
+    if request.GET.get("stream"):
+        # every matching row in one streamed page, no pagination
+        sort_field, selected_field, search_text = list_params(request)
+        return reports.astreaming_page(
+            request, "myapp/inventory_list.html",
+            {"selected_field": selected_field, "sort_field": sort_field, "search_query": search_text},
+            await list_queryset(product_queryset, sort_field, selected_field, search_text),
+            "myapp/partials/product_rows.html",
+        )
+    context = await list_context(request, "products", product_queryset, python_product_list)
+    return render(request, "myapp/inventory_list.html", context)
+
+
+async def supplier_list(request):
+    context = await list_context(request, "suppliers", supplier_queryset, python_supplier_list)
+    return render(request, "myapp/supplier_list.html", context)
+
+
+async def reorder_suggestions(request):
+    if request.GET.get("stream"):
+        return reports.astreaming_page(
+            request, "myapp/reorder_suggestions.html", {},
+            reorder_alerts(), "myapp/partials/reorder_rows.html",
+        )
+    reorder_items = [
+        {
+            "product": alert.product,
+            "quantity": alert.quantity,
+            "safety_stock": alert.safety_stock,
+            "reorder_point": alert.reorder_point,
+        }
+        async for alert in reorder_alerts()
+    ]
+    return render(request, "myapp/reorder_suggestions.html", {
+        "reorder_items": reorder_items
+    })
+
+
+async def inventory_report(request):
+    sort_field, selected_field, search_text = list_params(request)
+    return reports.astreaming_page(
+        request, "myapp/reports/inventory_report.html",
+        {"search_query": search_text, "generated_at": timezone.now()},
+        await list_queryset(product_queryset, sort_field, selected_field, search_text),
+        "myapp/partials/product_rows.html", {"report": True},
+    )
+
+
+async def reorder_report(request):
+    return reports.astreaming_page(
+        request, "myapp/reports/reorder_report.html", {"generated_at": timezone.now()},
+        reorder_alerts().select_related("product__supplier"),
+        "myapp/partials/reorder_rows.html", {"report": True},
+    )
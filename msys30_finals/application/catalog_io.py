@@ -0,0 +1,385 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import dashboard_cache, rollups, table_versions
+from .models import Product, Supplier, StockMovement
+from .reorder import refresh_alerts
+
+
+# Bulk CSV / JSON import and export for products and suppliers.
+#
+# Imports stream the file in batches: rows are validated one by one, bad rows
+# are reported with their line number and skipped, good rows are upserted
+# with one bulk_create(update_conflicts=True) per batch inside a transaction.
+# Exports stream rows straight from .iterator() so the table is never held in
+# memory.
+
+PRODUCT_COLUMNS = ["sku", "name", "category", "supplier", "quantity", "reorder_level", "unit_price"]
+SUPPLIER_COLUMNS = ["name", "contact_person", "phone", "email", "address", "lead_time_days"]
+
+PRODUCT_UPDATE_FIELDS = ["name", "category", "supplier", "quantity", "reorder_level",
+                         "unit_price", "last_updated"]
+SUPPLIER_UPDATE_FIELDS = ["contact_person", "phone", "email", "address", "lead_time_days",
+                          "last_updated"]
+
+
+# largest value of a PositiveIntegerField on every backend
+MAX_WHOLE_NUMBER = 2 ** 31 - 1
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (line number, message)
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def __str__(self):
+        return f"{self.created} created, {self.updated} updated, {self.failed} rejected"
+
+
+# ----------------------------
+# READING
+# ----------------------------
+def iter_json_array(stream, chunk_size=64 * 1024):
+    """
+    Yield the objects of a top-level JSON array one at a time, reading the
+    text stream chunk_size characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = stream.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer.startswith("["):
+                raise RowError("JSON import must be an array of objects")
+            buffer = buffer[1:]
+            started = True
+            continue
+
+        buffer = buffer.lstrip(", \t\r\n")
+        if buffer.startswith("]"):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer.strip():
+                    raise RowError("JSON import ended in the middle of an object")
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield obj
+        buffer = buffer[end:]
+
+
+def read_rows(stream, fmt):
+    """(line number, dict) pairs from a text stream, fmt is "csv" or "json"."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "json":
+        for number, obj in enumerate(iter_json_array(stream), start=1):
+            yield number, obj
+    else:
+        raise ValueError(f"unknown import format {fmt!r}")
+
+
+def guess_format(filename):
+    return "json" if filename.lower().endswith(".json") else "csv"
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def text(row, name, required=False, max_length=None):
+    value = row.get(name)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"{name} is required")
+    if max_length and len(value) > max_length:
+        raise RowError(f"{name} is longer than {max_length} characters")
+    return value
+
+
+def whole_number(row, name, default=None):
+    value = text(row, name)
+    if value == "":
+        if default is None:
+            raise RowError(f"{name} is required")
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise RowError(f"{name} must be a whole number")
+    if number < 0:
+        raise RowError(f"{name} can't be negative")
+    if number > MAX_WHOLE_NUMBER:
+        raise RowError(f"{name} is too large")
+    return number
+
+
+def amount(row, name, field):
+    """
+    A non-negative decimal rounded to `field`'s decimal places, with no
+    more digits than its max_digits (PostgreSQL would reject the batch).
+    """
+    value = text(row, name, required=True)
+    try:
+        number = Decimal(value)
+        if not number.is_finite():
+            raise RowError(f"{name} must be a number")
+        # raises InvalidOperation past the decimal context's precision
+        number = number.quantize(Decimal(1).scaleb(-field.decimal_places))
+    except InvalidOperation:
+        raise RowError(f"{name} must be a number")
+    if number < 0:
+        raise RowError(f"{name} can't be negative")
+    if number.adjusted() >= field.max_digits - field.decimal_places:
+        raise RowError(f"{name} is too large")
+    return number
+
+
+# ----------------------------
+# PRODUCTS
+# ----------------------------
+def product_from_row(row, supplier_ids):
+    if not isinstance(row, dict):
+        raise RowError("row must be an object")
+    supplier_name = text(row, "supplier")
+    supplier_id = None
+    if supplier_name:
+        supplier_id = supplier_ids.get(supplier_name.lower())
+        if supplier_id is None:
+            raise RowError(f"unknown supplier {supplier_name!r}")
+    return Product(
+        sku=text(row, "sku", required=True, max_length=20),
+        name=text(row, "name", required=True, max_length=100),
+        category=text(row, "category", max_length=50),
+        supplier_id=supplier_id,
+        quantity=whole_number(row, "quantity", default=0),
+        reorder_level=whole_number(row, "reorder_level", default=5),
+        unit_price=amount(row, "unit_price", Product._meta.get_field("unit_price")),
+    )
+
+
+def import_products(rows, batch_size=1000):
+    """
+    Upsert products on sku from (line number, dict) rows.
+
+    Suppliers are matched by name (case-insensitive) through a map loaded
+    once. Quantity changes are written to the stock ledger, and the reorder
+    alerts and stock rollups of the touched products are refreshed per batch.
+    """
+    result = ImportResult()
+    supplier_ids = {name.lower(): pk for pk, name in Supplier.objects.values_list("id", "name")}
+
+    for batch in batches(rows, batch_size):
+        products = {}
+        for line, row in batch:
+            try:
+                product = product_from_row(row, supplier_ids)
+            except RowError as e:
+                result.errors.append((line, str(e)))
+                continue
+            # a sku repeated inside one batch: the last row wins
+            products[product.sku] = product
+        if products:
+            save_product_batch(list(products.values()), result)
+
+    # bulk writes skip the model signals
+    dashboard_cache.invalidate(dashboard_cache.TOTALS, dashboard_cache.CATEGORY_SUMMARY)
+    return result
+
+
+def save_product_batch(products, result):
+    skus = [p.sku for p in products]
+    with transaction.atomic():
+        before = {
+            sku: tuple(row)
+            for sku, *row in Product.objects.filter(sku__in=skus).values_list("sku", *rollups.ROW_FIELDS)
+        }
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=["sku"],
+            update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+        ids = dict(Product.objects.filter(sku__in=skus).values_list("sku", "id"))
+
+        now = timezone.now()
+        movements = []
+        for product in products:
+            # old rollup row, quantity is its third field
+            old = before.get(product.sku)
+            change = product.quantity - (old[2] if old else 0)
+            if change:
+                kind = StockMovement.RECEIPT if old is None else StockMovement.ADJUSTMENT
+                movements.append(StockMovement(
+                    product_id=ids[product.sku], kind=kind, quantity=change,
+                    created_at=now, day=timezone.localdate(now),
+                ))
+        StockMovement.objects.bulk_create(movements)
+        refresh_alerts(ids.values())
+        rollups.apply(
+            removed=list(before.values()),
+            added=[rollups.product_row(product) for product in products],
+        )
+        table_versions.bump(Product)
+
+    result.updated += len(before)
+    result.created += len(products) - len(before)
+
+
+# ----------------------------
+# SUPPLIERS
+# ----------------------------
+def supplier_from_row(row):
+    if not isinstance(row, dict):
+        raise RowError("row must be an object")
+    lead_time = text(row, "lead_time_days")
+    return Supplier(
+        name=text(row, "name", required=True, max_length=100),
+        contact_person=text(row, "contact_person", max_length=100),
+        phone=text(row, "phone", max_length=20),
+        email=text(row, "email", max_length=254),
+        address=text(row, "address"),
+        lead_time_days=whole_number(row, "lead_time_days") if lead_time else None,
+    )
+
+
+def import_suppliers(rows, batch_size=1000):
+    """
+    Create or update suppliers, matched by name (case-insensitive).
+    """
+    result = ImportResult()
+    existing = {name.lower(): pk for pk, name in Supplier.objects.values_list("id", "name")}
+
+    for batch in batches(rows, batch_size):
+        to_create = {}
+        to_update = {}
+        for line, row in batch:
+            try:
+                supplier = supplier_from_row(row)
+            except RowError as e:
+                result.errors.append((line, str(e)))
+                continue
+            key = supplier.name.lower()
+            if key in existing:
+                supplier.pk = existing[key]
+                to_update[key] = supplier
+            else:
+                to_create[key] = supplier
+
+        # bulk_update doesn't fill auto_now fields
+        now = timezone.now()
+        for supplier in to_update.values():
+            supplier.last_updated = now
+
+        with transaction.atomic():
+            created = Supplier.objects.bulk_create(list(to_create.values()))
+            Supplier.objects.bulk_update(list(to_update.values()), SUPPLIER_UPDATE_FIELDS)
+            # lead times feed the reorder points of their products
+            refresh_alerts(
+                Product.objects.filter(supplier_id__in=[s.pk for s in to_update.values()])
+                .values_list("id", flat=True)
+            )
+            table_versions.bump(Supplier)
+        for supplier in created:
+            if supplier.pk is not None:
+                existing[supplier.name.lower()] = supplier.pk
+        result.created += len(to_create)
+        result.updated += len(to_update)
+
+    dashboard_cache.invalidate(dashboard_cache.TOTALS)
+    return result
+
+
+IMPORTERS = {
+    "products": import_products,
+    "suppliers": import_suppliers,
+}
+
+
+def import_file(stream, kind, fmt, batch_size=1000):
+    """Import a text stream of `kind` ("products"/"suppliers") in `fmt` ("csv"/"json")."""
+    return IMPORTERS[kind](read_rows(stream, fmt), batch_size=batch_size)
+
+
+def import_upload(uploaded_file, kind, batch_size=1000):
+    # uploaded files are binary, big ones are read from their temp file
+    stream = io.TextIOWrapper(uploaded_file.file, encoding="utf-8-sig", newline="")
+    try:
+        return import_file(stream, kind, guess_format(uploaded_file.name), batch_size)
+    finally:
+        stream.detach()
+
+
+# ----------------------------
+# EXPORT
+# ----------------------------
+EXPORT_QUERIES = {
+    "products": lambda: Product.objects.order_by("id").values_list(
+        "sku", "name", "category", "supplier__name", "quantity", "reorder_level", "unit_price"
+    ),
+    "suppliers": lambda: Supplier.objects.order_by("id").values_list(*SUPPLIER_COLUMNS),
+}
+
+EXPORT_COLUMNS = {
+    "products": PRODUCT_COLUMNS,
+    "suppliers": SUPPLIER_COLUMNS,
+}
+
+
+class Echo:
+    # file-like object for csv.writer that hands each line straight back
+    def write(self, value):
+        return value
+
+
+def export_csv(kind, chunk_size=2000):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS[kind])
+    for row in EXPORT_QUERIES[kind]().iterator(chunk_size=chunk_size):
+        yield writer.writerow(["" if v is None else v for v in row])
+
+
+def export_json(kind, chunk_size=2000):
+    columns = EXPORT_COLUMNS[kind]
+    yield "["
+    separator = ""
+    for row in EXPORT_QUERIES[kind]().iterator(chunk_size=chunk_size):
+        values = [str(v) if isinstance(v, Decimal) else v for v in row]
+        yield separator + json.dumps(dict(zip(columns, values)))
+        separator = ",\n"
+    yield "]\n"
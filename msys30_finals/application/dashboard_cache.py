@@ -0,0 +1,127 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from .db_router import PRIMARY
+from .models import CategoryRollup, Product, Supplier, ReorderAlert
+
+
+# Dashboard numbers, cached until a Product/Supplier/ReorderAlert write
+# invalidates them (see signals.py). The timeout is only a safety net.
+# They are always computed on the primary database, never a read replica
+# (see db_router.py).
+
+KEY_PREFIX = "dashboard:"
+TOTALS = "totals"
+CATEGORY_SUMMARY = "category_summary"
+REORDER_COUNT = "reorder_count"
+
+_MISSING = object()
+_counter_lock = threading.Lock()
+counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def get_cache():
+    return caches[settings.DASHBOARD_CACHE_ALIAS]
+
+
+def count(name):
+    with _counter_lock:
+        counters[name] += 1
+
+
+def cached(name, compute):
+    cache = get_cache()
+    value = cache.get(KEY_PREFIX + name, _MISSING)
+    if value is not _MISSING:
+        count("hits")
+        return value
+    count("misses")
+    value = compute()
+    cache.set(KEY_PREFIX + name, value, settings.DASHBOARD_CACHE_TIMEOUT)
+    return value
+
+
+def totals():
+    return cached(TOTALS, lambda: {
+        "total_products": Product.objects.using(PRIMARY).count(),
+        "supplier_count": Supplier.objects.using(PRIMARY).count(),
+    })
+
+
+def category_summary_rows():
+    # one row per category from the rollup table (rollups.py)
+    return (
+        CategoryRollup.objects.using(PRIMARY)
+        .filter(item_count__gt=0)
+        .values("category", "total_value", total_qty=F("total_quantity"))
+        .order_by("-total_qty", "category")
+    )
+
+
+def category_summary():
+    return cached(CATEGORY_SUMMARY, lambda: list(category_summary_rows()))
+
+
+def reorder_count():
+    return cached(
+        REORDER_COUNT, lambda: ReorderAlert.objects.using(PRIMARY).filter(needs_reorder=True).count()
+    )
+
+
+# async versions for async_views.py, same keys and counters
+
+async def acached(name, compute):
+    cache = get_cache()
+    value = await cache.aget(KEY_PREFIX + name, _MISSING)
+    if value is not _MISSING:
+        count("hits")
+        return value
+    count("misses")
+    value = await compute()
+    await cache.aset(KEY_PREFIX + name, value, settings.DASHBOARD_CACHE_TIMEOUT)
+    return value
+
+
+async def atotals():
+    async def compute():
+        total_products, supplier_count = await asyncio.gather(
+            Product.objects.using(PRIMARY).acount(), Supplier.objects.using(PRIMARY).acount()
+        )
+        return {"total_products": total_products, "supplier_count": supplier_count}
+    return await acached(TOTALS, compute)
+
+
+async def acategory_summary():
+    async def compute():
+        return [row async for row in category_summary_rows()]
+    return await acached(CATEGORY_SUMMARY, compute)
+
+
+async def areorder_count():
+    return await acached(
+        REORDER_COUNT, lambda: ReorderAlert.objects.using(PRIMARY).filter(needs_reorder=True).acount()
+    )
+
+
+def invalidate(*names):
+    """
+    Drop the named entries once the current transaction commits, so a
+    request can't re-cache the old numbers in between.
+    """
+    def delete():
+        get_cache().delete_many([KEY_PREFIX + name for name in names])
+        count("invalidations")
+    transaction.on_commit(delete)
+
+
+def stats():
+    with _counter_lock:
+        snapshot = dict(counters)
+    lookups = snapshot["hits"] + snapshot["misses"]
+    snapshot["hit_ratio"] = round(snapshot["hits"] / lookups, 4) if lookups else None
+    return snapshot
@@ -0,0 +1,69 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+# Read replica routing (settings.READ_REPLICA). Writes always go to
+# "default". Reads go to "replica" only while _read_alias says so, which
+# middleware.ReadReplicaMiddleware sets for GET/HEAD requests to views
+# marked with reads_replica (see urls.py), unless the browser wrote
+# something recently. A contextvar keeps concurrent requests under ASGI
+# apart, and a streamed response keeps reading from where its view did.
+#
+# Anything cached past the request (dashboard_cache, search_index) is
+# filled with .using(PRIMARY), or a lagging replica would serve its old
+# numbers to everyone, the writer pinned to PRIMARY included. row_cache
+# can fill from either: its keys carry the row's last_updated, so a row
+# read from the replica only fills the entry for that older version.
+
+REPLICA = "replica"
+PRIMARY = "default"
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_is_primary():
+    # a test MIRROR points the replica at the default database, reading it
+    # through a second connection would miss the test's open transaction
+    replica, primary = connections[REPLICA].settings_dict, connections[PRIMARY].settings_dict
+    return replica is primary or (replica["NAME"], replica["HOST"]) == (primary["NAME"], primary["HOST"])
+
+
+def use_replica():
+    if not replica_is_primary():
+        _read_alias.set(REPLICA)
+
+
+def use_default():
+    _read_alias.set(None)
+
+
+def reads_replica(view):
+    """Mark a read-only view whose GET/HEAD queries may go to the replica."""
+    view.reads_replica = True
+    return view
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # related rows come from where the object did
+            return instance._state.db
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both databases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema from the primary (refresh_replica / replication)
+        return db != REPLICA
@@ -0,0 +1,189 @@
+import datetime
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .algorithms import sample_std, welford_merge
+from .models import DemandStats, StockMovement
+from .reorder import refresh_alert
+
+
+# Per-SKU daily demand stats. record_movement / record_issues count each
+# issue in O(1), folding a finished day in when a later issue arrives, so
+# between rebuilds they equal rebuild_demand_stats run on the day of the
+# product's last issue. A product whose sales stop is left as of that last
+# issue: its quiet days since only reach mean/std with the nightly
+# rebuild_demand_stats (jobs.nightly_rollup), so its stats lag by up to a
+# day after the rebuild and overstate demand until it runs.
+
+# DemandStats columns written by record_issues / rebuild_demand_stats
+DEMAND_FIELDS = ["days", "mean", "m2", "std", "demand_days", "current_day", "current_demand",
+                 "updated_at"]
+
+
+def add_demand(stats, day, units):
+    """
+    Count `units` of demand on `day` into a DemandStats row (not saved).
+
+    Demand accumulates on current_day. When a later day shows up, the finished
+    day and any empty days in between are folded into mean/m2 in O(1), so
+    history is never rescanned. Late movements (before current_day) are
+    counted on current_day.
+    Returns True if mean/std changed.
+    """
+    if stats.current_day is None:
+        stats.current_day = day
+        stats.current_demand = units
+        return False
+
+    if day <= stats.current_day:
+        stats.current_demand += units
+        return False
+
+    n, mean, m2 = welford_merge(stats.days, stats.mean, stats.m2, 1, stats.current_demand, 0.0)
+    gap = (day - stats.current_day).days - 1
+    if gap > 0:
+        n, mean, m2 = welford_merge(n, mean, m2, gap, 0.0, 0.0)
+
+    stats.days, stats.mean, stats.m2 = n, mean, m2
+    stats.std = sample_std(n, m2)
+    stats.demand_days += stats.current_demand > 0
+    stats.current_day = day
+    stats.current_demand = units
+    return True
+
+
+def record_movement(product, quantity, kind, when=None):
+    """
+    Write a StockMovement to the ledger and, for issues, update the product's
+    demand stats. Does not change Product.quantity.
+    """
+    when = when or timezone.now()
+    with transaction.atomic():
+        movement = StockMovement.objects.create(
+            product=product, kind=kind, quantity=quantity, created_at=when,
+            day=timezone.localdate(when),
+        )
+        if kind == StockMovement.ISSUE and quantity < 0:
+            stats, _ = DemandStats.objects.select_for_update().get_or_create(product=product)
+            changed = add_demand(stats, movement.day, -quantity)
+            stats.save()
+            if changed:
+                # mean/std feed the reorder point
+                refresh_alert(product.pk)
+    return movement
+
+
+def record_issues(issues):
+    """
+    Count many issues into DemandStats at once.
+
+    - issues: (product_id, day, units) with units > 0
+    Loads the stats rows in one query and upserts them in one bulk_create.
+    Returns the ids of products whose mean/std changed.
+    """
+    issues = sorted(issues, key=lambda issue: issue[1])
+    if not issues:
+        return set()
+    product_ids = {product_id for product_id, _, _ in issues}
+    stats = {
+        row.product_id: row
+        for row in DemandStats.objects.select_for_update().filter(product_id__in=product_ids)
+    }
+    changed = set()
+    for product_id, day, units in issues:
+        row = stats.get(product_id)
+        if row is None:
+            row = stats[product_id] = DemandStats(product_id=product_id)
+        if add_demand(row, day, units):
+            changed.add(product_id)
+
+    now = timezone.now()
+    for row in stats.values():
+        row.updated_at = now
+    DemandStats.objects.bulk_create(
+        list(stats.values()),
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=DEMAND_FIELDS,
+    )
+    return changed
+
+
+def daily_demand_queryset():
+    # demand (positive units) per product per local day, issues only
+    return (
+        StockMovement.objects
+        .filter(kind=StockMovement.ISSUE)
+        .values("product_id", "day")
+        .annotate(units=Sum("quantity") * -1)
+        .order_by()
+    )
+
+
+def rebuild_demand_stats(today=None, chunk_size=5000):
+    """
+    Recompute every product's DemandStats from the ledger.
+
+    The database sums each product's daily demand and then the count, sum
+    and sum of squares of those days, so Python only sees one row per
+    product. Days from a product's first issue up to yesterday count, with
+    empty days as 0. Today's demand is left on current_day.
+    Returns the number of products with demand history.
+    """
+    today = today or timezone.localdate()
+    daily = daily_demand_queryset()
+
+    history_sql, history_params = daily.filter(day__lt=today).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT product_id, MIN(day), COUNT(*), SUM(units), SUM(units * units) "
+            f"FROM ({history_sql}) daily GROUP BY product_id",
+            history_params,
+        )
+        history = cursor.fetchall()
+
+    today_demand = dict(
+        daily.filter(day__gte=today).values_list("product_id", "units")
+    )
+
+    rows = []
+    seen = set()
+    for product_id, first_day, demand_days, total, total_sq in history:
+        first_day = parse_day(first_day)
+        n = (today - first_day).days
+        mean = total / n
+        m2 = max(total_sq - total * total / n, 0.0)
+        rows.append(DemandStats(
+            product_id=product_id, days=n, mean=mean, m2=m2, std=sample_std(n, m2),
+            demand_days=demand_days,
+            current_day=today, current_demand=today_demand.get(product_id, 0),
+        ))
+        seen.add(product_id)
+
+    for product_id, units in today_demand.items():
+        if product_id not in seen:
+            rows.append(DemandStats(product_id=product_id, current_day=today, current_demand=units))
+
+    now = timezone.now()
+    for row in rows:
+        # bulk_create skips auto_now on conflict updates
+        row.updated_at = now
+
+    with transaction.atomic():
+        for start in range(0, len(rows), chunk_size):
+            DemandStats.objects.bulk_create(
+                rows[start:start + chunk_size],
+                update_conflicts=True,
+                unique_fields=["product"],
+                update_fields=DEMAND_FIELDS,
+            )
+    return len(rows)
+
+
+def parse_day(value):
+    # sqlite hands dates back as text from raw queries
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
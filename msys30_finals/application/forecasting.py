@@ -0,0 +1,211 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, without it reorder.py keeps DemandStats' mean/std
+    np = None
+
+from .demand import daily_demand_queryset
+from .models import DemandForecast, DemandStats
+
+
+# Per-product demand forecasts for reorder.py. Three models run side by
+# side on every product's daily demand (days from its first issue, empty
+# days are 0):
+#     SES       level += ALPHA * (y - level)
+#     Holt      level + trend, trend smoothed with BETA
+#     Croston   demand size and days between demands smoothed separately,
+#               forecast size / interval (for intermittent SKUs)
+# Each keeps a running mean of its squared one-step error. The forecast is
+# the next-day forecast of the model with the smallest one so far, its root
+# is the error reorder.py uses in place of the demand std.
+#
+# All products are stepped through a day at once: state is a dict of
+# arrays, step() folds one column of the (products x days) demand matrix.
+# The state is saved on DemandForecast, so the nightly refresh only folds
+# the days since last_day, O(1) per product per day. A full refit (new
+# products, or fit_forecasts --full) replays the ledger the same way.
+
+ALPHA = 0.1            # level / Croston smoothing
+BETA = 0.05            # Holt trend smoothing
+ERROR_SMOOTHING = 0.05  # error average weight once there are 20+ errors
+
+STATE_FIELDS = ["steps", "ses_level", "holt_level", "holt_trend", "croston_size",
+                "croston_interval", "croston_periods", "mse_ses", "mse_holt", "mse_croston"]
+METHODS = [DemandForecast.SES, DemandForecast.HOLT, DemandForecast.CROSTON]
+
+
+def available():
+    return np is not None
+
+
+def empty_state(n):
+    state = {name: np.zeros(n) for name in STATE_FIELDS}
+    state["croston_interval"][:] = 1
+    return state
+
+
+def model_forecasts(state):
+    # next-day forecast of each model, in METHODS order
+    return (
+        state["ses_level"],
+        np.maximum(state["holt_level"] + state["holt_trend"], 0.0),
+        state["croston_size"] / np.maximum(state["croston_interval"], 1e-9),
+    )
+
+
+def step(state, demand, active):
+    """
+    Fold one day's demand into every active row. Rows with no steps yet
+    start from this day. Complexity: O(products)
+    """
+    steps = state["steps"]
+    starting = active & (steps == 0)
+    running = active & (steps > 0)
+    stepped = {}
+
+    # plain mean of the errors at first, then exponentially weighted
+    weight = np.maximum(1.0 / np.maximum(steps, 1), ERROR_SMOOTHING)
+    for method, forecast in zip(METHODS, model_forecasts(state)):
+        mse = state[f"mse_{method}"]
+        stepped[f"mse_{method}"] = mse + weight * ((demand - forecast) ** 2 - mse)
+
+    stepped["ses_level"] = state["ses_level"] + ALPHA * (demand - state["ses_level"])
+    holt_level = ALPHA * demand + (1 - ALPHA) * (state["holt_level"] + state["holt_trend"])
+    stepped["holt_trend"] = BETA * (holt_level - state["holt_level"]) + (1 - BETA) * state["holt_trend"]
+    stepped["holt_level"] = holt_level
+
+    has_demand = demand > 0
+    periods = state["croston_periods"] + 1
+    stepped["croston_size"] = np.where(
+        has_demand, state["croston_size"] + ALPHA * (demand - state["croston_size"]), state["croston_size"]
+    )
+    stepped["croston_interval"] = np.where(
+        has_demand, state["croston_interval"] + ALPHA * (periods - state["croston_interval"]),
+        state["croston_interval"],
+    )
+    stepped["croston_periods"] = np.where(has_demand, 0, periods)
+    stepped["steps"] = steps + 1
+
+    first = {
+        "steps": 1, "ses_level": demand, "holt_level": demand, "holt_trend": 0,
+        "croston_size": demand, "croston_interval": 1, "croston_periods": 0,
+        "mse_ses": 0, "mse_holt": 0, "mse_croston": 0,
+    }
+    for name in STATE_FIELDS:
+        state[name] = np.where(running, stepped[name], np.where(starting, first[name], state[name]))
+
+
+def run(state, demand, first_column):
+    """Step every row through demand[:, first_column[row]:]."""
+    for column in range(demand.shape[1]):
+        step(state, demand[:, column], first_column <= column)
+
+
+def chosen(state):
+    # (method index, forecast, error) per row, most accurate model so far
+    errors = np.stack([state[f"mse_{method}"] for method in METHODS])
+    best = errors.argmin(axis=0)
+    rows = np.arange(errors.shape[1])
+    forecasts = np.stack(model_forecasts(state))
+    return best, forecasts[best, rows], np.sqrt(errors[best, rows])
+
+
+# ----------------------------
+# REFRESH FROM THE LEDGER
+# ----------------------------
+def pending_products(today, full=False):
+    """
+    (product id, first day to fold) for every product with days before
+    today still to fold: the day after last_day, or the first issue for a
+    product without a forecast (or all of them when full).
+    """
+    rows = DemandStats.objects.filter(days__gt=0).values_list(
+        "product_id", "current_day", "days", "product__demand_forecast__last_day"
+    )
+    pending = []
+    for product_id, current_day, days, last_day in rows.iterator(chunk_size=5000):
+        if last_day is None or full:
+            start = current_day - datetime.timedelta(days=days)
+        else:
+            start = last_day + datetime.timedelta(days=1)
+        if start < today:
+            pending.append((start, product_id))
+    # similar start days share a demand matrix
+    pending.sort()
+    return [(product_id, start) for start, product_id in pending]
+
+
+def demand_matrix(product_ids, start, end):
+    """(products x days) daily demand from start up to end, inclusive."""
+    index = {product_id: row for row, product_id in enumerate(product_ids)}
+    matrix = np.zeros((len(product_ids), (end - start).days + 1))
+    daily = daily_demand_queryset().filter(
+        product_id__in=product_ids, day__gte=start, day__lte=end
+    ).values_list("product_id", "day", "units")
+    for product_id, day, units in daily:
+        matrix[index[product_id], (day - start).days] = units
+    return matrix
+
+
+def refresh_forecasts(today=None, full=False, chunk_size=2000, progress=None):
+    """
+    Fold every day before today into the forecasts, resuming each product
+    after its last_day (or from its first issue when full). Returns the
+    number of products updated.
+    """
+    if np is None:
+        raise RuntimeError("demand forecasting needs numpy")
+    today = today or timezone.localdate()
+    end = today - datetime.timedelta(days=1)
+    pending = pending_products(today, full)
+
+    for start_index in range(0, len(pending), chunk_size):
+        chunk = pending[start_index:start_index + chunk_size]
+        product_ids = [product_id for product_id, _ in chunk]
+        start = chunk[0][1]
+
+        state = empty_state(len(chunk))
+        if not full:
+            saved = DemandForecast.objects.filter(product_id__in=product_ids).values_list(
+                "product_id", *STATE_FIELDS
+            )
+            rows = {product_id: values for product_id, *values in saved}
+            for row, product_id in enumerate(product_ids):
+                if product_id in rows:
+                    for name, value in zip(STATE_FIELDS, rows[product_id]):
+                        state[name][row] = value
+
+        first_column = np.asarray([(day - start).days for _, day in chunk])
+        run(state, demand_matrix(product_ids, start, end), first_column)
+        save_state(product_ids, state, end)
+        if progress:
+            progress(start_index + len(chunk), len(pending))
+    return len(pending)
+
+
+def save_state(product_ids, state, last_day):
+    best, forecast, error = chosen(state)
+    now = timezone.now()
+    rows = [
+        DemandForecast(
+            product_id=product_id, last_day=last_day, updated_at=now,
+            method=METHODS[best[row]], forecast=float(forecast[row]), error=float(error[row]),
+            **{name: state[name][row].item() for name in STATE_FIELDS},
+        )
+        for row, product_id in enumerate(product_ids)
+    ]
+    for row in rows:
+        # the integer counters come back as floats from numpy
+        row.steps = int(row.steps)
+        row.croston_periods = int(row.croston_periods)
+    with transaction.atomic():
+        DemandForecast.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["last_day", "method", "forecast", "error", "updated_at"] + STATE_FIELDS,
+        )
@@ -0,0 +1,213 @@
+import datetime
+import traceback
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import dashboard_cache, forecasting, rollups, simulation
+from .demand import rebuild_demand_stats
+from .models import Job, Product
+from .purchasing import draft_purchase_orders
+from .reorder import rebuild_alerts, refresh_alerts
+
+
+# DB-backed job queue. enqueue() adds a Job row, manage.py run_jobs claims
+# due jobs and runs them in a process pool, each handler reports progress
+# into the row so the admin can show it. Web requests only enqueue jobs and
+# read what the jobs wrote (ReorderAlert, PurchaseOrder, DemandStats).
+#
+# While a job runs its worker touches heartbeat_at every poll. A running
+# job whose heartbeat is older than settings.JOB_STALE_AFTER lost its
+# worker: requeue_stale (run by every worker every JOB_REQUEUE_EVERY
+# seconds) queues it again, or fails it after JOB_MAX_ATTEMPTS claims.
+
+HANDLERS = {}
+
+# jobs the worker runs side by side with this one, run_jobs passes its pool size
+_pool_size = ContextVar("job_pool_size", default=1)
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, params=None, run_after=None):
+    return Job.objects.create(
+        kind=kind, params=params or {}, run_after=run_after or timezone.now()
+    )
+
+
+def enqueue_alert_rebuild(parts=1):
+    """
+    Queue a full alert rebuild split into `parts` jobs over product id
+    ranges, so a pool of workers can share it.
+    """
+    ids = Product.objects.order_by("id").values_list("id", flat=True)
+    count = ids.count()
+    if not count:
+        return []
+    parts = max(1, min(parts, count))
+    bounds = [ids[count * i // parts] for i in range(parts)] + [ids[count - 1] + 1]
+    return [
+        enqueue(Job.RECOMPUTE_ALERTS, {"id_range": [bounds[i], bounds[i + 1] - 1]})
+        for i in range(parts)
+    ]
+
+
+# ----------------------------
+# WORKER SIDE
+# ----------------------------
+def claim_next(worker, now=None):
+    """
+    Mark the oldest due queued job as running and return its id, None if
+    there is nothing to do. The conditional UPDATE makes the claim atomic
+    when several workers poll at once.
+    """
+    now = now or timezone.now()
+    due = (
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in due:
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=now, heartbeat_at=now, worker=worker,
+            attempts=F("attempts") + 1, progress_done=0, progress_total=0,
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+def run_job(job_id, pool_size=1):
+    """
+    Run one claimed job in this process, one of `pool_size` the worker runs
+    at once. Returns (job id, final status).
+    """
+    job = Job.objects.get(pk=job_id)
+
+    def progress(done, total):
+        Job.objects.filter(pk=job_id).update(
+            progress_done=done, progress_total=total, heartbeat_at=timezone.now()
+        )
+
+    token = _pool_size.set(max(1, pool_size))
+    try:
+        message = HANDLERS[job.kind](job, progress)
+    except Exception:
+        Job.objects.filter(pk=job_id).update(
+            status=Job.FAILED, message=traceback.format_exc(), finished_at=timezone.now()
+        )
+        return job_id, Job.FAILED
+    finally:
+        _pool_size.reset(token)
+
+    Job.objects.filter(pk=job_id).update(
+        status=Job.DONE, message=message or "", finished_at=timezone.now()
+    )
+    return job_id, Job.DONE
+
+
+def heartbeat(job_ids, now=None):
+    # the worker's jobs are still running
+    return Job.objects.filter(pk__in=list(job_ids), status=Job.RUNNING).update(
+        heartbeat_at=now or timezone.now()
+    )
+
+
+def requeue_stale(older_than, max_attempts=None, now=None):
+    """
+    Put back running jobs without a heartbeat for `older_than` (their
+    worker died mid-job), failing the ones already claimed max_attempts
+    times. Returns (requeued, failed).
+    """
+    now = now or timezone.now()
+    max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+    cutoff = now - older_than
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=Job.RUNNING,
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=Job.FAILED, finished_at=now,
+        message=f"gave up: the worker stopped during all {max_attempts} attempts",
+    )
+    requeued = stale.update(
+        status=Job.QUEUED, worker="", message="requeued after the worker stopped"
+    )
+    return requeued, failed
+
+
+def next_nightly_run(now=None):
+    now = timezone.localtime(now or timezone.now())
+    hour, minute = (int(part) for part in settings.NIGHTLY_ROLLUP_TIME.split(":"))
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += datetime.timedelta(days=1)
+    return run
+
+
+def schedule_nightly(now=None):
+    # keeps exactly one nightly rollup queued ahead
+    pending = Job.objects.filter(Q(status=Job.QUEUED) | Q(status=Job.RUNNING),
+                                 kind=Job.NIGHTLY_ROLLUP)
+    if not pending.exists():
+        return enqueue(Job.NIGHTLY_ROLLUP, run_after=next_nightly_run(now))
+    return None
+
+
+# ----------------------------
+# HANDLERS
+# ----------------------------
+def simulation_workers():
+    # the worker's pool shares SIMULATION_WORKERS, so the nightly simulation
+    # doesn't start pool size * cpu count processes
+    return max(1, settings.SIMULATION_WORKERS // _pool_size.get())
+
+
+@handler(Job.RECOMPUTE_ALERTS)
+def recompute_alerts(job, progress):
+    # params: {"product_ids": [...]} or {"id_range": [first, last]}, or nothing for all
+    product_ids = job.params.get("product_ids")
+    if product_ids is not None:
+        refresh_alerts(product_ids)
+        progress(len(product_ids), len(product_ids))
+        return f"{len(product_ids)} alerts recomputed"
+    id_range = job.params.get("id_range")
+    total = rebuild_alerts(id_range=id_range, progress=progress)
+    return f"{total} alerts recomputed"
+
+
+@handler(Job.PURCHASE_ORDERS)
+def purchase_orders(job, progress):
+    orders = draft_purchase_orders(job=job, progress=progress)
+    return f"{orders} draft purchase orders"
+
+
+@handler(Job.NIGHTLY_ROLLUP)
+def nightly_rollup(job, progress):
+    steps = 5
+    stats = rebuild_demand_stats()
+    progress(1, steps)
+    # folds yesterday into the saved forecast state
+    forecasts = forecasting.refresh_forecasts() if forecasting.available() else 0
+    progress(2, steps)
+    # new reorder points from the fresh stats, the alerts pick them up
+    simulated = (simulation.simulate_reorder_points(workers=simulation_workers())
+                 if simulation.available() else 0)
+    progress(3, steps)
+    alerts = rebuild_alerts()
+    progress(4, steps)
+    # repairs any drift in the incrementally kept rollups
+    categories, suppliers = rollups.rebuild()
+    progress(5, steps)
+    dashboard_cache.invalidate(dashboard_cache.REORDER_COUNT, dashboard_cache.CATEGORY_SUMMARY)
+    return (f"demand stats for {stats} products, {forecasts} forecasts updated, "
+            f"{simulated} reorder points simulated, "
+            f"{alerts} alerts recomputed, "
+            f"rollups for {categories} categories and {suppliers} suppliers")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from application import jobs
+from application.models import Job
+
+
+class Command(BaseCommand):
+    help = "Queue a background job for manage.py run_jobs (eg. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=[kind for kind, _ in Job.KIND_CHOICES])
+        parser.add_argument("--parts", type=int, default=1,
+                            help="recompute_alerts only: split the rebuild into this many jobs")
+
+    def handle(self, *args, **options):
+        if options["kind"] == Job.RECOMPUTE_ALERTS:
+            queued = jobs.enqueue_alert_rebuild(options["parts"])
+        else:
+            queued = [jobs.enqueue(options["kind"])]
+        ids = ", ".join(str(job.pk) for job in queued)
+        self.stdout.write(self.style.SUCCESS(f"Queued {len(queued)} job(s): {ids or 'none'}."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from application import forecasting
+from application.reorder import rebuild_alerts
+
+
+class Command(BaseCommand):
+    help = "Fold the days since the last run into every product's demand forecast."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="refit from each product's first issue instead of the saved state")
+        parser.add_argument("--chunk-size", type=int, default=2000,
+                            help="products stepped through the ledger together")
+        parser.add_argument("--skip-alerts", action="store_true",
+                            help="don't rebuild reorder alerts afterwards")
+
+    def handle(self, *args, **options):
+        if not forecasting.available():
+            raise CommandError("Demand forecasting needs numpy.")
+        total = forecasting.refresh_forecasts(full=options["full"], chunk_size=options["chunk_size"])
+        self.stdout.write(f"Forecasts updated for {total} products.")
+        if not options["skip_alerts"]:
+            rebuild_alerts()
+            self.stdout.write("Reorder alerts rebuilt.")
+        self.stdout.write(self.style.SUCCESS("Done."))
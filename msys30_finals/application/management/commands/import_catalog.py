@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from application.catalog_io import RowError, guess_format, import_file
+
+
+class Command(BaseCommand):
+    help = "Bulk import products or suppliers from a CSV or JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file, or JSON file holding an array of objects")
+        parser.add_argument("--kind", choices=["products", "suppliers"], default="products")
+        parser.add_argument("--format", choices=["csv", "json"],
+                            help="defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--max-errors", type=int, default=50,
+                            help="how many rejected rows to print")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or guess_format(options["path"])
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                result = import_file(stream, options["kind"], fmt, options["batch_size"])
+        except OSError as e:
+            raise CommandError(str(e))
+        except RowError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        for line, message in result.errors[:options["max_errors"]]:
+            self.stderr.write(f"line {line}: {message}")
+        if result.failed > options["max_errors"]:
+            self.stderr.write(f"... and {result.failed - options['max_errors']} more")
+
+        self.stdout.write(self.style.SUCCESS(f"{options['kind'].capitalize()}: {result}."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from application.demand import rebuild_demand_stats
+from application.reorder import rebuild_alerts
+
+
+class Command(BaseCommand):
+    help = "Recompute every product's DemandStats from the stock movement ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--skip-alerts", action="store_true",
+                            help="don't rebuild reorder alerts afterwards")
+
+    def handle(self, *args, **options):
+        total = rebuild_demand_stats()
+        self.stdout.write(f"Demand stats rebuilt for {total} products.")
+        if not options["skip_alerts"]:
+            rebuild_alerts()
+            self.stdout.write("Reorder alerts rebuilt.")
+        self.stdout.write(self.style.SUCCESS("Done."))
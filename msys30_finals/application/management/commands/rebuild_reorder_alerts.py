@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from application.reorder import rebuild_alerts
+
+
+class Command(BaseCommand):
+    help = "Recompute the ReorderAlert row of every product (run once after migrating)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000,
+                            help="products per bulk_create/bulk_update batch")
+
+    def handle(self, *args, **options):
+        total = rebuild_alerts(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt reorder alerts for {total} products."))
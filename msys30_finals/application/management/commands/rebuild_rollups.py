@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from application import dashboard_cache, rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-category and per-supplier stock rollups (run once after migrating)."
+
+    def handle(self, *args, **options):
+        categories, suppliers = rollups.rebuild()
+        dashboard_cache.invalidate(dashboard_cache.CATEGORY_SUMMARY)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups for {categories} categories and {suppliers} suppliers."
+        ))
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from application.db_router import REPLICA, replica_configured
+
+
+class Command(BaseCommand):
+    help = "Copy the SQLite database into the read replica with SQLite's online backup API."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=float, default=0,
+                            help="keep refreshing every this many seconds")
+        parser.add_argument("--pages", type=int, default=-1,
+                            help="pages copied per step, -1 copies everything in one step")
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica database, set MSYS_READ_REPLICA=1.")
+        if connections["default"].vendor != "sqlite" or connections[REPLICA].vendor != "sqlite":
+            raise CommandError("Only a SQLite replica is refreshed here, "
+                               "a Postgres replica follows the primary by itself.")
+
+        while True:
+            start = time.perf_counter()
+            pages = self.refresh(options["pages"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Replica refreshed: {pages} pages in {time.perf_counter() - start:.2f}s."
+            ))
+            if options["every"] <= 0:
+                break
+            time.sleep(options["every"])
+
+    def refresh(self, pages):
+        source = connections["default"]
+        source.ensure_connection()
+        # a plain connection: the copy mustn't go through the router
+        target = sqlite3.connect(connections[REPLICA].settings_dict["NAME"],
+                                 timeout=settings.SQLITE_BUSY_TIMEOUT)
+        try:
+            # readers of the replica wait on its lock while a step is copied
+            source.connection.backup(target, pages=pages)
+            return target.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            target.close()
@@ -0,0 +1,84 @@
+import datetime
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from application import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (reorder alerts, purchase orders, nightly rollup) in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS,
+                            help="processes running jobs at the same time")
+        parser.add_argument("--poll", type=float, default=2.0,
+                            help="seconds between queue checks when idle")
+        parser.add_argument("--once", action="store_true",
+                            help="exit when no job is due instead of waiting for more")
+        parser.add_argument("--no-nightly", action="store_true",
+                            help="don't keep a nightly rollup scheduled")
+
+    def handle(self, *args, **options):
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        workers = max(1, options["workers"])
+
+        self.stdout.write(f"Worker {name} running jobs with {workers} process(es).")
+        stale_after = datetime.timedelta(seconds=settings.JOB_STALE_AFTER)
+        next_requeue = 0
+
+        # spawned children need django set up, forked ones already have it
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            running = {}
+            while True:
+                # every worker checks, so jobs of one that died get picked up
+                if time.monotonic() >= next_requeue:
+                    requeued, failed = jobs.requeue_stale(stale_after)
+                    if requeued or failed:
+                        self.stdout.write(f"Requeued {requeued} and failed {failed} job(s) left running.")
+                    next_requeue = time.monotonic() + settings.JOB_REQUEUE_EVERY
+                jobs.heartbeat(running.values())
+
+                if not options["no_nightly"] and not options["once"]:
+                    jobs.schedule_nightly()
+
+                claimed = []
+                while len(running) + len(claimed) < workers:
+                    job_id = jobs.claim_next(name)
+                    if job_id is None:
+                        break
+                    claimed.append(job_id)
+                if claimed:
+                    # forked children would share these open handles
+                    connections.close_all()
+                    for job_id in claimed:
+                        running[pool.submit(jobs.run_job, job_id, workers)] = job_id
+                        self.stdout.write(f"job {job_id} started")
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll"])
+                    continue
+
+                done, _ = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        _, status = future.result()
+                    except Exception as e:  # the child process died
+                        jobs.Job.objects.filter(pk=job_id).update(
+                            status=jobs.Job.FAILED, message=f"worker process failed: {e!r}",
+                            finished_at=timezone.now(),
+                        )
+                        status = jobs.Job.FAILED
+                    self.stdout.write(f"job {job_id} {status}")
+
+        self.stdout.write(self.style.SUCCESS("No jobs left."))
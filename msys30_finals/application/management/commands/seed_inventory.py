@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from application.models import Product, Supplier
+from application.seed import clear_inventory, seed_inventory
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a deterministic synthetic catalog (for load tests and benchmarks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--suppliers", type=int, default=100)
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=30,
+                            help="same seed and counts give the same rows")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--clear", action="store_true",
+                            help="delete every product, supplier, movement and alert first")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            clear_inventory()
+        elif Product.objects.exists() or Supplier.objects.exists():
+            raise CommandError("The catalog isn't empty, run with --clear to replace it.")
+
+        start = time.perf_counter()
+        seed_inventory(options["suppliers"], options["products"],
+                       seed=options["seed"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['suppliers']} suppliers and {options['products']} products "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from application import simulation
+from application.reorder import rebuild_alerts
+
+
+class Command(BaseCommand):
+    help = "Simulate demand and lead times to set the reorder point of every product with enough history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenarios", type=int, default=settings.SIMULATION_SCENARIOS,
+                            help="demand/lead-time scenarios per product")
+        parser.add_argument("--fill-rate", type=float, default=settings.REORDER_FILL_RATE,
+                            help="target share of demand served from stock")
+        parser.add_argument("--workers", type=int, default=settings.SIMULATION_WORKERS,
+                            help="processes running product chunks at the same time")
+        parser.add_argument("--chunk-size", type=int, default=250,
+                            help="products per process task")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--skip-alerts", action="store_true",
+                            help="don't rebuild reorder alerts afterwards")
+
+    def handle(self, *args, **options):
+        if not simulation.available():
+            raise CommandError("The reorder simulation needs numpy.")
+        if not 0 < options["fill_rate"] <= 1:
+            raise CommandError("--fill-rate must be between 0 and 1.")
+        total = simulation.simulate_reorder_points(
+            scenarios=options["scenarios"],
+            fill_rate_target=options["fill_rate"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            seed=options["seed"],
+        )
+        self.stdout.write(f"Simulated reorder points for {total} products.")
+        if not options["skip_alerts"]:
+            rebuild_alerts()
+            self.stdout.write("Reorder alerts rebuilt.")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,208 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from django.template.backends.django import DjangoTemplates
+
+
+# Per-view performance numbers, collected by middleware.PerformanceMiddleware
+# for a sample of requests.
+#
+# A RequestTimings lives in a context variable for the length of one sampled
+# request. DB time comes from db_wrapper, template render time from
+# TimedDjangoTemplates and sort/search time from section() around the
+# algorithms calls in views.py. Outside a sampled request both are a single
+# context variable lookup.
+#
+# db_wrapper sits in every connection's execute_wrappers (what
+# connection.execute_wrapper() pushes onto) for the life of the connection,
+# not per request: async views run their queries on a worker thread with its
+# own connection, but the context variable follows them there.
+#
+# Each (metric, view) keeps the last WINDOW samples for p50/p95/p99 plus
+# running totals, rendered in Prometheus text format by render_prometheus().
+
+WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+# name -> help text, all summaries
+METRICS = {
+    "request_seconds": "Wall time of the view and the middleware below it",
+    "db_queries": "Database queries per request",
+    "db_seconds": "Time spent in database queries",
+    "render_seconds": "Time spent rendering templates",
+    "sort_seconds": "Time spent in python sorting (key_sort / merge_sort)",
+    "search_seconds": "Time spent in python binary_search lookups",
+    "response_bytes": "Response body size, streamed responses are not counted",
+}
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.sections = defaultdict(float)
+        # templates being rendered, only the outermost render is timed
+        self.render_depth = 0
+
+
+def db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_seconds += time.perf_counter() - start
+        timings.db_queries += 1
+
+
+def instrument(connection):
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def section(name):
+    """Add the time spent in the block to the sampled request, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.sections[name] += time.perf_counter() - start
+
+
+class TimedTemplate:
+    # wraps backends.django.Template, only render() is timed. templates
+    # rendered inside another one's render (row_cache, reports) are part of
+    # its time already
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None or timings.render_depth:
+            return self.template.render(context, request)
+        timings.render_depth += 1
+        try:
+            with section("render"):
+                return self.template.render(context, request)
+        finally:
+            timings.render_depth -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The normal Django template backend, with render time in the metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+# ----------------------------
+# ROLLING HISTOGRAMS
+# ----------------------------
+class Summary:
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self):
+        """
+        p50/p95/p99 of the window, nearest rank.
+        Complexity: O(w log w), only when /metrics is read
+        """
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [(q, 0.0) for q in QUANTILES]
+        last = len(ordered) - 1
+        return [(q, ordered[min(last, int(q * len(ordered)))]) for q in QUANTILES]
+
+
+_lock = threading.Lock()
+_summaries = defaultdict(Summary)  # (metric, view) -> Summary
+
+
+def record(view, timings, wall_seconds, response_bytes):
+    values = {
+        "request_seconds": wall_seconds,
+        "db_queries": timings.db_queries,
+        "db_seconds": timings.db_seconds,
+        "render_seconds": timings.sections.get("render", 0.0),
+        "sort_seconds": timings.sections.get("sort", 0.0),
+        "search_seconds": timings.sections.get("search", 0.0),
+    }
+    if response_bytes is not None:
+        values["response_bytes"] = response_bytes
+    with _lock:
+        for metric, value in values.items():
+            _summaries[(metric, view)].add(value)
+
+
+def reset():
+    with _lock:
+        _summaries.clear()
+
+
+def server_timing(timings, wall_seconds):
+    # Server-Timing header value, durations in milliseconds
+    parts = [
+        f"app;dur={wall_seconds * 1000:.2f}",
+        f'db;dur={timings.db_seconds * 1000:.2f};desc="{timings.db_queries} queries"',
+    ]
+    for name, seconds in sorted(timings.sections.items()):
+        parts.append(f"{name};dur={seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def render_prometheus(prefix="msys_"):
+    with _lock:
+        snapshot = [
+            (metric, view, summary.quantiles(), summary.total, summary.count)
+            for (metric, view), summary in sorted(_summaries.items())
+        ]
+
+    lines = []
+    for metric, help_text in METRICS.items():
+        rows = [row for row in snapshot if row[0] == metric]
+        if not rows:
+            continue
+        name = prefix + metric
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} summary")
+        for _, view, quantiles, total, count in rows:
+            label = view.replace("\\", "\\\\").replace('"', '\\"')
+            for q, value in quantiles:
+                lines.append(f'{name}{{view="{label}",quantile="{q}"}} {value:.6g}')
+            lines.append(f'{name}_sum{{view="{label}"}} {total:.6g}')
+            lines.append(f'{name}_count{{view="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import db_router, metrics
+
+
+class PerformanceMiddleware:
+    """
+    Times a sample of requests (settings.PERF_SAMPLE_RATE, 0 to 1): wall
+    time, DB queries and DB time, template render and python sort/search
+    time, response size. Adds a Server-Timing header to sampled responses
+    and feeds the per-view histograms behind /metrics.
+
+    With the sample rate at 0 the middleware drops itself out of the chain
+    at startup.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # connections opened later are covered by signals.instrument_connection
+        for connection in connections.all(initialized_only=True):
+            metrics.instrument(connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def finish(self, request, response, timings, wall_seconds):
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        if view == "metrics":
+            return response
+        size = None if response.streaming else len(response.content)
+        metrics.record(view, timings, wall_seconds, size)
+        response["Server-Timing"] = metrics.server_timing(timings, wall_seconds)
+        return response
+
+
+class ReadReplicaMiddleware:
+    """
+    Sends the reads of GET/HEAD requests to views marked with
+    db_router.reads_replica to the replica database. After a write
+    (any other method) the browser gets a cookie that keeps its reads on
+    default for REPLICA_STICKY_SECONDS, so it sees what it just saved.
+
+    Without a replica configured the middleware drops itself out.
+    """
+
+    sync_capable = True
+    async_capable = True
+    STICKY_COOKIE = "msys_read_primary"
+    SAFE_METHODS = ("GET", "HEAD")
+
+    def __init__(self, get_response):
+        if not db_router.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # not reset afterwards: a streamed response reads after we return
+        db_router.use_default()
+        return self.remember_write(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        db_router.use_default()
+        return self.remember_write(request, await self.get_response(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in self.SAFE_METHODS
+                and getattr(view_func, "reads_replica", False)
+                and self.STICKY_COOKIE not in request.COOKIES):
+            db_router.use_replica()
+
+    def remember_write(self, request, response):
+        if request.method not in self.SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(self.STICKY_COOKIE, "1", max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:31
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('sku'), models.F('id'), name='product_sku_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('name'), models.F('id'), name='product_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('category'), models.F('id'), name='product_category_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['quantity', 'id'], name='product_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['reorder_level', 'id'], name='product_reorder_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['unit_price', 'id'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(django.db.models.functions.text.Lower('name'), models.F('id'), name='supplier_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(django.db.models.functions.text.Lower('contact_person'), models.F('id'), name='supplier_contact_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0002_product_supplier_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reorderalert',
+            name='needs_reorder',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='reorderalert',
+            name='quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reorderalert',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='reorderalert',
+            name='product',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_alert', to='application.product'),
+        ),
+        migrations.AddIndex(
+            model_name='reorderalert',
+            index=models.Index(fields=['needs_reorder', 'quantity'], name='alert_needs_reorder_idx'),
+        ),
+    ]
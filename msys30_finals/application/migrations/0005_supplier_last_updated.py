@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0004_demand_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0007_stock_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demandstats',
+            name='demand_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='demandstats',
+            name='simulated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='demandstats',
+            name='simulated_fill_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='demandstats',
+            name='simulated_reorder_point',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
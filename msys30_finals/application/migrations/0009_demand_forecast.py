@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0008_demand_simulation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_day', models.DateField()),
+                ('steps', models.PositiveIntegerField(default=0)),
+                ('ses_level', models.FloatField(default=0)),
+                ('holt_level', models.FloatField(default=0)),
+                ('holt_trend', models.FloatField(default=0)),
+                ('croston_size', models.FloatField(default=0)),
+                ('croston_interval', models.FloatField(default=1)),
+                ('croston_periods', models.PositiveIntegerField(default=0)),
+                ('mse_ses', models.FloatField(default=0)),
+                ('mse_holt', models.FloatField(default=0)),
+                ('mse_croston', models.FloatField(default=0)),
+                ('method', models.CharField(choices=[('ses', 'Simple exponential smoothing'), ('holt', 'Holt (level + trend)'), ('croston', 'Croston (intermittent)')], default='ses', max_length=10)),
+                ('forecast', models.FloatField(default=0)),
+                ('error', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecast', to='application.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def rebuild_rollups(apps, schema_editor):
+    # the rollup tables (0007) start empty on a database with products in
+    # it. the app's own rebuild, so this stays after the migrations it reads
+    from application import rollups
+
+    rollups.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0012_backfill_reorder_alerts'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 # ----------------------------
 # SUPPLIER MODEL
@@ -9,10 +12,33 @@ class Supplier(models.Model):
     phone = models.CharField(max_length=20, blank=True)
     email = models.EmailField(blank=True)
     address = models.TextField(blank=True)
+    # days from purchase order to stock on the shelf, blank = reorder.LEAD_TIME
+    lead_time_days = models.PositiveIntegerField(null=True, blank=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # case-insensitive sort/search keys used by queries.py, id is the tie-breaker
+        indexes = [
+            models.Index(Lower("name"), F("id"), name="supplier_name_lower_idx"),
+            models.Index(Lower("contact_person"), F("id"), name="supplier_contact_lower_idx"),
+            models.Index(fields=["last_updated"], name="supplier_last_updated_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_lead_time()
+        return instance
+
+    def remember_lead_time(self):
+        self._loaded_lead_time = self.__dict__.get("lead_time_days")
+
+    def lead_time_changed(self):
+        return getattr(self, "_loaded_lead_time", None) != self.lead_time_days
+
 
 # ----------------------------
 # PRODUCT MODEL
@@ -27,9 +53,48 @@ class Product(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     last_updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # one index per sort/search field in queries.py, id is the tie-breaker
+        indexes = [
+            models.Index(Lower("sku"), F("id"), name="product_sku_lower_idx"),
+            models.Index(Lower("name"), F("id"), name="product_name_lower_idx"),
+            models.Index(Lower("category"), F("id"), name="product_category_lower_idx"),
+            models.Index(fields=["quantity", "id"], name="product_quantity_idx"),
+            models.Index(fields=["reorder_level", "id"], name="product_reorder_idx"),
+            models.Index(fields=["unit_price", "id"], name="product_price_idx"),
+            # search_index catches up on the rows changed since it last looked
+            models.Index(fields=["last_updated"], name="product_last_updated_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_stock()
+        return instance
+
+    # remembered as loaded, so a save can tell what changed: the reorder
+    # inputs for reorder.refresh_alert, all of them for rollups.py
+    REORDER_FIELDS = ("quantity", "reorder_level", "supplier_id")
+    TRACKED_FIELDS = REORDER_FIELDS + ("category", "unit_price")
+
+    def remember_stock(self):
+        # deferred fields are remembered as None
+        self._loaded = {name: self.__dict__.get(name) for name in self.TRACKED_FIELDS}
+
+    def loaded_values(self):
+        """The tracked fields as last loaded or saved, None for a new instance."""
+        return getattr(self, "_loaded", None)
+
+    def stock_changed(self):
+        """True if quantity, reorder_level or supplier differ from what was loaded."""
+        loaded = self.loaded_values()
+        return loaded is None or any(
+            loaded[name] != getattr(self, name) for name in self.REORDER_FIELDS
+        )
+
     def is_low_stock(self):
         """Check if current stock is below or equal to reorder level."""
         return self.quantity <= self.reorder_level
@@ -39,10 +104,274 @@ class Product(models.Model):
 # REORDER ALERT MODEL
 # ----------------------------
 class ReorderAlert(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # one row per product, kept current by reorder.refresh_alert
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="reorder_alert")
+    quantity = models.PositiveIntegerField(default=0)
     safety_stock = models.PositiveIntegerField(default=0)
     reorder_point = models.PositiveIntegerField(default=0)
+    needs_reorder = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["needs_reorder", "quantity"], name="alert_needs_reorder_idx"),
+        ]
 
     def __str__(self):
         return f"Reorder Alert: {self.product.name}"
+
+
+# ----------------------------
+# STOCK MOVEMENT (LEDGER)
+# ----------------------------
+class StockMovement(models.Model):
+    RECEIPT = "receipt"
+    ISSUE = "issue"
+    ADJUSTMENT = "adjustment"
+    KIND_CHOICES = [
+        (RECEIPT, "Receipt"),
+        (ISSUE, "Issue"),          # stock leaving for a customer, counts as demand
+        (ADJUSTMENT, "Adjustment"),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="movements")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # signed change in stock, issues are negative
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    # local business day of created_at, stored so daily demand is a plain GROUP BY
+    day = models.DateField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "created_at"], name="movement_product_time_idx"),
+            models.Index(fields=["kind", "product", "day"], name="movement_demand_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} {self.product.sku}"
+
+    def save(self, *args, **kwargs):
+        if self.day is None:
+            self.day = timezone.localdate(self.created_at)
+        super().save(*args, **kwargs)
+
+
+# ----------------------------
+# DEMAND STATS MODEL
+# ----------------------------
+class DemandStats(models.Model):
+    """
+    Running mean / variance of one product's daily demand (Welford).
+    Updated by demand.record_movement, rebuilt by manage.py rebuild_demand_stats.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="demand_stats")
+    # completed days folded into mean/m2 (days without issues count as 0)
+    days = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+    std = models.FloatField(default=0)
+    # how many of those days had any demand, for intermittent SKUs
+    demand_days = models.PositiveIntegerField(default=0)
+    # the day still being counted, folded in once a later day arrives
+    current_day = models.DateField(null=True, blank=True)
+    current_demand = models.PositiveIntegerField(default=0)
+    # smallest reorder point reaching settings.REORDER_FILL_RATE in the last
+    # simulation (simulation.py), used by reorder.py instead of the z formula
+    simulated_reorder_point = models.FloatField(null=True, blank=True)
+    simulated_fill_rate = models.FloatField(null=True, blank=True)
+    simulated_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Demand: {self.product.sku} ({self.mean:.2f}/day)"
+
+
+# ----------------------------
+# DEMAND FORECAST MODEL
+# ----------------------------
+class DemandForecast(models.Model):
+    """
+    Smoothed demand of one product (forecasting.py): the state of an SES,
+    a Holt and a Croston model, each one's running squared one-step error,
+    and the forecast of whichever has been most accurate so far.
+    """
+    SES = "ses"
+    HOLT = "holt"
+    CROSTON = "croston"
+    METHOD_CHOICES = [
+        (SES, "Simple exponential smoothing"),
+        (HOLT, "Holt (level + trend)"),
+        (CROSTON, "Croston (intermittent)"),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="demand_forecast")
+    # last day folded in and how many days that makes
+    last_day = models.DateField()
+    steps = models.PositiveIntegerField(default=0)
+    ses_level = models.FloatField(default=0)
+    holt_level = models.FloatField(default=0)
+    holt_trend = models.FloatField(default=0)
+    # smoothed demand size and days between demands, days since the last one
+    croston_size = models.FloatField(default=0)
+    croston_interval = models.FloatField(default=1)
+    croston_periods = models.PositiveIntegerField(default=0)
+    mse_ses = models.FloatField(default=0)
+    mse_holt = models.FloatField(default=0)
+    mse_croston = models.FloatField(default=0)
+    # units per day from the chosen method, and its root mean squared error
+    method = models.CharField(max_length=10, choices=METHOD_CHOICES, default=SES)
+    forecast = models.FloatField(default=0)
+    error = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Forecast: {self.product.sku} ({self.forecast:.2f}/day, {self.method})"
+
+
+# ----------------------------
+# BACKGROUND JOB MODEL
+# ----------------------------
+class Job(models.Model):
+    """
+    One unit of background work, queued by jobs.enqueue and run by
+    manage.py run_jobs. Progress is written back while it runs.
+    """
+    RECOMPUTE_ALERTS = "recompute_alerts"
+    PURCHASE_ORDERS = "purchase_orders"
+    NIGHTLY_ROLLUP = "nightly_rollup"
+    KIND_CHOICES = [
+        (RECOMPUTE_ALERTS, "Recompute reorder alerts"),
+        (PURCHASE_ORDERS, "Draft purchase orders"),
+        (NIGHTLY_ROLLUP, "Nightly stats rollup"),
+    ]
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    params = models.JSONField(default=dict, blank=True)
+    # don't start before this time (nightly jobs are queued a day ahead)
+    run_after = models.DateTimeField(default=timezone.now)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    # result summary, or the traceback if it failed
+    message = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    # times claimed, a job that keeps losing its worker stops being retried
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # touched by the worker while the job runs, see jobs.requeue_stale
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="job_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+    def percent(self):
+        if not self.progress_total:
+            return 100 if self.status == self.DONE else 0
+        return round(100 * self.progress_done / self.progress_total)
+
+
+# ----------------------------
+# PURCHASE ORDER MODELS
+# ----------------------------
+class PurchaseOrder(models.Model):
+    """A per-supplier order drafted from the reorder alerts (purchasing.py)."""
+    DRAFT = "draft"
+    SENT = "sent"
+    STATUS_CHOICES = [
+        (DRAFT, "Draft"),
+        (SENT, "Sent"),
+    ]
+
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name="purchase_orders")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=DRAFT)
+    job = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True, blank=True)
+    total_units = models.PositiveIntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"PO #{self.pk} {self.supplier.name} ({self.status})"
+
+
+class PurchaseOrderLine(models.Model):
+    order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name="lines")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    # price when the order was drafted
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.sku}"
+
+
+# ----------------------------
+# STOCK ROLLUP MODELS
+# ----------------------------
+class StockRollup(models.Model):
+    """
+    Stock totals of one group of products, kept current by rollups.py and
+    rebuilt by manage.py rebuild_rollups.
+    """
+    item_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.PositiveBigIntegerField(default=0)
+    # sum of quantity * unit_price
+    total_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # products with quantity <= reorder_level
+    low_stock_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class CategoryRollup(StockRollup):
+    category = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return f"Rollup: {self.category or 'Uncategorized'}"
+
+
+class SupplierRollup(StockRollup):
+    # products without a supplier have no row, see rollups.unassigned
+    supplier = models.OneToOneField(Supplier, on_delete=models.CASCADE, related_name="rollup")
+
+    def __str__(self):
+        return f"Rollup: {self.supplier.name}"
+
+
+# ----------------------------
+# TABLE VERSION MODEL
+# ----------------------------
+class TableVersion(models.Model):
+    """
+    Change counter of one table, bumped in the same transaction as every
+    write to it (table_versions.py).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    # deletes counted on their own, the search index rebuilds after one
+    deletes = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,206 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Keyset (cursor) pagination.
+#
+# The queryset's ORDER BY (eg. "sort_0", "-sort_1", "id") is the key. A
+# cursor is the key values of the first/last row on a page, so the next page is a
+# "WHERE key > cursor ORDER BY key LIMIT n" that the sort index can answer
+# directly, no OFFSET scan. Page 1000 costs the same as page 1.
+
+
+class KeysetPage:
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def encode_cursor(values):
+    raw = json.dumps([str(v) if isinstance(v, Decimal) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    # returns None for anything that isn't a cursor we made
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def key_fields(queryset, ordering):
+    # the model field (or annotation output field) of every key
+    query = queryset.query.chain()
+    return [query.resolve_ref(name).output_field for name, _ in ordering]
+
+
+def cursor_values(cursor, fields):
+    """
+    The key values of a cursor, each converted by its field. None when it
+    isn't one of ours: bad encoding, wrong length or a value its field
+    can't take (eg. letters for a price).
+    """
+    values = decode_cursor(cursor) if cursor else None
+    if values is None or len(values) != len(fields):
+        return None
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, ValueError, TypeError):
+        return None
+    # keys are never NULL (see queries.PRODUCT_FIELDS)
+    return None if any(value is None for value in values) else values
+
+
+def get_ordering(queryset):
+    # [(name, descending), ...] from the queryset's order_by, always ending in id
+    ordering = []
+    for name in queryset.query.order_by:
+        if not isinstance(name, str):
+            raise ValueError("keyset pagination needs order_by() on named fields")
+        ordering.append((name.lstrip("-"), name.startswith("-")))
+    if not ordering or ordering[-1][0] not in ("id", "pk"):
+        ordering.append(("id", False))
+    return ordering
+
+
+def after_filter(ordering, values):
+    """
+    Rows that come after `values` in `ordering`:
+    k1 >= v1 AND ((k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...)
+    "after" means "<" for descending keys. The redundant k1 >= v1 lets the
+    database seek straight into the index instead of scanning from the start.
+    """
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(ordering, values):
+        lookup = "__lt" if descending else "__gt"
+        condition |= equal & Q(**{name + lookup: value})
+        equal &= Q(**{name: value})
+
+    (first, descending), first_value = ordering[0], values[0]
+    return Q(**{first + ("__lte" if descending else "__gte"): first_value}) & condition
+
+
+def row_values(row, ordering):
+    # model instances, or dicts from .values()
+    if isinstance(row, dict):
+        return [row[name] for name, _ in ordering]
+    return [getattr(row, name) for name, _ in ordering]
+
+
+def page_query(queryset, after=None, before=None, page_size=50):
+    """
+    The query for one page, keyed on the queryset's order_by.
+
+    - after: cursor, the page following it (next link)
+    - before: cursor, the page preceding it (prev link)
+    Bad cursors are ignored. Returns (query, state), hand the fetched rows
+    and state to finish_page.
+    """
+    ordering = get_ordering(queryset)
+    order_by = [("-" if desc else "") + name for name, desc in ordering]
+    reverse_order_by = [("" if desc else "-") + name for name, desc in ordering]
+
+    fields = key_fields(queryset, ordering) if after or before else None
+    after_values = cursor_values(after, fields)
+    before_values = cursor_values(before, fields)
+
+    if before_values is not None:
+        # walk backwards from the cursor, finish_page flips the rows back
+        flipped = [(name, not desc) for name, desc in ordering]
+        query = queryset.filter(after_filter(flipped, before_values)).order_by(*reverse_order_by)
+    else:
+        if after_values is not None:
+            queryset = queryset.filter(after_filter(ordering, after_values))
+        query = queryset.order_by(*order_by)
+
+    state = {
+        "ordering": ordering,
+        "page_size": page_size,
+        "backwards": before_values is not None,
+        "has_cursor": after_values is not None,
+    }
+    return query[:page_size + 1], state
+
+
+def finish_page(rows, state):
+    """
+    KeysetPage from the rows of page_query. None means a stale "before"
+    cursor ran off the start, fetch the first page instead.
+    """
+    page_size = state["page_size"]
+    ordering = state["ordering"]
+    rows = list(rows)
+
+    if state["backwards"]:
+        if not rows:
+            return None
+        has_prev = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev = state["has_cursor"]
+
+    if not rows:
+        return KeysetPage(rows)
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(row_values(rows[-1], ordering)) if has_next else None,
+        prev_cursor=encode_cursor(row_values(rows[0], ordering)) if has_prev else None,
+    )
+
+
+def keyset_page(queryset, after=None, before=None, page_size=50):
+    """
+    One page of queryset, keyed on its order_by.
+    Complexity: one indexed query of page_size + 1 rows
+    """
+    query, state = page_query(queryset, after, before, page_size)
+    page = finish_page(query, state)
+    if page is None:
+        return keyset_page(queryset, page_size=page_size)
+    return page
+
+
+async def akeyset_page(queryset, after=None, before=None, page_size=50):
+    # keyset_page for async views
+    query, state = page_query(queryset, after, before, page_size)
+    page = finish_page([row async for row in query], state)
+    if page is None:
+        return await akeyset_page(queryset, page_size=page_size)
+    return page
+
+
+def page_links(request, page):
+    """
+    next/prev urls for a page, keeping the other GET params (sort, search...).
+    """
+    links = {}
+    for name, param, cursor in (("next_url", "after", page.next_cursor),
+                                ("prev_url", "before", page.prev_cursor)):
+        if cursor is None:
+            links[name] = None
+            continue
+        params = request.GET.copy()
+        params.pop("after", None)
+        params.pop("before", None)
+        params[param] = cursor
+        links[name] = "?" + params.urlencode()
+    return links
@@ -0,0 +1,63 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import PurchaseOrder, PurchaseOrderLine, ReorderAlert
+
+
+# Draft purchase orders, one per supplier, built from the precomputed
+# ReorderAlert rows (run as a background job, see jobs.py).
+
+# order enough to bring stock back up to this many times the reorder point
+ORDER_UP_TO = 2
+
+
+def order_quantity(quantity, reorder_point):
+    return max(ORDER_UP_TO * reorder_point - quantity, 1)
+
+
+def draft_purchase_orders(job=None, progress=None, chunk_size=500):
+    """
+    Replace the draft purchase orders with one per supplier covering every
+    product that needs reordering. Sent orders are kept, products without a
+    supplier are skipped. Returns the number of orders drafted.
+    """
+    rows = (
+        ReorderAlert.objects
+        .filter(needs_reorder=True, product__supplier__isnull=False)
+        .order_by("product__supplier_id", "product_id")
+        .values_list("product__supplier_id", "product_id", "quantity", "reorder_point",
+                     "product__unit_price")
+    )
+    lines_by_supplier = defaultdict(list)
+    for supplier_id, product_id, quantity, reorder_point, unit_price in rows.iterator(chunk_size=5000):
+        lines_by_supplier[supplier_id].append(
+            (product_id, order_quantity(quantity, reorder_point), unit_price)
+        )
+
+    supplier_ids = list(lines_by_supplier)
+    with transaction.atomic():
+        PurchaseOrder.objects.filter(status=PurchaseOrder.DRAFT).delete()
+
+        for start in range(0, len(supplier_ids), chunk_size):
+            chunk = supplier_ids[start:start + chunk_size]
+            orders = PurchaseOrder.objects.bulk_create([
+                PurchaseOrder(
+                    supplier_id=supplier_id,
+                    job=job,
+                    total_units=sum(qty for _, qty, _ in lines_by_supplier[supplier_id]),
+                    total_cost=sum((qty * price for _, qty, price in lines_by_supplier[supplier_id]),
+                                   Decimal("0")),
+                )
+                for supplier_id in chunk
+            ])
+            PurchaseOrderLine.objects.bulk_create([
+                PurchaseOrderLine(order=order, product_id=product_id, quantity=qty, unit_price=price)
+                for order in orders
+                for product_id, qty, price in lines_by_supplier[order.supplier_id]
+            ], batch_size=5000)
+            if progress:
+                progress(start + len(chunk), len(supplier_ids))
+
+    return len(supplier_ids)
@@ -0,0 +1,148 @@
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Lower, Trim
+
+from . import search_index
+from .models import Product, Supplier
+
+
+# same field names as algorithms.FIELD_KEYS, mapped to the indexed
+# expressions in models.Meta.indexes. text fields compare lowercased
+PRODUCT_FIELDS = {
+    "sku": Lower("sku"),
+    "name": Lower("name"),
+    "category": Lower("category"),
+    # no supplier sorts as "" (first) so cursors never have to compare NULL
+    "supplier": Coalesce(Lower("supplier__name"), Value("")),
+    "quantity": F("quantity"),
+    "reorder": F("reorder_level"),
+    "price": F("unit_price"),
+}
+
+SUPPLIER_FIELDS = {
+    "name": Lower("name"),
+    "contact_person": Lower("contact_person"),
+}
+
+TEXT_FIELDS = {"sku", "name", "category", "supplier", "contact_person"}
+
+# columns inventory_list.html renders, the supplier comes in the same query.
+# the timestamps are the row versions row_cache.py keys on
+PRODUCT_LIST_COLUMNS = (
+    "id", "sku", "name", "category", "quantity", "reorder_level", "unit_price",
+    "last_updated", "supplier__name", "supplier__last_updated",
+)
+
+
+# above this many matches the id list is too long for one IN (...) and the
+# database does the same word-prefix match instead (word_prefix_condition)
+MAX_ID_LOOKUP = 900
+
+
+def search_value(field, search_text):
+    """
+    Turn the search box text into the value a numeric field is stored as.
+    Returns None when the text can't match anything (eg. letters for quantity).
+    """
+    try:
+        return float(search_text) if field == "price" else int(search_text)
+    except ValueError:
+        return None
+
+
+def text_search(queryset, search_field, search_text):
+    """
+    Prefix/token search on a text field through search_index, eg. "bolt"
+    or "hex bo" both find "Hex Bolt M8". Product "supplier" searches the
+    supplier names.
+    """
+    model = queryset.model
+    if model is Product and search_field == "supplier":
+        index_model, index_field = Supplier, "name"
+        id_lookup, text_path = "supplier_id__in", "supplier__name"
+    elif search_index.is_indexed(model, search_field):
+        index_model, index_field = model, search_field
+        id_lookup, text_path = "pk__in", search_field
+    else:
+        return queryset.none()
+
+    ids = search_index.search(index_model, index_field, search_text)
+    if len(ids) <= MAX_ID_LOOKUP:
+        return queryset.filter(**{id_lookup: ids})
+    return word_prefix_condition(queryset, text_path, search_text)
+
+
+def word_prefix_condition(queryset, text_path, search_text):
+    """
+    search_index.TokenIndex.search in SQL: every query word must start a
+    word of the value (a word starts the value or follows a character
+    that isn't a letter or digit). Text without words matches the start
+    of the whole value.
+    """
+    words = search_index.WORD.findall(search_text.lower())
+    if not words:
+        return queryset.alias(search_text=Lower(Trim(text_path))).filter(
+            search_text__startswith=search_text.lower().strip()
+        )
+    condition = Q()
+    for word in words:
+        # words are [a-z0-9]+, nothing to escape
+        condition &= Q(**{text_path + "__iregex": r"(^|[^a-z0-9])" + word})
+    return queryset.filter(condition)
+
+
+def parse_sort(fields, sort_spec):
+    """
+    "category,-quantity,name" -> [("category", False), ("quantity", True), ("name", False)],
+    same rules as algorithms.parse_sort_spec but checked against `fields`.
+    """
+    spec = []
+    for part in (sort_spec or "").split(","):
+        part = part.strip()
+        name = part.lstrip("-").strip()
+        if name in fields and name not in dict(spec):
+            spec.append((name, part.startswith("-")))
+    return spec
+
+
+def filter_and_sort(queryset, fields, sort_field, search_field="", search_text=""):
+    """
+    ORDER BY the sort field (then id so ties are stable) and, if there is
+    search text, keep only matching rows: prefix/token search for text
+    fields, equality for numbers.
+
+    sort_field can also be a spec like "category,-quantity,name": one
+    ORDER BY over every field, "-" for descending.
+    Unknown sort fields keep id order, unknown search fields match nothing.
+    """
+    if search_text:
+        if search_field in TEXT_FIELDS:
+            queryset = text_search(queryset, search_field, search_text)
+        else:
+            expression = fields.get(search_field)
+            value = search_value(search_field, search_text)
+            if expression is None or value is None:
+                return queryset.none()
+            queryset = queryset.alias(search_key=expression).filter(search_key=value)
+
+    spec = parse_sort(fields, sort_field)
+    if not spec:
+        return queryset.order_by("id")
+    # annotate (not alias) so the pager can read the keys back off each row
+    keys = {f"sort_{i}": fields[name] for i, (name, _) in enumerate(spec)}
+    order_by = [("-" if descending else "") + f"sort_{i}" for i, (_, descending) in enumerate(spec)]
+    return queryset.annotate(**keys).order_by(*order_by, "id")
+
+
+def product_list_queryset():
+    # one query for the page, no per-row supplier lookups
+    return Product.objects.select_related("supplier").only(*PRODUCT_LIST_COLUMNS)
+
+
+def product_queryset(sort_field, search_field="", search_text=""):
+    return filter_and_sort(product_list_queryset(), PRODUCT_FIELDS,
+                           sort_field, search_field, search_text)
+
+
+def supplier_queryset(sort_field, search_field="", search_text=""):
+    return filter_and_sort(Supplier.objects.all(), SUPPLIER_FIELDS,
+                           sort_field, search_field, search_text)
@@ -0,0 +1,193 @@
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Sqrt
+
+from . import dashboard_cache, table_versions
+from .models import Product, ReorderAlert
+
+
+# Planning inputs. Daily demand and its spread come from the product's
+# DemandForecast (forecasting.py), else its DemandStats, once either covers
+# MIN_HISTORY_DAYS; the demand numbers below are the defaults before that.
+# LEAD_TIME is used for suppliers without lead_time_days. The z-score is
+# settings.REORDER_SERVICE_Z.
+SIGMA_DEMAND = 2      # std dev of daily demand
+LEAD_TIME = 5         # days
+AVG_DAILY_DEMAND = 5  # units per day
+MIN_HISTORY_DAYS = 14
+
+ALERT_FIELDS = ["quantity", "safety_stock", "reorder_point", "needs_reorder"]
+
+
+def safety_stock_expression(z, sigma_demand, lead_time):
+    # SQL version of algorithms.safety_stock, inputs are expressions
+    return z * sigma_demand * Sqrt(lead_time)
+
+
+def reorder_point_expression(lead_time, avg_daily_demand, z, sigma_demand):
+    # SQL version of algorithms.reorder_point, same argument order
+    return lead_time * avg_daily_demand + safety_stock_expression(z, sigma_demand, lead_time)
+
+
+def constant(value):
+    return Value(float(value), output_field=FloatField())
+
+
+def from_history(forecast_field, stats_field, default):
+    # the product's forecast, else its DemandStats value, with enough history
+    return Case(
+        When(demand_forecast__steps__gte=MIN_HISTORY_DAYS, then=F(forecast_field)),
+        When(demand_stats__days__gte=MIN_HISTORY_DAYS, then=F(stats_field)),
+        default=constant(default),
+        output_field=FloatField(),
+    )
+
+
+def planning_inputs():
+    """
+    Per-product (lead_time, avg_daily_demand, z, sigma_demand) as query
+    expressions, in reorder_point's argument order.
+    """
+    return (
+        Cast(Coalesce(F("supplier__lead_time_days"), LEAD_TIME), FloatField()),
+        from_history("demand_forecast__forecast", "demand_stats__mean", AVG_DAILY_DEMAND),
+        constant(settings.REORDER_SERVICE_Z),
+        from_history("demand_forecast__error", "demand_stats__std", SIGMA_DEMAND),
+    )
+
+
+def has_simulation():
+    # products with a reorder point from the nightly simulation (simulation.py)
+    return Q(demand_stats__days__gte=MIN_HISTORY_DAYS,
+             demand_stats__simulated_reorder_point__isnull=False)
+
+
+def with_reorder_values(queryset):
+    """
+    Annotate every product with safety_stock_value and reorder_point_value,
+    computed by the database in the same query. A simulated reorder point
+    wins over the formula, its safety stock is what it adds on top of the
+    expected lead-time demand.
+    """
+    lead_time, avg_daily, z, sigma = planning_inputs()
+    simulated = F("demand_stats__simulated_reorder_point")
+    # a CASE, not COALESCE(GREATEST(...)): GREATEST with a NULL is NULL on
+    # SQLite but ignores it on PostgreSQL
+    return queryset.annotate(
+        safety_stock_value=Case(
+            When(has_simulation(), then=Greatest(simulated - lead_time * avg_daily, constant(0))),
+            default=safety_stock_expression(z, sigma, lead_time),
+            output_field=FloatField(),
+        ),
+        reorder_point_value=Case(
+            When(has_simulation(), then=simulated),
+            default=reorder_point_expression(lead_time, avg_daily, z, sigma),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def alert_fields(product_id, quantity, safety_stock_value, reorder_point_value):
+    # ReorderAlert columns for one product. stock is counted in whole units
+    # so the stored points round up, needs_reorder uses the exact value
+    return {
+        "product_id": product_id,
+        "quantity": quantity,
+        "safety_stock": math.ceil(safety_stock_value),
+        "reorder_point": math.ceil(reorder_point_value),
+        "needs_reorder": quantity <= reorder_point_value,
+    }
+
+
+def computed_rows(queryset):
+    # (id, quantity, safety stock, reorder point) straight from the database
+    return with_reorder_values(queryset).values_list(
+        "id", "quantity", "safety_stock_value", "reorder_point_value"
+    )
+
+
+def refresh_alert(product_id):
+    """
+    Recompute and save the ReorderAlert of one product.
+    Complexity: two small indexed queries
+    """
+    row = computed_rows(Product.objects.filter(pk=product_id)).first()
+    if row is None:
+        return None
+    fields = alert_fields(*row)
+    alert, _ = ReorderAlert.objects.update_or_create(
+        product_id=product_id,
+        defaults={k: v for k, v in fields.items() if k != "product_id"},
+    )
+    return alert
+
+
+def refresh_alerts(product_ids, chunk_size=1000):
+    """
+    Recompute the alerts of just these products (for bulk writes that skip
+    the post_save signal).
+    """
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start:start + chunk_size]
+        save_alert_rows(computed_rows(Product.objects.filter(pk__in=chunk)))
+
+
+def rebuild_alerts(chunk_size=2000, id_range=None, progress=None):
+    """
+    Recompute every product's alert, chunk_size products at a time with one
+    bulk_create(update_conflicts=True) each. Returns the number of products
+    processed.
+
+    - id_range: (first, last) product ids, inclusive, to do one slice
+    - progress: called as progress(done, total) after every chunk
+    """
+    products = Product.objects.all()
+    if id_range is not None:
+        products = products.filter(pk__gte=id_range[0], pk__lte=id_range[1])
+    total_products = products.count() if progress else 0
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = list(computed_rows(
+            products.filter(pk__gt=last_id).order_by("id")[:chunk_size]
+        ))
+        if not rows:
+            return total
+        save_alert_rows(rows)
+        total += len(rows)
+        last_id = rows[-1][0]
+        if progress:
+            progress(total, total_products)
+
+
+def save_alert_rows(rows):
+    # rows: (id, quantity, safety stock, reorder point). one upsert on the
+    # product's unique alert row, much cheaper than bulk_update's CASE WHENs
+    alerts = [ReorderAlert(**alert_fields(*row)) for row in rows]
+    if not alerts:
+        return
+    with transaction.atomic():
+        ReorderAlert.objects.bulk_create(
+            alerts,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=ALERT_FIELDS + ["updated_at"],
+        )
+        # bulk writes don't send post_save
+        table_versions.bump(ReorderAlert)
+        dashboard_cache.invalidate(dashboard_cache.REORDER_COUNT)
+
+
+def reorder_alerts():
+    """Products that need reordering, read from the precomputed alerts."""
+    return (
+        ReorderAlert.objects
+        .filter(needs_reorder=True)
+        .select_related("product")
+        .order_by("quantity", "product_id")
+    )
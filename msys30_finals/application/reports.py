@@ -0,0 +1,91 @@
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from .catalog_io import batches
+
+
+# Streamed HTML pages: the page template is rendered once with a marker where
+# the table rows go, split there, and the rows are rendered CHUNK_SIZE at a
+# time from a .iterator() queryset in between. The first bytes go out before
+# the rows are read, and only one chunk of rows is ever in memory.
+#
+# Under ASGI a sync generator would be read to the end in a thread before
+# anything is sent, so the async views (async_views.py) use
+# astreaming_page: the same page from an async generator over
+# .aiterator(), each chunk rendered off the event loop.
+
+CHUNK_SIZE = 500
+ROWS_MARKER = "<!--stream-rows-->"
+
+
+def page_parts(request, template_name, context):
+    """(head, foot) of the page around where {{ stream_rows }} goes."""
+    page = render_to_string(
+        template_name,
+        {**context, "streaming": True, "stream_rows": mark_safe(ROWS_MARKER)},
+        request,
+    )
+    head, foot = page.split(ROWS_MARKER, 1)
+    return head, foot
+
+
+def render_stream(request, template_name, context, rows, row_template, row_context=None):
+    """
+    Yield the page head, the rendered rows chunk by chunk, then the foot.
+    The page template puts {{ stream_rows }} where the rows belong.
+    """
+    head, foot = page_parts(request, template_name, context)
+    yield head
+
+    # no request: the row chunks don't need the context processors
+    template = get_template(row_template)
+    row_context = row_context or {}
+    empty = True
+    for chunk in batches(rows, CHUNK_SIZE):
+        empty = False
+        yield template.render({**row_context, "rows": chunk})
+    if empty:
+        yield template.render({**row_context, "rows": []})
+
+    yield foot
+
+
+async def arender_stream(request, template_name, context, rows, row_template, row_context=None):
+    """render_stream for an async iterable of rows."""
+    head, foot = await sync_to_async(page_parts)(request, template_name, context)
+    yield head
+
+    template = await sync_to_async(get_template)(row_template)
+    row_context = row_context or {}
+    # row templates may read the row cache
+    render = sync_to_async(lambda chunk: template.render({**row_context, "rows": chunk}))
+    chunk = []
+    empty = True
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            empty = False
+            yield await render(chunk)
+            chunk = []
+    if chunk or empty:
+        yield await render(chunk)
+
+    yield foot
+
+
+def streaming_page(request, template_name, context, queryset, row_template, row_context=None):
+    rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+    return StreamingHttpResponse(
+        render_stream(request, template_name, context, rows, row_template, row_context),
+        content_type="text/html; charset=utf-8",
+    )
+
+
+def astreaming_page(request, template_name, context, queryset, row_template, row_context=None):
+    rows = queryset.aiterator(chunk_size=CHUNK_SIZE)
+    return StreamingHttpResponse(
+        arender_stream(request, template_name, context, rows, row_template, row_context),
+        content_type="text/html; charset=utf-8",
+    )
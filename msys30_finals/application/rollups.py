@@ -0,0 +1,189 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import CategoryRollup, Product, SupplierRollup
+
+
+# Stock totals per category and per supplier (item count, units, value,
+# low-stock count) kept in CategoryRollup / SupplierRollup, so the dashboard
+# and the valuation page read one row per group instead of aggregating all
+# of Product.
+#
+# Every write path describes its change as product rows removed and added,
+#     (category, supplier_id, quantity, unit_price, reorder_level)
+# and apply() sums them per group and writes one UPDATE per touched group:
+#     post_save / post_delete   signals.py, old row from Product.from_db
+#     stock.apply_movements     quantity before and after the delta
+#     catalog_io imports        the batch before and after the upsert
+# rebuild() recomputes the rows from Product (manage.py rebuild_rollups and
+# the nightly job), which also repairs drift from writes that skip all of
+# the above (raw fixtures, queryset updates in a shell).
+
+CENT = Decimal("0.01")
+ROW_FIELDS = ("category", "supplier_id", "quantity", "unit_price", "reorder_level")
+# the running totals apply() adds to
+TOTAL_FIELDS = ("item_count", "total_quantity", "total_value", "low_stock_count")
+
+
+def product_row(product):
+    return tuple(getattr(product, name) for name in ROW_FIELDS)
+
+
+def loaded_row(product):
+    """The row as loaded from the database, None if unknown (new or deferred)."""
+    loaded = product.loaded_values()
+    if loaded is None:
+        return None
+    # a null supplier is a real value, anything else None was deferred
+    if any(loaded[name] is None for name in ROW_FIELDS if name != "supplier_id"):
+        return None
+    return tuple(loaded[name] for name in ROW_FIELDS)
+
+
+def stock_value(quantity, unit_price):
+    # views may assign floats or strings before saving
+    if not isinstance(unit_price, Decimal):
+        unit_price = Decimal(str(unit_price))
+    return (quantity * unit_price).quantize(CENT)
+
+
+def apply(removed=(), added=()):
+    """
+    Take the `removed` product rows out of the totals and put the `added`
+    ones in. Complexity: O(rows) in python, one UPDATE per touched group.
+    """
+    by_category = defaultdict(lambda: [0, 0, Decimal("0"), 0])
+    by_supplier = defaultdict(lambda: [0, 0, Decimal("0"), 0])
+    for sign, rows in ((-1, removed), (1, added)):
+        for category, supplier_id, quantity, unit_price, reorder_level in rows:
+            delta = (sign, sign * quantity, sign * stock_value(quantity, unit_price),
+                     sign * (quantity <= reorder_level))
+            groups = [by_category[category]]
+            if supplier_id is not None:
+                groups.append(by_supplier[supplier_id])
+            for totals in groups:
+                for i, value in enumerate(delta):
+                    totals[i] += value
+
+    write_deltas(CategoryRollup, "category", by_category)
+    write_deltas(SupplierRollup, "supplier_id", by_supplier)
+
+
+def write_deltas(model, key, deltas):
+    deltas = {k: d for k, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        # make sure every group has a row to add to
+        model.objects.bulk_create([model(**{key: k}) for k in deltas], ignore_conflicts=True)
+        for k, delta in sorted(deltas.items()):
+            model.objects.filter(**{key: k}).update(
+                updated_at=now,
+                **{name: F(name) + value for name, value in zip(TOTAL_FIELDS, delta)},
+            )
+
+
+# ----------------------------
+# SIGNAL HOOKS
+# ----------------------------
+def product_saved(product, created):
+    old = None if created else loaded_row(product)
+    new = product_row(product)
+    if created:
+        apply(added=[new])
+    elif old is None:
+        # saved from a deferred instance, the old group is unknown
+        rebuild(categories=[product.category], supplier_ids=[product.supplier_id])
+    elif old != new:
+        apply(removed=[old], added=[new])
+
+
+def product_deleted(product):
+    apply(removed=[loaded_row(product) or product_row(product)])
+
+
+# ----------------------------
+# FULL REBUILD
+# ----------------------------
+def group_totals(queryset, key):
+    value = ExpressionWrapper(F("quantity") * F("unit_price"),
+                              output_field=DecimalField(max_digits=16, decimal_places=2))
+    return (
+        queryset.order_by().values(key)
+        .annotate(
+            item_count=Count("id"),
+            total_quantity=Sum("quantity"),
+            total_value=Sum(value),
+            low_stock_count=Count("id", filter=Q(quantity__lte=F("reorder_level"))),
+        )
+    )
+
+
+def rebuild_groups(model, key, selected):
+    # selected: group keys to recompute, None for all of them
+    products = Product.objects.all()
+    rows = model.objects.all()
+    if selected is not None:
+        products = products.filter(**{f"{key}__in": selected})
+        rows = rows.filter(**{f"{key}__in": selected})
+    if key == "supplier_id":
+        products = products.filter(supplier__isnull=False)
+
+    rows.delete()
+    model.objects.bulk_create([
+        model(**{key: row[key]}, **{name: row[name] or 0 for name in TOTAL_FIELDS})
+        for row in group_totals(products, key)
+    ], batch_size=1000)
+    return model.objects.count() if selected is None else len(selected)
+
+
+def rebuild(categories=None, supplier_ids=None):
+    """
+    Recompute the rollup rows from Product, all of them by default or only
+    the given categories / suppliers. Complexity: O(n) over the products in
+    those groups. Returns (category rows, supplier rows).
+    """
+    if supplier_ids is not None:
+        supplier_ids = [pk for pk in supplier_ids if pk is not None]
+    with transaction.atomic():
+        categories_done = rebuild_groups(CategoryRollup, "category", categories)
+        suppliers_done = rebuild_groups(SupplierRollup, "supplier_id", supplier_ids)
+    return categories_done, suppliers_done
+
+
+# ----------------------------
+# READS
+# ----------------------------
+def category_rows():
+    return CategoryRollup.objects.filter(item_count__gt=0).order_by("-total_value", "category")
+
+
+def supplier_rows():
+    return (
+        SupplierRollup.objects.filter(item_count__gt=0)
+        .select_related("supplier")
+        .order_by("-total_value", "supplier__name")
+    )
+
+
+def overall(categories):
+    # every product is in exactly one category, so these are the grand totals
+    totals = dict.fromkeys(TOTAL_FIELDS, 0)
+    for row in categories:
+        for name in TOTAL_FIELDS:
+            totals[name] += getattr(row, name)
+    return totals
+
+
+def unassigned(grand_totals, suppliers):
+    """Totals of the products without a supplier."""
+    totals = dict(grand_totals)
+    for row in suppliers:
+        for name in TOTAL_FIELDS:
+            totals[name] -= getattr(row, name)
+    return totals
@@ -0,0 +1,79 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+
+# Rendered table rows, cached per version of the objects they show, so a
+# list page only renders rows that changed since they were last shown.
+# A row's key covers the row template, the extra context, and the
+# (model, pk, timestamp) of the object and of every related object loaded
+# with it through select_related. Editing a product or renaming its
+# supplier moves last_updated, so the old entry is never asked for again
+# and just expires. A page reads its rows with one get_many and stores the
+# misses with one set_many.
+
+KEY_PREFIX = "row:"
+# fields read as the version of an object, the first one loaded wins
+VERSION_FIELDS = ("last_updated", "updated_at")
+
+
+def get_cache():
+    return caches[settings.ROW_CACHE_ALIAS]
+
+
+def version(obj):
+    """
+    (model, pk, timestamp, ...) of obj and its loaded related objects, None
+    when a timestamp wasn't loaded (reading it would cost a query per row).
+    """
+    stamp = next((obj.__dict__[name] for name in VERSION_FIELDS if obj.__dict__.get(name)), None)
+    if stamp is None:
+        return None
+    parts = [obj._meta.label_lower, obj.pk, stamp.isoformat()]
+    for field in obj._meta.concrete_fields:
+        if field.is_relation and field.is_cached(obj):
+            related = field.get_cached_value(obj)
+            related_version = version(related) if related is not None else ("none",)
+            if related_version is None:
+                return None
+            parts.extend(related_version)
+    return tuple(parts)
+
+
+def row_key(template_name, obj, extra):
+    row_version = version(obj) if hasattr(obj, "_meta") else None
+    if row_version is None:
+        return None
+    raw = repr((template_name, sorted(extra.items()), row_version))
+    # memcached keys are short and can't have spaces
+    return KEY_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+
+def render_rows(rows, template_name, name="row", **extra):
+    """
+    Render template_name once per row, with the row as `name` plus `extra`,
+    reusing cached HTML for rows whose version hasn't changed.
+    Complexity: one get_many, one set_many for the misses, O(misses) renders
+    """
+    template = get_template(template_name)
+    rows = list(rows)
+    timeout = settings.ROW_CACHE_TIMEOUT
+    keys = [row_key(template_name, row, extra) if timeout else None for row in rows]
+
+    cache = get_cache()
+    found = cache.get_many([key for key in keys if key]) if any(keys) else {}
+    html = []
+    rendered = {}
+    for row, key in zip(rows, keys):
+        fragment = found.get(key) if key else None
+        if fragment is None:
+            fragment = template.render({**extra, name: row})
+            if key:
+                rendered[key] = fragment
+        html.append(fragment)
+    if rendered:
+        cache.set_many(rendered, timeout)
+    return mark_safe("".join(html))
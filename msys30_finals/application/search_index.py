@@ -0,0 +1,190 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+from . import table_versions
+from .db_router import PRIMARY
+from .models import Product, Supplier
+
+
+# In-process prefix/token search for the list pages.
+#
+# Every indexed value is split into lowercase words, plus the whole value
+# as one more token, and kept as sorted (token, id) pairs. A prefix lookup
+# is a bisect to the first token >= prefix and a scan while tokens still
+# start with it, so "bolt" finds "Hex Bolt M8" and "hex bo" finds it too
+# (every word of the query must prefix-match some word of the value).
+#
+# Each process builds its indexes on first use and keeps them as of a
+# marker, its table's TableVersion (table_versions.py), read before every
+# search with one primary key lookup. Every write bumps it, in the same
+# transaction, so a marker that moved means rows were written, by this
+# process or any other:
+#     newer version       re-read the rows with last_updated from the
+#                         latest the index has seen on (indexed)
+#     a delete            rebuild, deletes are rare
+#     anything else       rebuild (the version went back, eg. a restore)
+# Only committed rows are read, so nothing rolled back is ever indexed.
+# Writes that bump the version but keep last_updated are only seen after a
+# rebuild, call invalidate() after them. The index reads the primary
+# database even on replica pages (db_router.py).
+
+INDEXED_FIELDS = {
+    Product: ("sku", "name", "category"),
+    Supplier: ("name", "contact_person"),
+}
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    text = (text or "").lower().strip()
+    tokens = set(WORD.findall(text))
+    if text:
+        tokens.add(text)
+    return tokens
+
+
+# more changed rows than this and a rebuild beats inserting them one by one
+MAX_CATCH_UP = 1000
+
+
+def rows_of(model):
+    return model.objects.using(PRIMARY)
+
+
+def read_marker(model):
+    version = table_versions.read(model, using=PRIMARY)[model]
+    return version.version, version.deletes, version.changed_at
+
+
+class TokenIndex:
+    """Sorted (token, id) pairs for one model field."""
+
+    def __init__(self):
+        self.entries = []
+        self.tokens_by_id = {}
+        self.marker = None
+        # newest last_updated read, catch_up starts there
+        self.latest = None
+
+    def build(self, rows, marker=None):
+        # rows: (id, text, last_updated)
+        entries = []
+        tokens_by_id = {}
+        latest = None
+        for pk, text, updated in rows:
+            tokens = tokenize(text)
+            tokens_by_id[pk] = tokens
+            entries.extend((token, pk) for token in tokens)
+            latest = updated if latest is None else max(latest, updated)
+        entries.sort()
+        self.entries = entries
+        self.tokens_by_id = tokens_by_id
+        self.marker = marker
+        self.latest = latest
+
+    def catch_up(self, model, field, marker):
+        """
+        Bring the index up to `marker` from the rows written since it last
+        looked. False when only a rebuild can (see the comment at the top).
+        Complexity: one indexed range query, O(changed rows * log n)
+        """
+        if self.marker == marker:
+            return True
+        if self.marker is None:
+            return False
+        version, deletes, _ = marker
+        seen_version, seen_deletes, _ = self.marker
+        if version <= seen_version or deletes != seen_deletes:
+            return False
+        changed = rows_of(model).values_list("id", field, "last_updated")
+        if self.latest is not None:
+            # >=: rows saved within the same instant as the latest seen
+            changed = changed.filter(last_updated__gte=self.latest)
+        changed = list(changed.order_by()[:MAX_CATCH_UP + 1])
+        if len(changed) > MAX_CATCH_UP:
+            return False
+        for pk, text, updated in changed:
+            self.add(pk, text)
+            self.latest = updated if self.latest is None else max(self.latest, updated)
+        self.marker = marker
+        return True
+
+    def add(self, pk, text):
+        self.remove(pk)
+        tokens = tokenize(text)
+        self.tokens_by_id[pk] = tokens
+        for token in tokens:
+            insort(self.entries, (token, pk))
+
+    def remove(self, pk):
+        for token in self.tokens_by_id.pop(pk, ()):
+            i = bisect_left(self.entries, (token, pk))
+            if i < len(self.entries) and self.entries[i] == (token, pk):
+                del self.entries[i]
+
+    def prefix_ids(self, prefix):
+        """
+        ids with a token starting with prefix.
+        Complexity: O(log n + matches)
+        """
+        ids = set()
+        entries = self.entries
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            ids.add(entries[i][1])
+            i += 1
+        return ids
+
+    def search(self, query):
+        # ids where every query word prefix-matches one of the value's tokens
+        words = WORD.findall(query.lower())
+        if not words:
+            return self.prefix_ids(query.lower().strip())
+        # rarest-looking (longest) word first keeps the intersections small
+        words.sort(key=len, reverse=True)
+        ids = self.prefix_ids(words[0])
+        for word in words[1:]:
+            if not ids:
+                break
+            ids &= self.prefix_ids(word)
+        return ids
+
+
+# held while an index is caught up and while it is searched, catch_up
+# edits the entries in place
+_lock = threading.Lock()
+_indexes = {}
+
+
+def current_index(model, field, marker):
+    # with _lock held
+    index = _indexes.get((model, field))
+    if index is None or not index.catch_up(model, field, marker):
+        index = TokenIndex()
+        # rows written after the marker was read are picked up next time
+        index.build(
+            rows_of(model).values_list("id", field, "last_updated").iterator(chunk_size=5000), marker
+        )
+        _indexes[(model, field)] = index
+    return index
+
+
+def is_indexed(model, field):
+    return field in INDEXED_FIELDS.get(model, ())
+
+
+def search(model, field, query):
+    """ids of `model` rows whose `field` matches the search text."""
+    marker = read_marker(model)
+    with _lock:
+        return current_index(model, field, marker).search(query)
+
+
+def invalidate(model=None):
+    # drop the indexes (all, or one model's) so the next search rebuilds them
+    with _lock:
+        for key in list(_indexes):
+            if model is None or key[0] is model:
+                del _indexes[key]
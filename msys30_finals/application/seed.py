@@ -0,0 +1,121 @@
+import random
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import dashboard_cache, rollups, table_versions
+from .models import (
+    DemandForecast, DemandStats, Product, PurchaseOrder, PurchaseOrderLine, ReorderAlert, StockMovement,
+    Supplier, SupplierRollup,
+)
+from .reorder import rebuild_alerts
+
+
+# Synthetic catalog for load tests and benchmarks. The same (suppliers,
+# products, seed) always gives the same rows, so runs can be compared.
+
+CATEGORIES = [
+    "Fasteners", "Tools", "Paint", "Plumbing", "Electrical", "Lumber",
+    "Hardware", "Garden", "Adhesives", "Safety", "Lighting", "Storage",
+]
+ITEM_WORDS = [
+    "Hex", "Bolt", "Nut", "Washer", "Screw", "Hinge", "Bracket", "Pipe", "Elbow",
+    "Valve", "Cable", "Switch", "Socket", "Brush", "Roller", "Primer", "Tape",
+    "Glue", "Drill", "Bit", "Saw", "Blade", "Clamp", "Hook", "Chain", "Gloves",
+]
+
+
+# children before the rows they point at
+CLEAR_ORDER = [
+    PurchaseOrderLine, PurchaseOrder, StockMovement, DemandStats, DemandForecast,
+    ReorderAlert, SupplierRollup, Product, Supplier,
+]
+
+
+def clear_inventory():
+    """
+    Delete the whole catalog with one DELETE per table, children first.
+    QuerySet.delete() would load every product, alert and supplier to send
+    their delete signals one row at a time. Complexity: O(1) queries.
+    """
+    # what those signals do, done by hand: alerts and supplier rollups go
+    # with their tables, rollups.rebuild empties the category rollups, the
+    # table versions move (search index, API ETags) and the dashboard
+    # entries are dropped. row_cache keys carry row versions, nothing to reset
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in CLEAR_ORDER:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+        rollups.rebuild()
+        for model in (Product, Supplier, ReorderAlert):
+            table_versions.bump(model, deleted=True)
+
+    dashboard_cache.invalidate(
+        dashboard_cache.TOTALS, dashboard_cache.CATEGORY_SUMMARY, dashboard_cache.REORDER_COUNT
+    )
+
+
+def make_suppliers(count, rng):
+    return [
+        Supplier(
+            name=f"Supplier {i:05d}",
+            contact_person=f"Contact {rng.randrange(10 * count):06d}",
+            phone=f"09{rng.randrange(10 ** 9):09d}",
+            email=f"orders{i}@supplier{i}.example",
+            address=f"{rng.randrange(1, 999)} Industrial Ave",
+            lead_time_days=rng.choice([None, 2, 3, 5, 7, 10, 14]),
+        )
+        for i in range(count)
+    ]
+
+
+def make_product(i, rng, supplier_ids):
+    quantity = rng.randrange(0, 500)
+    return Product(
+        sku=f"SKU{i:07d}",
+        name=f"{rng.choice(ITEM_WORDS)} {rng.choice(ITEM_WORDS)} {rng.randrange(1000):03d}",
+        category=rng.choice(CATEGORIES),
+        # about 1 in 20 products has no supplier
+        supplier_id=rng.choice(supplier_ids) if supplier_ids and rng.random() > 0.05 else None,
+        quantity=quantity,
+        reorder_level=rng.randrange(0, 50),
+        unit_price=Decimal(rng.randrange(50, 500000)) / 100,
+    )
+
+
+def seed_inventory(suppliers, products, seed=30, batch_size=5000):
+    """
+    Insert `suppliers` suppliers and `products` products with bulk_create,
+    plus an opening RECEIPT movement per stocked product, then rebuild the
+    reorder alerts and stock rollups. Expects an empty catalog (see clear_inventory).
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    day = timezone.localdate(now)
+
+    with transaction.atomic():
+        Supplier.objects.bulk_create(make_suppliers(suppliers, rng), batch_size=batch_size)
+        supplier_ids = list(Supplier.objects.order_by("id").values_list("id", flat=True))
+
+        for start in range(0, products, batch_size):
+            batch = [
+                make_product(i, rng, supplier_ids)
+                for i in range(start, min(start + batch_size, products))
+            ]
+            Product.objects.bulk_create(batch)
+            ids = dict(Product.objects.filter(sku__in=[p.sku for p in batch]).values_list("sku", "id"))
+            StockMovement.objects.bulk_create([
+                StockMovement(product_id=ids[p.sku], kind=StockMovement.RECEIPT,
+                              quantity=p.quantity, created_at=now, day=day)
+                for p in batch if p.quantity
+            ])
+
+        rebuild_alerts()
+        rollups.rebuild()
+        table_versions.bump(Product)
+        table_versions.bump(Supplier)
+
+    # bulk writes skip the model signals
+    dashboard_cache.invalidate(
+        dashboard_cache.TOTALS, dashboard_cache.CATEGORY_SUMMARY, dashboard_cache.REORDER_COUNT
+    )
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import dashboard_cache, metrics, rollups, table_versions
+from .models import Product, Supplier, ReorderAlert
+from .reorder import refresh_alert, refresh_alerts
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    # covers the add/edit views and the admin. deletes cascade to the alert
+    if raw:
+        return
+    if created or instance.stock_changed():
+        refresh_alert(instance.pk)
+    rollups.product_saved(instance, created)
+    instance.remember_stock()
+
+    if created:
+        dashboard_cache.invalidate(dashboard_cache.TOTALS, dashboard_cache.CATEGORY_SUMMARY)
+    else:
+        dashboard_cache.invalidate(dashboard_cache.CATEGORY_SUMMARY)
+
+
+@receiver(post_save, sender=Supplier)
+def supplier_saved(sender, instance, created, raw=False, **kwargs):
+    # lead time feeds the reorder point of every product from this supplier
+    if raw:
+        return
+    if not created and instance.lead_time_changed():
+        refresh_alerts(instance.product_set.values_list("id", flat=True))
+    instance.remember_lead_time()
+
+
+@receiver(pre_delete, sender=Supplier)
+def supplier_deleting(sender, instance, **kwargs):
+    # its products go back to the default lead time (SET_NULL), read them
+    # before the delete unlinks them
+    instance._product_ids = list(instance.product_set.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Supplier)
+def supplier_deleted(sender, instance, **kwargs):
+    refresh_alerts(getattr(instance, "_product_ids", ()))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    rollups.product_deleted(instance)
+    dashboard_cache.invalidate(dashboard_cache.TOTALS, dashboard_cache.CATEGORY_SUMMARY)
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def supplier_count_changed(sender, instance, created=True, raw=False, **kwargs):
+    # renames don't change the supplier count
+    if created and not raw:
+        dashboard_cache.invalidate(dashboard_cache.TOTALS)
+
+
+@receiver(post_save, sender=ReorderAlert)
+@receiver(post_delete, sender=ReorderAlert)
+def alert_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        dashboard_cache.invalidate(dashboard_cache.REORDER_COUNT)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=ReorderAlert)
+def table_saved(sender, instance, **kwargs):
+    table_versions.bump(sender)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=ReorderAlert)
+def table_deleted(sender, instance, **kwargs):
+    table_versions.bump(sender, deleted=True)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    # see SQLITE_PRAGMAS in settings.py
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # DB timings for middleware.PerformanceMiddleware
+    if settings.PERF_SAMPLE_RATE > 0:
+        metrics.instrument(connection)
@@ -0,0 +1,205 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, FloatField, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, without it reorder.py keeps the z-score formula
+    np = None
+
+from .models import DemandStats
+from .purchasing import ORDER_UP_TO
+from .reorder import LEAD_TIME, MIN_HISTORY_DAYS
+
+
+# Monte Carlo reorder points for products with MIN_HISTORY_DAYS of demand.
+# algorithms.safety_stock assumes normal demand, which over-stocks steady
+# sellers and runs lumpy, intermittent ones out.
+#
+# A day has demand with probability p = demand_days / days, and then a
+# Gamma(k, theta) sized amount matching the mean daily demand (the
+# forecast when there is one, see forecasting.py) and DemandStats' std. Over a
+# lead time of L days (Gamma around lead_time_days, settings.LEAD_TIME_CV):
+#     N ~ Binomial(L, p) demand days,   D ~ Gamma(N * k, theta) units
+# since N Gamma(k, theta) sizes add up to Gamma(N * k, theta). Each product
+# gets `scenarios` draws of D, a chunk of products is one
+# (products x scenarios) array.
+#
+# Reordering at R with orders of Q = (ORDER_UP_TO - 1) * R units (what
+# purchasing.order_quantity asks for), the fill rate is
+#     1 - E[max(D - R, 0)] / Q
+# which rises with R, so a binary search over every row at once finds the
+# smallest whole R reaching settings.REORDER_FILL_RATE.
+#
+# Chunks run in a process pool. Each seeds its generator from (seed, chunk
+# number), so the result doesn't depend on the number of workers.
+
+# the input columns of a chunk, after the product id
+INPUT_COLUMNS = ("demand_rate", "std", "days", "demand_days", "lead_time")
+
+
+def available():
+    return np is not None
+
+
+def load_inputs():
+    # one row per product with enough history, in id order
+    return list(
+        DemandStats.objects
+        .filter(days__gte=MIN_HISTORY_DAYS)
+        .annotate(
+            lead_time=Coalesce(F("product__supplier__lead_time_days"), LEAD_TIME),
+            demand_rate=Case(
+                When(product__demand_forecast__steps__gte=MIN_HISTORY_DAYS,
+                     then=F("product__demand_forecast__forecast")),
+                default=F("mean"),
+                output_field=FloatField(),
+            ),
+        )
+        .order_by("product_id")
+        .values_list("product_id", *INPUT_COLUMNS)
+    )
+
+
+# ----------------------------
+# VECTORISED MODEL
+# ----------------------------
+def demand_parameters(mean, std, days, demand_days):
+    """
+    Per-product demand probability p and Gamma shape/scale of the demand on
+    days that have any. Rows counted before demand_days existed have 0
+    there and are treated as demand every day.
+    """
+    p = np.where(demand_days > 0, demand_days / np.maximum(days, 1), 1.0)
+    p = np.clip(p, 1e-6, 1.0)
+    size_mean = mean / p
+    # E[size^2] = E[daily^2] / p
+    size_var = (std ** 2 + mean ** 2) / p - size_mean ** 2
+    size_var = np.maximum(size_var, 1e-6 * size_mean ** 2 + 1e-12)
+    shape = size_mean ** 2 / size_var
+    scale = size_var / np.maximum(size_mean, 1e-12)
+    return p, shape, scale
+
+
+def lead_time_draws(lead_time, cv, scenarios, rng):
+    # whole days, at least one
+    if cv <= 0:
+        draws = np.repeat(lead_time[:, None], scenarios, axis=1)
+    else:
+        draws = rng.gamma(1 / cv ** 2, (lead_time * cv ** 2)[:, None],
+                          size=(len(lead_time), scenarios))
+    return np.maximum(np.rint(draws), 1).astype(np.int64)
+
+
+def lead_time_demand(inputs, scenarios, cv, rng):
+    """(products x scenarios) array of demand over one lead time."""
+    mean, std, days, demand_days, lead_time = inputs.T
+    p, shape, scale = demand_parameters(mean, std, days, demand_days)
+    demand_count = rng.binomial(lead_time_draws(lead_time, cv, scenarios, rng), p[:, None])
+    # shape 0 (no demand days) draws 0
+    return rng.gamma(demand_count * shape[:, None], scale[:, None])
+
+
+def fill_rate(demand, reorder_points):
+    """Share of demand served from stock when reordering at reorder_points."""
+    order = np.maximum((ORDER_UP_TO - 1) * reorder_points, 1.0)
+    short = np.maximum(demand - reorder_points[:, None], 0.0).mean(axis=1)
+    return 1.0 - short / order
+
+
+def smallest_reorder_points(demand, target):
+    """
+    Smallest whole reorder point per row with fill_rate >= target.
+    Complexity: O(products * scenarios * log(max demand))
+    """
+    low = np.zeros(len(demand))
+    # nothing is ever short at the largest draw
+    high = np.ceil(demand.max(axis=1))
+    while True:
+        active = low < high
+        if not active.any():
+            return low
+        mid = np.floor((low + high) / 2)
+        reached = fill_rate(demand, mid) >= target
+        high = np.where(active & reached, mid, high)
+        low = np.where(active & ~reached, mid + 1, low)
+
+
+def simulate_chunk(task):
+    """
+    Run in a pool process: (chunk number, inputs, scenarios, target, cv,
+    seed) -> (reorder points, their fill rates). Pure numpy, no database.
+    """
+    number, inputs, scenarios, target, cv, seed = task
+    rng = np.random.default_rng([seed, number])
+    demand = lead_time_demand(inputs, scenarios, cv, rng)
+    points = smallest_reorder_points(demand, target)
+    return points, fill_rate(demand, points)
+
+
+# ----------------------------
+# RUN OVER THE CATALOG
+# ----------------------------
+def simulate_reorder_points(scenarios=None, fill_rate_target=None, workers=None,
+                            chunk_size=250, seed=0, progress=None):
+    """
+    Simulate every product with enough history and save the reorder points
+    on its DemandStats. Returns the number of products simulated.
+
+    - scenarios, fill_rate_target, workers: default to the settings
+    - chunk_size: products per pool task (memory is about
+      24 bytes * chunk_size * scenarios per worker)
+    - progress: called as progress(done, total) after every chunk
+    Run reorder.rebuild_alerts afterwards to use the new points.
+    """
+    if np is None:
+        raise RuntimeError("the reorder simulation needs numpy")
+    scenarios = scenarios or settings.SIMULATION_SCENARIOS
+    target = min(fill_rate_target or settings.REORDER_FILL_RATE, 1.0)
+    workers = workers or settings.SIMULATION_WORKERS
+
+    rows = load_inputs()
+    if not rows:
+        return 0
+    product_ids = [row[0] for row in rows]
+    inputs = np.asarray([row[1:] for row in rows], dtype=np.float64)
+    tasks = [
+        (number, inputs[start:start + chunk_size], scenarios, target,
+         settings.LEAD_TIME_CV, seed)
+        for number, start in enumerate(range(0, len(rows), chunk_size))
+    ]
+
+    if workers <= 1 or len(tasks) == 1:
+        save_results(product_ids, map(simulate_chunk, tasks), chunk_size, progress)
+    else:
+        # forked children would share these open handles
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            save_results(product_ids, pool.map(simulate_chunk, tasks), chunk_size, progress)
+    return len(rows)
+
+
+def save_results(product_ids, results, chunk_size, progress=None):
+    # results arrive in chunk order
+    now = timezone.now()
+    done = 0
+    for number, (points, rates) in enumerate(results):
+        chunk = product_ids[number * chunk_size:(number + 1) * chunk_size]
+        with transaction.atomic():
+            DemandStats.objects.bulk_create(
+                [
+                    DemandStats(product_id=product_id, simulated_reorder_point=float(point),
+                                simulated_fill_rate=float(rate), simulated_at=now)
+                    for product_id, point, rate in zip(chunk, points, rates)
+                ],
+                update_conflicts=True,
+                unique_fields=["product"],
+                update_fields=["simulated_reorder_point", "simulated_fill_rate", "simulated_at"],
+            )
+        done += len(chunk)
+        if progress:
+            progress(done, len(product_ids))
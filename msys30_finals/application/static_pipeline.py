@@ -0,0 +1,141 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.apps import StaticFilesConfig
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are always written
+    brotli = None
+
+
+# Static files without a separate web server (settings.STATIC_PIPELINE):
+#
+#     manage.py collectstatic   copies the used files into STATIC_ROOT with a
+#                               content hash in the name, plus .br / .gz next
+#                               to every text file
+#     serve()                   answers STATIC_URL from STATIC_ROOT, picks the
+#                               smallest variant the client accepts, and marks
+#                               hashed names immutable for a year
+#
+# A changed file gets a new hashed name, so browsers never revalidate.
+
+# the bootstrap files the templates don't link, left out of collectstatic
+UNUSED_BOOTSTRAP = [
+    "*.rtl.*", "bootstrap-grid*", "bootstrap-reboot*", "bootstrap-utilities*",
+    "bootstrap.esm*", "bootstrap.css", "bootstrap.css.map", "bootstrap.js", "bootstrap.js.map",
+    "bootstrap.min.js", "bootstrap.min.js.map", "bootstrap.bundle.js", "bootstrap.bundle.js.map",
+]
+
+COMPRESSIBLE = (".css", ".js", ".map", ".svg", ".txt", ".json", ".html", ".xml")
+# preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+# name.<12 hex digits>.ext, as written by ManifestStaticFilesStorage
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+
+
+class StaticFiles(StaticFilesConfig):
+    # replaces django.contrib.staticfiles in INSTALLED_APPS
+    ignore_patterns = StaticFilesConfig.ignore_patterns + UNUSED_BOOTSTRAP
+
+
+# ----------------------------
+# COLLECTSTATIC
+# ----------------------------
+def compress(path):
+    """Write path.gz (and path.br with brotli) when smaller than the file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """Hashed names from the manifest storage, then compressed variants."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # the plain copies are still served when DEBUG skips the hashed names
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE):
+                compress(self.path(name))
+
+
+# ----------------------------
+# SERVING
+# ----------------------------
+def accepted_encodings(header):
+    # "gzip, deflate, br;q=0.5" -> {"gzip", "deflate", "br"}, q=0 means no
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+@require_safe
+def serve(request, path):
+    """Serve a collected file, precompressed if the client takes it."""
+    if path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    served, encoding = fullpath, None
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(fullpath + suffix):
+            served, encoding = fullpath + suffix, coding
+            break
+
+    stat = os.stat(served)
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        # the type of the file itself, not of its .br / .gz variant
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response = FileResponse(open(served, "rb"), content_type=content_type or "application/octet-stream")
+        # FileResponse names the open file in Content-Disposition, assets aren't downloads
+        response.headers.pop("Content-Disposition", None)
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        if encoding:
+            response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["Cache-Control"] = IMMUTABLE if HASHED_NAME.search(path) else REVALIDATE
+    return response
@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import dashboard_cache, rollups, table_versions
+from .demand import record_issues
+from .models import Product, StockMovement
+from .reorder import refresh_alerts
+
+
+# Stock changes as deltas applied by the database:
+#     UPDATE product SET quantity = quantity + delta WHERE id = ...
+# so two clerks (or a clerk and a scanner) changing the same SKU can't
+# overwrite each other, and only the quantity column is written. The CHECK
+# (quantity >= 0) constraint on Product.quantity rejects anything that would
+# go negative.
+
+class StockError(Exception):
+    pass
+
+
+class UnknownProduct(StockError):
+    def __init__(self, product_id):
+        super().__init__(f"product {product_id} does not exist")
+        self.product_id = product_id
+
+
+class InsufficientStock(StockError):
+    def __init__(self, product_id, change):
+        super().__init__(f"not enough stock of product {product_id} for a change of {change:+d}")
+        self.product_id = product_id
+        self.change = change
+
+
+KINDS = {kind for kind, _ in StockMovement.KIND_CHOICES}
+
+
+def apply_movements(movements, when=None):
+    """
+    Apply many stock movements in one transaction, all or nothing.
+
+    - movements: (product_id, quantity change, kind) tuples, kind is one of
+      StockMovement.RECEIPT / ISSUE / ADJUSTMENT
+    Changes to the same product are summed into one UPDATE. Every movement is
+    written to the ledger, issues update the demand stats, and the reorder
+    alerts and stock rollups of the touched products are refreshed.
+
+    Returns {product_id: new quantity}.
+    Raises UnknownProduct / InsufficientStock (nothing is applied).
+    """
+    movements = list(movements)
+    when = when or timezone.now()
+    day = timezone.localdate(when)
+
+    totals = defaultdict(int)
+    for product_id, change, kind in movements:
+        if kind not in KINDS:
+            raise StockError(f"unknown movement kind {kind!r}")
+        totals[product_id] += change
+
+    with transaction.atomic():
+        # in id order so concurrent batches lock rows in the same order
+        for product_id in sorted(totals):
+            change = totals[product_id]
+            try:
+                with transaction.atomic():
+                    # last_updated is when the row changed, not the (maybe
+                    # backdated) movement time: row_cache keys on it
+                    updated = Product.objects.filter(pk=product_id).update(
+                        quantity=F("quantity") + change, last_updated=timezone.now()
+                    )
+            except IntegrityError:
+                raise InsufficientStock(product_id, change)
+            if not updated:
+                raise UnknownProduct(product_id)
+
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=product_id, kind=kind, quantity=change,
+                          created_at=when, day=day)
+            for product_id, change, kind in movements if change
+        ])
+        record_issues([
+            (product_id, day, -change)
+            for product_id, change, kind in movements
+            if kind == StockMovement.ISSUE and change < 0
+        ])
+        refresh_alerts(list(totals))
+
+        # .update() skips post_save. the UPDATE added exactly `change`, so
+        # the quantity before it is known without reading it first
+        rows = Product.objects.filter(pk__in=list(totals)).values_list("id", *rollups.ROW_FIELDS)
+        new_quantities = {}
+        removed, added = [], []
+        for product_id, category, supplier_id, quantity, unit_price, reorder_level in rows:
+            new_quantities[product_id] = quantity
+            removed.append((category, supplier_id, quantity - totals[product_id], unit_price, reorder_level))
+            added.append((category, supplier_id, quantity, unit_price, reorder_level))
+        rollups.apply(removed, added)
+        table_versions.bump(Product)
+        dashboard_cache.invalidate(dashboard_cache.CATEGORY_SUMMARY)
+
+        return new_quantities
+
+
+def adjust_stock(product_id, change, kind=StockMovement.ADJUSTMENT, when=None):
+    """Apply one movement, returns the product's new quantity."""
+    return apply_movements([(product_id, change, kind)], when=when)[product_id]
@@ -0,0 +1,43 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Product, ReorderAlert, Supplier, TableVersion
+
+
+# One TableVersion row per table, so "did anything change" is a primary
+# key lookup instead of an aggregate over the table. Every write bumps
+# its table's row inside the write's own transaction, so the new version
+# commits (or rolls back) together with the rows:
+#     saves and deletes   signals.py
+#     bulk writes         catalog_io, seed, stock.apply_movements,
+#                         reorder.save_alert_rows
+# A write that skips both (queryset.update in a shell) must call bump()
+# itself. Concurrent writers to one table queue on its row until commit.
+# Read by search_index (is the index current) and api (ETags).
+
+NAMES = {
+    Product: "products",
+    Supplier: "suppliers",
+    ReorderAlert: "reorder",
+}
+
+
+def bump(model, deleted=False):
+    changes = {"version": F("version") + 1, "changed_at": timezone.now()}
+    if deleted:
+        changes["deletes"] = F("deletes") + 1
+    rows = TableVersion.objects.filter(name=NAMES[model])
+    if not rows.update(**changes):
+        # first write since the table was emptied (a new database, a test flush)
+        TableVersion.objects.get_or_create(name=NAMES[model])
+        rows.update(**changes)
+
+
+def read(*models, using=None):
+    """
+    {model: TableVersion} for the given models in one query, unsaved
+    version 0 rows for tables never written to.
+    """
+    names = [NAMES[model] for model in models]
+    found = {v.name: v for v in TableVersion.objects.using(using).filter(name__in=names)}
+    return {model: found.get(NAMES[model]) or TableVersion(name=NAMES[model]) for model in models}
@@ -0,0 +1,11 @@
+from django import template
+
+from application import row_cache
+
+register = template.Library()
+
+
+@register.simple_tag
+def cached_rows(rows, template_name, name="row", **extra):
+    """{% cached_rows products "myapp/partials/product_row.html" name="p" report=report %}"""
+    return row_cache.render_rows(rows, template_name, name, **extra)
@@ -1,3 +1,1514 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import tempfile
+import datetime
+import threading
+import time
+from types import SimpleNamespace
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, transaction
+from django.http import Http404, HttpResponse
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import (
+    algorithms, async_views, catalog_io, dashboard_cache, db_router, demand, forecasting, jobs,
+    metrics, queries, reorder, reports, rollups, row_cache, search_index, seed, static_pipeline, stock,
+    table_versions,
+)
+from .management.commands import run_jobs
+from .middleware import PerformanceMiddleware, ReadReplicaMiddleware
+from .models import (
+    CategoryRollup, DemandForecast, DemandStats, Job, Product, PurchaseOrder, PurchaseOrderLine, ReorderAlert,
+    StockMovement, Supplier, SupplierRollup,
+)
+from .pagination import encode_cursor, keyset_page
+
+
+class InventoryListQueryCountTests(TestCase):
+    """The product list must not do one supplier lookup per row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        suppliers = [Supplier.objects.create(name=f"Supplier {i}") for i in range(3)]
+        for i in range(12):
+            Product.objects.create(
+                sku=f"SKU{i:03d}",
+                name=f"Item {i}",
+                category="Tools",
+                supplier=suppliers[i % 3] if i % 4 else None,
+                quantity=i,
+                unit_price="9.99",
+            )
+
+    def test_list_page_query_count_is_constant(self):
+        for sort in ("name", "supplier", "quantity"):
+            with self.subTest(sort=sort), self.assertNumQueries(1):
+                response = self.client.get("/inventory/", {"sort": sort})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context["products"]), 12)
+
+    def test_search_by_supplier_query_count(self):
+        params = {"sort": "supplier", "search_field": "supplier", "search_query": "supplier 1"}
+        search_index.invalidate()
+        self.client.get("/inventory/", params)  # builds the search index once
+        # the page and the index's TableVersion lookup
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get("/inventory/", params)
+        self.assertNotIn("COUNT(", " ".join(q["sql"] for q in queries.captured_queries))
+        self.assertEqual(len(response.context["products"]), 3)
+
+    def test_missing_supplier_sorts_first(self):
+        response = self.client.get("/inventory/", {"sort": "supplier"})
+        products = response.context["products"]
+        self.assertEqual([p.supplier for p in products[:3]], [None, None, None])
+
+    @override_settings(INVENTORY_QUERY_MODE="python")
+    def test_python_fallback_handles_missing_supplier(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/inventory/", {"sort": "supplier"})
+        products = response.context["products"]
+        self.assertEqual(len(products), 12)
+        self.assertIsNone(products[0].supplier)
+
+
+class SearchIndexTests(TestCase):
+    """The index follows rows written without this process' signals, through TableVersion."""
+
+    def setUp(self):
+        search_index.invalidate()
+        Product.objects.create(sku="BOLT1", name="Hex Bolt M8", category="Fasteners", unit_price="1.00")
+        Product.objects.create(sku="NUT1", name="Wing Nut", category="Fasteners", unit_price="1.00")
+        self.assertEqual(self.search("bolt"), {"BOLT1"})
+
+    def search(self, text, field="name"):
+        ids = search_index.search(Product, field, text)
+        return set(Product.objects.filter(pk__in=ids).values_list("sku", flat=True))
+
+    def test_bulk_created_rows_are_found(self):
+        # what seed_inventory / another worker do
+        Product.objects.bulk_create([
+            Product(sku="BOLT2", name="Carriage Bolt", category="Fasteners", unit_price="2.00"),
+        ])
+        table_versions.bump(Product)
+        self.assertEqual(self.search("bolt"), {"BOLT1", "BOLT2"})
+
+    def test_imported_rows_are_found(self):
+        catalog_io.import_products(enumerate([
+            {"sku": "BOLT2", "name": "Carriage Bolt", "unit_price": "2.00"},
+            {"sku": "NUT1", "name": "Lock Nut", "unit_price": "1.00"},
+        ], start=2))
+        self.assertEqual(self.search("bolt"), {"BOLT1", "BOLT2"})
+        self.assertEqual(self.search("lock"), {"NUT1"})
+
+    def test_renamed_rows_are_reindexed(self):
+        Product.objects.filter(sku="NUT1").update(name="Lock Bolt", last_updated=timezone.now())
+        table_versions.bump(Product)
+        self.assertEqual(self.search("bolt"), {"BOLT1", "NUT1"})
+        self.assertEqual(self.search("wing"), set())
+
+    def test_unchanged_version_skips_the_table(self):
+        self.search("bolt")
+        with CaptureQueriesContext(connection) as queries:
+            self.search("nut")
+        # the TableVersion lookup, then the sku query in self.search
+        self.assertEqual(len(queries), 2)
+        self.assertIn("application_tableversion", queries[0]["sql"])
+
+    def test_deleted_rows_drop_out(self):
+        Product.objects.filter(sku="BOLT1").delete()
+        self.assertEqual(self.search("bolt"), set())
+        self.assertEqual(self.search("nut"), {"NUT1"})
+
+    def test_rolled_back_save_is_not_indexed(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Product.objects.create(sku="BOLT3", name="Eye Bolt", unit_price="1.00")
+            raise RuntimeError
+        self.assertEqual(self.search("bolt"), {"BOLT1"})
+
+    def test_many_matches_give_the_same_results(self):
+        Product.objects.create(sku="BOLT4", name="Bolt-cutter", category="Tools", unit_price="1.00")
+        Product.objects.create(sku="BOLT5", name="Thunderbolt", category="Tools", unit_price="1.00")
+        for text in ("bolt", "hex bo", "cutter", "-", "m8"):
+            with self.subTest(text=text):
+                indexed = set(queries.product_queryset("name", "name", text).values_list("sku", flat=True))
+                with mock.patch.object(queries, "MAX_ID_LOOKUP", 0):
+                    fallback = set(queries.product_queryset("name", "name", text).values_list("sku", flat=True))
+                self.assertEqual(indexed, fallback)
+
+
+@mock.patch.object(db_router, "replica_is_primary", lambda: False)
+@mock.patch.object(db_router, "replica_configured", lambda: True)
+class ReadReplicaTests(TestCase):
+    """Routing with a replica configured (the test database has none)."""
+
+    router = db_router.ReadReplicaRouter()
+
+    def tearDown(self):
+        db_router.use_default()
+
+    def request(self, method, view, status=200, cookies=None):
+        # runs `view` through the middleware, returns (read alias in the view, response)
+        seen = {}
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            seen["alias"] = self.router.db_for_read(Product)
+            return HttpResponse(status=status)
+
+        middleware = ReadReplicaMiddleware(get_response)
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies or {})
+        response = middleware(request)
+        return seen["alias"], response
+
+    def test_router(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+        db_router.use_replica()
+        self.assertEqual(self.router.db_for_read(Product), db_router.REPLICA)
+        self.assertEqual(self.router.db_for_write(Product), db_router.PRIMARY)
+        # related rows come from the database their object did
+        product = Product(sku="X")
+        product._state.db = db_router.PRIMARY
+        self.assertEqual(self.router.db_for_read(Supplier, instance=product), db_router.PRIMARY)
+        self.assertFalse(self.router.allow_migrate(db_router.REPLICA, "application"))
+        self.assertTrue(self.router.allow_migrate(db_router.PRIMARY, "application"))
+
+    def test_marked_views_read_the_replica(self):
+        marked = db_router.reads_replica(lambda request: None)
+        unmarked = lambda request: None  # noqa: E731
+        self.assertEqual(self.request("get", marked)[0], db_router.REPLICA)
+        self.assertEqual(self.request("head", marked)[0], db_router.REPLICA)
+        self.assertIsNone(self.request("get", unmarked)[0])
+        self.assertIsNone(self.request("post", marked)[0])
+
+    def test_each_request_starts_on_the_primary(self):
+        db_router.use_replica()
+        self.assertIsNone(self.request("get", lambda request: None)[0])
+
+    def test_write_pins_reads_to_the_primary(self):
+        marked = db_router.reads_replica(lambda request: None)
+        _, response = self.request("post", marked, status=302)
+        cookie = response.cookies[ReadReplicaMiddleware.STICKY_COOKIE]
+        self.assertTrue(cookie["httponly"])
+        self.assertEqual(int(cookie["max-age"]), 300)
+
+        alias, _ = self.request("get", marked, cookies={ReadReplicaMiddleware.STICKY_COOKIE: "1"})
+        self.assertIsNone(alias)
+
+    def test_failed_write_sets_no_cookie(self):
+        _, response = self.request("post", lambda request: None, status=400)
+        self.assertNotIn(ReadReplicaMiddleware.STICKY_COOKIE, response.cookies)
+        _, response = self.request("get", lambda request: None)
+        self.assertNotIn(ReadReplicaMiddleware.STICKY_COOKIE, response.cookies)
+
+    def test_caches_fill_from_the_primary(self):
+        # the replica alias doesn't exist here, any read routed to it fails
+        Product.objects.create(sku="BOLT1", name="Hex Bolt", category="Fasteners", unit_price="1.00")
+        dashboard_cache.get_cache().clear()
+        search_index.invalidate()
+        db_router.use_replica()
+        self.assertEqual(dashboard_cache.totals()["total_products"], 1)
+        self.assertEqual(dashboard_cache.reorder_count(), 1)
+        self.assertEqual(len(dashboard_cache.category_summary()), 1)
+        self.assertEqual(len(search_index.search(Product, "name", "bolt")), 1)
+
+
+class AsyncStreamTests(TestCase):
+    """Streamed pages under ASGI send rows while the queryset is read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Product.objects.create(sku=f"SKU{i}", name=f"Item {i}", unit_price="1.00")
+
+    @mock.patch.object(reports, "CHUNK_SIZE", 2)
+    async def test_first_chunk_before_rows_are_read(self):
+        pulled = []
+
+        async def rows():
+            async for product in Product.objects.order_by("id").aiterator(chunk_size=2):
+                pulled.append(product.sku)
+                yield product
+
+        request = AsyncRequestFactory().get("/inventory/")
+        stream = reports.arender_stream(
+            request, "myapp/inventory_list.html", {}, rows(), "myapp/partials/product_rows.html"
+        )
+        head = await anext(stream)
+        self.assertNotIn("SKU0", head)
+        self.assertEqual(pulled, [])
+        first = await anext(stream)
+        self.assertIn("SKU1", first)
+        self.assertEqual(pulled, ["SKU0", "SKU1"])
+        rest = "".join([part async for part in stream])
+        self.assertIn("SKU4", rest)
+        self.assertEqual(len(pulled), 5)
+
+    async def test_async_views_stream_asynchronously(self):
+        cases = [
+            (async_views.inventory_list, {"stream": "1"}),
+            (async_views.inventory_report, {}),
+            (async_views.reorder_suggestions, {"stream": "1"}),
+            (async_views.reorder_report, {}),
+        ]
+        for view, params in cases:
+            with self.subTest(view=view.__name__):
+                response = await view(AsyncRequestFactory().get("/", params))
+                # a sync iterator would be read whole before the first byte
+                self.assertTrue(response.is_async)
+                body = b"".join([part async for part in response])
+                self.assertIn(b"SKU4", body)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        suppliers = [Supplier.objects.create(name=f"Supplier {i}") for i in range(3)]
+        for i in range(13):
+            Product.objects.create(
+                sku=f"SKU{i:03d}", name=f"Item {i % 5}", category=f"Cat {i % 3}",
+                supplier=suppliers[i % 3] if i % 4 else None,
+                quantity=i % 4, unit_price=f"{i % 6}.50",
+            )
+
+    def test_next_and_prev_walk_every_sort(self):
+        for spec in ("name", "-quantity", "price", "supplier", "category,-quantity,name"):
+            with self.subTest(spec=spec):
+                queryset = queries.product_queryset(spec)
+                expected = list(queryset.values_list("sku", flat=True))
+
+                pages = [keyset_page(queryset, page_size=4)]
+                while pages[-1].next_cursor:
+                    pages.append(keyset_page(queryset, after=pages[-1].next_cursor, page_size=4))
+                self.assertEqual([p.sku for page in pages for p in page], expected)
+                self.assertIsNone(pages[0].prev_cursor)
+
+                # and back again from the last page
+                page = pages[-1]
+                for previous in reversed(pages[:-1]):
+                    page = keyset_page(queryset, before=page.prev_cursor, page_size=4)
+                    self.assertEqual([p.sku for p in page], [p.sku for p in previous])
+                self.assertIsNone(page.prev_cursor)
+
+    def test_bad_cursors_give_the_first_page(self):
+        first = [p.sku for p in keyset_page(queries.product_queryset("name"), page_size=4)]
+        cases = [
+            ("price", ["abc", 1]),
+            ("name", ["x", "notanint"]),
+            ("quantity", [{"a": 1}, 1]),
+            ("price", ["NaN", 1]),
+            ("name", [None, 1]),
+            ("name", ["x"]),
+        ]
+        for sort, values in cases:
+            for param in ("after", "before"):
+                with self.subTest(sort=sort, values=values, param=param):
+                    queryset = queries.product_queryset(sort)
+                    page = keyset_page(queryset, page_size=4, **{param: encode_cursor(values)})
+                    self.assertEqual(
+                        [p.sku for p in page],
+                        [p.sku for p in keyset_page(queryset, page_size=4)],
+                    )
+        for cursor in ("not base64!", encode_cursor({"a": 1})):
+            page = keyset_page(queries.product_queryset("name"), after=cursor, page_size=4)
+            self.assertEqual([p.sku for p in page], first)
+
+    def test_bad_cursor_pages_load(self):
+        cursor = encode_cursor(["abc", 1])
+        for url in ("/inventory/", "/api/products/"):
+            with self.subTest(url=url):
+                response = self.client.get(url, {"sort": "price", "after": cursor})
+                self.assertEqual(response.status_code, 200)
+
+
+class CatalogImportTests(TestCase):
+    """Bad rows are reported by line, the rest of the file still imports."""
+
+    CSV = (
+        "sku,name,category,supplier,quantity,reorder_level,unit_price\n"
+        "GOOD1,Hex Bolt,Fasteners,,10,5,1.005\n"
+        "BIG,Too big,Fasteners,,1,5,1e30\n"
+        "INF,Infinite,Fasteners,,1,5,Infinity\n"
+        "NAN,Not a number,Fasteners,,1,5,NaN\n"
+        "NEG,Negative,Fasteners,,1,5,-1\n"
+        "WIDE,Too many digits,Fasteners,,1,5,100000000\n"
+        "TEXT,Letters,Fasteners,,1,5,abc\n"
+        "QTY,Huge quantity,Fasteners,,99999999999,5,1\n"
+        "GOOD2,Wing Nut,Fasteners,,3,5,99999999.99\n"
+    )
+
+    def test_mixed_file(self):
+        result = catalog_io.import_file(io.StringIO(self.CSV), "products", "csv")
+        self.assertEqual((result.created, result.updated), (2, 0))
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(dict(result.errors)[6], "unit_price can't be negative")
+        self.assertEqual(dict(result.errors)[7], "unit_price is too large")
+        prices = dict(Product.objects.values_list("sku", "unit_price"))
+        self.assertEqual(prices, {"GOOD1": Decimal("1.00"), "GOOD2": Decimal("99999999.99")})
+
+    def test_json_rows(self):
+        rows = '[{"sku": "A", "name": "A", "unit_price": "Infinity"}, {"sku": "B", "name": "B", "unit_price": 2.5}]'
+        result = catalog_io.import_file(io.StringIO(rows), "products", "json")
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(1, "unit_price must be a number")])
+
+    def test_upload_reports_bad_rows(self):
+        upload = SimpleUploadedFile("products.csv", self.CSV.encode())
+        response = self.client.post("/inventory/import/", {"kind": "products", "file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].failed, 7)
+
+
+class ReorderValueTests(TestCase):
+    """with_reorder_values: the simulated point when there is one, else the formula."""
+
+    def product(self, sku, simulated=None, days=30, mean=4.0, std=1.0):
+        product = Product.objects.create(sku=sku, name=sku, unit_price="1.00")
+        if days:
+            DemandStats.objects.create(product=product, days=days, mean=mean, std=std,
+                                       simulated_reorder_point=simulated)
+        return product
+
+    def values(self, product):
+        row = reorder.computed_rows(Product.objects.filter(pk=product.pk)).get()
+        return row[2], row[3]
+
+    def test_simulated_and_formula_products(self):
+        z = settings.REORDER_SERVICE_Z
+        lead_time = reorder.LEAD_TIME
+        cases = {
+            # no history: the default demand numbers
+            "NONE": (self.product("NONE", days=0), (
+                algorithms.safety_stock(z, reorder.SIGMA_DEMAND, lead_time),
+                algorithms.reorder_point(lead_time, reorder.AVG_DAILY_DEMAND, z, reorder.SIGMA_DEMAND),
+            )),
+            # history without a simulation: the formula on its stats
+            "STATS": (self.product("STATS"), (
+                algorithms.safety_stock(z, 1.0, lead_time),
+                algorithms.reorder_point(lead_time, 4.0, z, 1.0),
+            )),
+            # the simulation: safety stock is what it adds over lead-time demand
+            "SIM": (self.product("SIM", simulated=50), (50 - lead_time * 4.0, 50)),
+            "SIM_LOW": (self.product("SIM_LOW", simulated=10), (0, 10)),
+            # too little history for the simulation to count
+            "SHORT": (self.product("SHORT", simulated=50, days=3), (
+                algorithms.safety_stock(z, reorder.SIGMA_DEMAND, lead_time),
+                algorithms.reorder_point(lead_time, reorder.AVG_DAILY_DEMAND, z, reorder.SIGMA_DEMAND),
+            )),
+        }
+        for sku, (product, expected) in cases.items():
+            with self.subTest(sku=sku):
+                for value, want in zip(self.values(product), expected):
+                    self.assertAlmostEqual(value, want)
+        self.assertGreater(self.values(cases["STATS"][0])[0], 0)
+
+    def test_expressions_match_scalar_formulas(self):
+        product = self.product("ANY", days=0)
+        # (lead_time, avg_daily_demand, z, sigma_demand)
+        cases = [(5, 5, 1.65, 2), (1, 0.25, 2.33, 0.5), (14, 3.5, 1.28, 0), (0, 4, 1.65, 3), (30, 0, 0, 7)]
+        for inputs in cases:
+            with self.subTest(inputs=inputs):
+                lead_time, avg, z, sigma = (reorder.constant(value) for value in inputs)
+                row = Product.objects.filter(pk=product.pk).annotate(
+                    ss=reorder.safety_stock_expression(z, sigma, lead_time),
+                    rp=reorder.reorder_point_expression(lead_time, avg, z, sigma),
+                ).values("ss", "rp").get()
+                self.assertAlmostEqual(row["ss"], algorithms.safety_stock(inputs[2], inputs[3], inputs[0]))
+                self.assertAlmostEqual(row["rp"], algorithms.reorder_point(*inputs))
+
+
+@override_settings(API_TOKEN="secret")
+class StockMovementTests(TestCase):
+    """Stock changes are deltas: nothing is lost, nothing goes negative."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bolt = Product.objects.create(sku="BOLT", name="Hex Bolt", quantity=10, unit_price="1.00")
+        cls.nut = Product.objects.create(sku="NUT", name="Wing Nut", quantity=5, unit_price="1.00")
+
+    def quantities(self):
+        return dict(Product.objects.values_list("sku", "quantity"))
+
+    def post(self, movements):
+        return self.client.post("/stock/movements/", json.dumps({"movements": movements}),
+                                content_type="application/json", HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_stale_form_keeps_a_movement_made_meanwhile(self):
+        # the edit form showed 10, three were issued, then the form sets 15
+        stock.adjust_stock(self.bolt.pk, -3, StockMovement.ISSUE)
+        response = self.client.post(f"/inventory/edit/{self.bolt.pk}/", {
+            "sku": "BOLT", "name": "Hex Bolt", "category": "", "reorder_level": 5,
+            "unit_price": "1.00", "quantity": 15, "shown_quantity": 10,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.quantities()["BOLT"], 12)
+
+    def test_edit_rejects_negative_quantity(self):
+        response = self.client.post(f"/inventory/edit/{self.bolt.pk}/", {
+            "sku": "BOLT", "name": "Renamed", "category": "", "reorder_level": 5,
+            "unit_price": "1.00", "quantity": -1, "shown_quantity": 10,
+        })
+        self.assertEqual(response.context["error"], "Quantity can't be negative.")
+        self.bolt.refresh_from_db()
+        self.assertEqual((self.bolt.name, self.bolt.quantity), ("Hex Bolt", 10))
+
+    def test_batch_sums_changes_and_writes_the_ledger(self):
+        response = self.post([
+            {"sku": "BOLT", "quantity": -4, "kind": "issue"},
+            {"product_id": self.bolt.pk, "quantity": 2, "kind": "receipt"},
+            {"sku": "NUT", "quantity": 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["quantities"], {str(self.bolt.pk): 8, str(self.nut.pk): 6})
+        self.assertEqual(StockMovement.objects.count(), 3)
+
+    def test_insufficient_stock_applies_nothing(self):
+        with self.assertRaises(stock.InsufficientStock):
+            stock.apply_movements([(self.nut.pk, 1, StockMovement.RECEIPT),
+                                   (self.bolt.pk, -11, StockMovement.ISSUE)])
+        response = self.post([{"sku": "NUT", "quantity": 1}, {"sku": "BOLT", "quantity": -11}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["product_id"], self.bolt.pk)
+        self.assertEqual(self.quantities(), {"BOLT": 10, "NUT": 5})
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_bad_movements(self):
+        cases = [
+            [{"sku": "NOPE", "quantity": 1}],
+            [{"product_id": 999999, "quantity": 1}],
+            [{"sku": "BOLT", "quantity": "many"}],
+            [{"sku": "BOLT", "quantity": 1, "kind": "theft"}],
+            [{"quantity": 1}],
+        ]
+        for movements in cases:
+            with self.subTest(movements=movements):
+                self.assertEqual(self.post(movements).status_code, 400)
+        self.assertEqual(self.post("not a list").status_code, 400)
+        self.assertEqual(self.quantities(), {"BOLT": 10, "NUT": 5})
+
+
+class ConcurrentStockTests(TransactionTestCase):
+    """Parallel movements on one SKU all land (no read-modify-write)."""
+
+    def test_parallel_adjustments(self):
+        product = Product.objects.create(sku="BOLT", name="Hex Bolt", quantity=100, unit_price="1.00")
+        errors = []
+
+        def adjust(change):
+            # the in-memory test database's shared-cache table locks fail at
+            # once instead of waiting out busy_timeout, the failed transaction
+            # rolled back whole so it is simply tried again
+            while True:
+                try:
+                    return stock.adjust_stock(product.pk, change)
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    time.sleep(0.001)
+
+        def worker(change):
+            try:
+                for _ in range(10):
+                    adjust(change)
+            except Exception as e:  # reported below, a thread can't fail the test
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(change,)) for change in (1, -1, 2, -2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 100)
+        self.assertEqual(StockMovement.objects.count(), 40)
+
+
+class RollupTests(TestCase):
+    """The incrementally kept rollups always equal a rebuild from Product."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = Supplier.objects.create(name="Acme")
+        cls.bolts = Supplier.objects.create(name="Bolts Inc")
+        for i in range(6):
+            Product.objects.create(
+                sku=f"SKU{i}", name=f"Item {i}", category=("Tools", "Fasteners")[i % 2],
+                supplier=(cls.acme, cls.bolts, None)[i % 3], quantity=i * 3,
+                reorder_level=5, unit_price=f"{i}.25",
+            )
+
+    def snapshot(self):
+        # every group with anything in it, as the rollup tables hold it
+        totals = lambda row: tuple(getattr(row, name) for name in rollups.TOTAL_FIELDS)  # noqa: E731
+        return (
+            {row.category: totals(row) for row in CategoryRollup.objects.all() if any(totals(row))},
+            {row.supplier_id: totals(row) for row in SupplierRollup.objects.all() if any(totals(row))},
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_initial_saves(self):
+        self.assertMatchesRebuild()
+
+    def test_stock_adjustments(self):
+        product = Product.objects.get(sku="SKU1")
+        stock.adjust_stock(product.pk, -2, StockMovement.ISSUE)
+        stock.apply_movements([(product.pk, 7, StockMovement.RECEIPT),
+                               (Product.objects.get(sku="SKU4").pk, -4, StockMovement.ISSUE)])
+        self.assertMatchesRebuild()
+
+    def test_category_supplier_and_price_change(self):
+        product = Product.objects.get(sku="SKU2")
+        product.category = "Plumbing"
+        product.supplier = self.acme
+        product.unit_price = Decimal("99.99")
+        product.save()
+        self.assertMatchesRebuild()
+
+    def test_edit_view(self):
+        product = Product.objects.get(sku="SKU3")
+        self.client.post(f"/inventory/edit/{product.pk}/", {
+            "sku": "SKU3", "name": "Item 3", "category": "Tools", "supplier": self.bolts.pk,
+            "reorder_level": 20, "unit_price": "3.10", "quantity": 1, "shown_quantity": product.quantity,
+        })
+        self.assertMatchesRebuild()
+
+    def test_product_delete(self):
+        Product.objects.get(sku="SKU5").delete()
+        self.client.post(f"/inventory/delete/{Product.objects.get(sku='SKU0').pk}/")
+        self.assertMatchesRebuild()
+
+    def test_supplier_delete(self):
+        # its products fall back to no supplier through SET_NULL
+        self.acme.delete()
+        self.assertMatchesRebuild()
+        self.assertFalse(SupplierRollup.objects.filter(supplier_id=self.acme.pk).exists())
+
+    def test_import(self):
+        rows = (
+            "sku,name,category,supplier,quantity,reorder_level,unit_price\n"
+            "SKU1,Item 1,Plumbing,Acme,40,5,2.00\n"
+            "NEW1,New,Tools,Bolts Inc,3,5,1.50\n"
+        )
+        catalog_io.import_file(io.StringIO(rows), "products", "csv")
+        self.assertMatchesRebuild()
+
+
+class ReorderAlertTests(TestCase):
+    """ReorderAlert rows follow every change that moves a reorder point."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supplier = Supplier.objects.create(name="Acme", lead_time_days=2)
+        for i in range(8):
+            Product.objects.create(
+                sku=f"SKU{i}", name=f"Item {i}", supplier=cls.supplier if i % 2 else None,
+                quantity=i * 5, unit_price="1.00",
+            )
+
+    def assertAlertsInSync(self):
+        expected = {
+            row[0]: reorder.alert_fields(*row)
+            for row in reorder.computed_rows(Product.objects.all())
+        }
+        stored = {
+            alert["product_id"]: alert
+            for alert in ReorderAlert.objects.values("product_id", *reorder.ALERT_FIELDS)
+        }
+        self.assertEqual(stored, expected)
+
+    def test_created_products(self):
+        self.assertEqual(ReorderAlert.objects.count(), 8)
+        self.assertAlertsInSync()
+
+    def test_saved_quantity(self):
+        product = Product.objects.get(sku="SKU0")
+        self.assertTrue(product.reorder_alert.needs_reorder)
+        product.quantity = 500
+        product.save()
+        self.assertFalse(ReorderAlert.objects.get(product=product).needs_reorder)
+        self.assertAlertsInSync()
+
+    def test_supplier_lead_time(self):
+        self.supplier.lead_time_days = 30
+        self.supplier.save()
+        self.assertAlertsInSync()
+        point = algorithms.reorder_point(30, reorder.AVG_DAILY_DEMAND, settings.REORDER_SERVICE_Z,
+                                         reorder.SIGMA_DEMAND)
+        self.assertEqual(ReorderAlert.objects.get(product__sku="SKU1").reorder_point, math.ceil(point))
+
+    def test_supplier_deleted(self):
+        # its products fall back to the default lead time
+        self.supplier.lead_time_days = 30
+        self.supplier.save()
+        product = Product.objects.create(sku="BIG", name="Big", supplier=self.supplier,
+                                         quantity=100, unit_price="1.00")
+        self.assertTrue(product.reorder_alert.needs_reorder)
+        self.supplier.delete()
+        self.assertAlertsInSync()
+        self.assertFalse(ReorderAlert.objects.get(product=product).needs_reorder)
+
+    def test_stock_movements_and_demand_history(self):
+        # three weeks of issues: the stats take over from the default demand
+        product = Product.objects.get(sku="SKU7")
+        stock.adjust_stock(product.pk, 1000, StockMovement.RECEIPT)
+        start = timezone.now() - datetime.timedelta(days=21)
+        for day in range(21):
+            stock.apply_movements([(product.pk, -(day % 4) - 1, StockMovement.ISSUE)],
+                                  when=start + datetime.timedelta(days=day))
+        self.assertGreaterEqual(product.demand_stats.days, reorder.MIN_HISTORY_DAYS)
+        self.assertAlertsInSync()
+
+    def test_import(self):
+        rows = "sku,name,quantity,unit_price\nSKU3,Item 3,0,1.00\nNEW,New,100,1.00\n"
+        catalog_io.import_file(io.StringIO(rows), "products", "csv")
+        self.assertAlertsInSync()
+
+    def test_rebuild_repairs_every_alert(self):
+        # writes that skip the hooks leave the alerts behind
+        Product.objects.update(quantity=3)
+        ReorderAlert.objects.filter(product__sku="SKU2").delete()
+        self.assertEqual(reorder.rebuild_alerts(chunk_size=3), 8)
+        self.assertAlertsInSync()
+
+    def test_rebuild_one_id_range(self):
+        ids = sorted(Product.objects.values_list("id", flat=True))
+        Product.objects.update(quantity=3)
+        self.assertEqual(reorder.rebuild_alerts(chunk_size=2, id_range=(ids[0], ids[3])), 4)
+        stale = set(ReorderAlert.objects.exclude(quantity=3).values_list("product_id", flat=True))
+        self.assertEqual(stale, set(ids[4:]))
+
+
+class DemandStatsTests(TestCase):
+    """Incremental Welford updates equal a rebuild from the ledger."""
+
+    FIELDS = ("days", "mean", "std", "demand_days", "current_day", "current_demand")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.steady = Product.objects.create(sku="STEADY", name="Steady", quantity=10000, unit_price="1.00")
+        cls.lumpy = Product.objects.create(sku="LUMPY", name="Lumpy", quantity=10000, unit_price="1.00")
+
+    def issue(self, product, days_ago, units):
+        when = timezone.now() - datetime.timedelta(days=days_ago)
+        stock.apply_movements([(product.pk, -units, StockMovement.ISSUE)], when=when)
+
+    def stats(self):
+        return {
+            row["product_id"]: row
+            for row in DemandStats.objects.values("product_id", *self.FIELDS)
+        }
+
+    def assertStatsEqual(self, first, second):
+        self.assertEqual(first.keys(), second.keys())
+        for product_id, row in first.items():
+            for name in self.FIELDS:
+                with self.subTest(product=product_id, field=name):
+                    if isinstance(row[name], float):
+                        self.assertAlmostEqual(row[name], second[product_id][name])
+                    else:
+                        self.assertEqual(row[name], second[product_id][name])
+
+    def test_incremental_equals_rebuild(self):
+        # both sell today, so no quiet days are pending
+        for days_ago in range(30, -1, -1):
+            self.issue(self.steady, days_ago, 3 + days_ago % 5)
+        for days_ago, units in ((40, 12), (33, 1), (20, 7), (19, 7), (6, 30), (0, 2)):
+            self.issue(self.lumpy, days_ago, units)
+        # same-day and batched issues
+        stock.apply_movements([(self.lumpy.pk, -1, StockMovement.ISSUE),
+                               (self.steady.pk, -4, StockMovement.ISSUE)])
+
+        incremental = self.stats()
+        self.assertEqual(demand.rebuild_demand_stats(today=self.today), 2)
+        self.assertStatsEqual(incremental, self.stats())
+
+    def test_stopped_sales_wait_for_the_rebuild(self):
+        for days_ago in (12, 11, 10):
+            self.issue(self.steady, days_ago, 5)
+        before = DemandStats.objects.get(product=self.steady)
+        self.assertEqual((before.days, before.mean), (2, 5.0))
+
+        demand.rebuild_demand_stats(today=self.today)
+        after = DemandStats.objects.get(product=self.steady)
+        # twelve days up to yesterday, the quiet ones as 0
+        self.assertEqual((after.days, after.demand_days), (12, 3))
+        self.assertAlmostEqual(after.mean, 15 / 12)
+
+
+@skipUnless(forecasting.available(), "forecasting needs numpy")
+class ForecastTests(TestCase):
+    """The nightly incremental refresh lands where a full refit does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.steady = Product.objects.create(sku="STEADY", name="Steady", quantity=10000, unit_price="1.00")
+        cls.lumpy = Product.objects.create(sku="LUMPY", name="Lumpy", quantity=10000, unit_price="1.00")
+        cls.late = Product.objects.create(sku="LATE", name="Late", quantity=10000, unit_price="1.00")
+        start = timezone.now() - datetime.timedelta(days=45)
+        for day in range(45):
+            movements = [(cls.steady.pk, -(4 + day % 3), StockMovement.ISSUE)]
+            if day % 9 == 0:
+                movements.append((cls.lumpy.pk, -20, StockMovement.ISSUE))
+            if day >= 38:
+                # first sold after the first refresh below
+                movements.append((cls.late.pk, -(day - 36), StockMovement.ISSUE))
+            stock.apply_movements(movements, when=start + datetime.timedelta(days=day))
+
+    def forecasts(self):
+        fields = ["last_day", "method", "forecast", "error", *forecasting.STATE_FIELDS]
+        return {row["product_id"]: row for row in DemandForecast.objects.values("product_id", *fields)}
+
+    def test_incremental_equals_full_refit(self):
+        for days_back in (20, 9, 1, 0):
+            forecasting.refresh_forecasts(today=self.today - datetime.timedelta(days=days_back))
+        incremental = self.forecasts()
+        self.assertEqual(len(incremental), 3)
+
+        forecasting.refresh_forecasts(today=self.today, full=True)
+        refit = self.forecasts()
+        for product_id, row in incremental.items():
+            for name, value in row.items():
+                with self.subTest(product=product_id, field=name):
+                    if isinstance(value, float):
+                        self.assertAlmostEqual(value, refit[product_id][name])
+                    else:
+                        self.assertEqual(value, refit[product_id][name])
+
+    def test_refresh_is_a_no_op_twice_a_day(self):
+        forecasting.refresh_forecasts(today=self.today)
+        self.assertEqual(forecasting.refresh_forecasts(today=self.today), 0)
+
+    def test_forecast_feeds_the_reorder_point(self):
+        forecasting.refresh_forecasts(today=self.today)
+        forecast = DemandForecast.objects.get(product=self.steady)
+        self.assertGreaterEqual(forecast.steps, reorder.MIN_HISTORY_DAYS)
+        stats = DemandStats.objects.get(product=self.steady)
+        self.assertNotAlmostEqual(forecast.error, stats.std)
+
+        _, _, safety_stock, point = reorder.computed_rows(Product.objects.filter(pk=self.steady.pk)).get()
+        z = settings.REORDER_SERVICE_Z
+        self.assertAlmostEqual(safety_stock, algorithms.safety_stock(z, forecast.error, reorder.LEAD_TIME))
+        self.assertAlmostEqual(
+            point, algorithms.reorder_point(reorder.LEAD_TIME, forecast.forecast, z, forecast.error)
+        )
+
+        # too little history: the default demand numbers
+        late = DemandForecast.objects.get(product=self.late)
+        self.assertLess(late.steps, reorder.MIN_HISTORY_DAYS)
+        _, _, _, point = reorder.computed_rows(Product.objects.filter(pk=self.late.pk)).get()
+        self.assertAlmostEqual(point, algorithms.reorder_point(
+            reorder.LEAD_TIME, reorder.AVG_DAILY_DEMAND, z, reorder.SIGMA_DEMAND
+        ))
+
+
+@override_settings(API_TOKEN="secret")
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = Supplier.objects.create(name="Acme", lead_time_days=3)
+        for i in range(5):
+            Product.objects.create(sku=f"SKU{i}", name=f"Item {i}", supplier=cls.acme if i % 2 else None,
+                                   quantity=i * 10, unit_price=f"{i}.50")
+
+    def post(self, url, rows, token="secret"):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        return self.client.post(url, json.dumps(rows), content_type="application/json", **headers)
+
+    def test_fields_projection(self):
+        response = self.client.get("/api/products/", {"fields": "sku,supplier,unit_price", "sort": "-quantity"})
+        results = response.json()["results"]
+        self.assertEqual(results[0], {"sku": "SKU4", "supplier": None, "unit_price": "4.50"})
+        self.assertEqual(results[1], {"sku": "SKU3", "supplier": "Acme", "unit_price": "3.50"})
+
+        response = self.client.get("/api/products/", {"fields": "sku,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["error"])
+
+    def test_pages(self):
+        response = self.client.get("/api/products/", {"fields": "sku", "page_size": 2})
+        self.assertEqual([row["sku"] for row in response.json()["results"]], ["SKU0", "SKU1"])
+        response = self.client.get("/api/products/" + response.json()["next"])
+        self.assertEqual([row["sku"] for row in response.json()["results"]], ["SKU2", "SKU3"])
+
+    def test_etag_and_304(self):
+        response = self.client.get("/api/products/")
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+        with self.assertNumQueries(1) as queries:  # the TableVersion rows, no table is read
+            response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("application_tableversion", queries[0]["sql"])
+
+        # a supplier rename shows up in product rows, so it's a change too
+        self.acme.name = "Acme Ltd"
+        self.acme.save()
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        # and so is a delete
+        etag = response["ETag"]
+        Product.objects.filter(sku="SKU3").delete()
+        self.assertNotEqual(self.client.get("/api/products/")["ETag"], etag)
+
+    def test_upsert(self):
+        response = self.post("/api/products/", [
+            {"sku": "SKU1", "name": "Renamed", "quantity": 3, "unit_price": "1.50"},
+            {"sku": "NEW", "name": "New", "supplier": "acme", "unit_price": "2"},
+            {"sku": "BAD", "name": "Bad", "unit_price": "NaN"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "created": 1, "updated": 1, "errors": [{"row": 3, "error": "unit_price must be a number"}],
+        })
+        self.assertEqual(Product.objects.get(sku="NEW").supplier, self.acme)
+        self.assertEqual(Product.objects.get(sku="SKU1").name, "Renamed")
+
+        response = self.post("/api/suppliers/", {"suppliers": [{"name": "Bolts Inc", "lead_time_days": 4}]})
+        self.assertEqual(response.json()["created"], 1)
+
+        # nothing saved: 400
+        self.assertEqual(self.post("/api/products/", [{"sku": "X"}]).status_code, 400)
+        self.assertEqual(self.post("/api/products/", {"rows": []}).status_code, 400)
+
+    def test_writes_need_the_token(self):
+        for url in ("/api/products/", "/api/suppliers/", "/stock/movements/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.post(url, [], token=None).status_code, 401)
+                self.assertEqual(self.post(url, [], token="wrong").status_code, 401)
+                with override_settings(API_TOKEN=""):
+                    self.assertEqual(self.post(url, [], token="").status_code, 403)
+        self.assertFalse(Product.objects.filter(sku="X").exists())
+        # reads stay open
+        self.assertEqual(self.client.get("/api/products/").status_code, 200)
+
+    def test_reorder(self):
+        response = self.client.get("/api/reorder/", {"fields": "sku,quantity,reorder_point"})
+        rows = response.json()["results"]
+        # only what needs reordering, lowest stock first
+        expected = ReorderAlert.objects.filter(needs_reorder=True).order_by("quantity")
+        self.assertEqual([row["sku"] for row in rows], [alert.product.sku for alert in expected])
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row["quantity"] <= row["reorder_point"] for row in rows))
+        self.assertTrue(response.has_header("ETag"))
+        self.assertEqual(self.post("/api/reorder/", []).status_code, 405)
+
+
+class RowCacheTests(TestCase):
+    """Cached table rows never outlive the objects they show."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = Supplier.objects.create(name="Acme", contact_person="Ann")
+        cls.bolt = Product.objects.create(sku="BOLT", name="Hex Bolt", supplier=cls.acme,
+                                          quantity=10, unit_price="1.00")
+        cls.nut = Product.objects.create(sku="NUT", name="Wing Nut", quantity=5, unit_price="1.00")
+
+    def setUp(self):
+        row_cache.get_cache().clear()
+        # fill the cache
+        self.inventory()
+        self.suppliers()
+
+    def inventory(self):
+        return self.client.get("/inventory/").content.decode()
+
+    def suppliers(self):
+        return self.client.get("/suppliers/").content.decode()
+
+    def test_rows_are_cached(self):
+        rendered = []
+        get_template = row_cache.get_template
+
+        def counting_template(name):
+            template = get_template(name)
+            return mock.Mock(render=lambda context: rendered.append(name) or template.render(context))
+
+        with mock.patch.object(row_cache, "get_template", counting_template):
+            self.inventory()
+            self.assertEqual(rendered, [])
+            self.nut.name = "Lock Nut"
+            self.nut.save()
+            self.inventory()
+        self.assertEqual(rendered, ["myapp/partials/product_row.html"])
+
+    def test_save(self):
+        self.bolt.name = "Carriage Bolt"
+        self.bolt.save()
+        page = self.inventory()
+        self.assertIn("Carriage Bolt", page)
+        self.assertNotIn("Hex Bolt", page)
+
+    def test_delete(self):
+        self.nut.delete()
+        self.assertNotIn("Wing Nut", self.inventory())
+
+    def test_supplier_rename(self):
+        self.acme.name = "Acme Ltd"
+        self.acme.contact_person = "Bob"
+        self.acme.save()
+        self.assertIn("Acme Ltd", self.inventory())
+        page = self.suppliers()
+        self.assertIn("Bob", page)
+        self.assertNotIn("Ann", page)
+
+    def test_stock_movements(self):
+        stock.adjust_stock(self.nut.pk, 6)
+        self.assertIn("<td>11</td>", self.inventory())
+        # a movement dated back to the version cached in setUp still makes
+        # a new version, and moves the API's ETag on
+        etag = self.client.get("/api/products/")["ETag"]
+        stock.adjust_stock(self.nut.pk, 2, when=self.nut.last_updated)
+        self.assertIn("<td>13</td>", self.inventory())
+        self.assertNotEqual(self.client.get("/api/products/")["ETag"], etag)
+
+    def test_edit_view(self):
+        self.client.post(f"/inventory/edit/{self.nut.pk}/", {
+            "sku": "NUT", "name": "Wing Nut", "category": "", "reorder_level": 5,
+            "unit_price": "7.25", "quantity": 5, "shown_quantity": 5,
+        })
+        self.assertIn("7.25", self.inventory())
+
+
+class JobQueueTests(TestCase):
+    """Claiming, running and requeueing jobs, with a stand-in handler."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.calls = []
+        patcher = mock.patch.dict(jobs.HANDLERS, {"test": self.handler})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def handler(self, job, progress):
+        self.calls.append(job.pk)
+        if job.params.get("fail"):
+            raise ValueError("broken")
+        progress(1, 1)
+        return "ran"
+
+    def enqueue(self, minutes=0, **params):
+        return jobs.enqueue("test", params, run_after=self.now + datetime.timedelta(minutes=minutes))
+
+    def test_claims_oldest_due_job(self):
+        later = self.enqueue(minutes=-1)
+        first = self.enqueue(minutes=-5)
+        self.enqueue(minutes=5)
+        self.assertEqual(jobs.claim_next("w1", now=self.now), first.pk)
+        self.assertEqual(jobs.claim_next("w1", now=self.now), later.pk)
+        # the other one isn't due yet
+        self.assertIsNone(jobs.claim_next("w1", now=self.now))
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.worker, first.attempts), (Job.RUNNING, "w1", 1))
+        self.assertEqual(first.heartbeat_at, self.now)
+
+    def test_job_is_claimed_once(self):
+        job = self.enqueue()
+        self.assertEqual(jobs.claim_next("w1", now=self.now), job.pk)
+        self.assertIsNone(jobs.claim_next("w2", now=self.now))
+        job.refresh_from_db()
+        self.assertEqual(job.worker, "w1")
+
+    def test_run_job(self):
+        job = self.enqueue()
+        jobs.claim_next("w1", now=self.now)
+        self.assertEqual(jobs.run_job(job.pk), (job.pk, Job.DONE))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message, job.progress_done), (Job.DONE, "ran", 1))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_keeps_traceback(self):
+        job = self.enqueue(fail=True)
+        jobs.claim_next("w1", now=self.now)
+        self.assertEqual(jobs.run_job(job.pk), (job.pk, Job.FAILED))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("ValueError: broken", job.message)
+
+    def test_requeue_stale(self):
+        stale, alive = self.enqueue(), self.enqueue()
+        jobs.claim_next("w1", now=self.now)
+        jobs.claim_next("w1", now=self.now)
+        later = self.now + datetime.timedelta(minutes=15)
+        # the worker still running `alive` keeps touching it
+        jobs.heartbeat([alive.pk], now=later - datetime.timedelta(minutes=1))
+
+        requeued = jobs.requeue_stale(datetime.timedelta(minutes=10), max_attempts=3, now=later)
+        self.assertEqual(requeued, (1, 0))
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((stale.status, stale.worker), (Job.QUEUED, ""))
+        self.assertEqual(alive.status, Job.RUNNING)
+        # and another worker picks it up
+        self.assertEqual(jobs.claim_next("w2", now=later), stale.pk)
+
+    def test_gives_up_after_max_attempts(self):
+        job = self.enqueue()
+        stale_after = datetime.timedelta(minutes=10)
+        now = self.now
+        for _ in range(2):
+            self.assertEqual(jobs.claim_next("w1", now=now), job.pk)
+            now += datetime.timedelta(minutes=15)
+            self.assertEqual(jobs.requeue_stale(stale_after, max_attempts=3, now=now), (1, 0))
+        jobs.claim_next("w1", now=now)
+        now += datetime.timedelta(minutes=15)
+        self.assertEqual(jobs.requeue_stale(stale_after, max_attempts=3, now=now), (0, 1))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertIsNone(jobs.claim_next("w1", now=now))
+
+    @override_settings(SIMULATION_WORKERS=8)
+    def test_simulation_shares_the_worker_pool(self):
+        seen = []
+        for pool_size, expected in [(1, 8), (2, 4), (3, 2), (16, 1)]:
+            job = self.enqueue()
+            jobs.claim_next("w1", now=self.now)
+            with mock.patch.dict(jobs.HANDLERS, {"test": lambda job, progress: seen.append(jobs.simulation_workers())}):
+                jobs.run_job(job.pk, pool_size=pool_size)
+            self.assertEqual(seen.pop(), expected)
+        # and back to the whole budget outside a job
+        self.assertEqual(jobs.simulation_workers(), 8)
+
+    def test_crashed_worker_process(self):
+        class CrashingPool:
+            # a pool whose child dies on every job
+            def __init__(self, max_workers, initializer):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def submit(self, fn, *args):
+                future = Future()
+                future.set_exception(BrokenProcessPool("child killed"))
+                return future
+
+        job = self.enqueue(minutes=-1)
+        with mock.patch.object(run_jobs, "ProcessPoolExecutor", CrashingPool), \
+                mock.patch.object(run_jobs, "connections"):
+            call_command("run_jobs", "--once", "--no-nightly", "--workers", "1", stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("child killed", job.message)
+        self.assertIsNotNone(job.finished_at)
+        self.assertGreaterEqual(job.finished_at, job.started_at)
+
+    def test_schedule_nightly_keeps_one(self):
+        job = jobs.schedule_nightly(now=self.now)
+        self.assertGreater(job.run_after, self.now)
+        self.assertIsNone(jobs.schedule_nightly(now=self.now))
+        Job.objects.filter(pk=job.pk).update(status=Job.DONE)
+        self.assertIsNotNone(jobs.schedule_nightly(now=self.now))
+        self.assertEqual(Job.objects.filter(kind=Job.NIGHTLY_ROLLUP, status=Job.QUEUED).count(), 1)
+
+
+class SeedTests(TestCase):
+    """seed_inventory fills everything derived, clear_inventory empties it in a fixed number of queries."""
+
+    def seed(self, products):
+        seed.seed_inventory(suppliers=3, products=products, batch_size=25)
+        product = Product.objects.filter(supplier__isnull=False).first()
+        order = PurchaseOrder.objects.create(supplier=product.supplier)
+        PurchaseOrderLine.objects.create(order=order, product=product, quantity=5, unit_price="1.00")
+
+    def clear(self):
+        deletes = table_versions.read(Product)[Product].deletes
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            seed.clear_inventory()
+        for model in (*seed.CLEAR_ORDER, CategoryRollup):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        # what the skipped delete signals would have done
+        self.assertEqual(table_versions.read(Product)[Product].deletes, deletes + 1)
+        self.assertEqual(len(callbacks), 1)  # the dashboard invalidation
+        return len(queries)
+
+    def test_seed(self):
+        self.seed(60)
+        self.assertEqual(Product.objects.count(), 60)
+        self.assertEqual(ReorderAlert.objects.count(), 60)
+        self.assertEqual(StockMovement.objects.count(), Product.objects.filter(quantity__gt=0).count())
+        self.assertEqual(sum(CategoryRollup.objects.values_list("item_count", flat=True)), 60)
+
+    def test_clear_doesnt_grow_with_the_catalog(self):
+        self.seed(20)
+        small = self.clear()
+        self.seed(200)
+        self.assertEqual(self.clear(), small)
+
+
+@override_settings(PERF_SAMPLE_RATE=1)
+class PerformanceMetricsTests(TestCase):
+    """Server-Timing on sampled requests and the /metrics histograms."""
+
+    @classmethod
+    def setUpTestData(cls):
+        supplier = Supplier.objects.create(name="Acme")
+        for i in range(5):
+            Product.objects.create(sku=f"SKU{i}", name=f"Item {i}", supplier=supplier, unit_price="1.00")
+
+    def setUp(self):
+        metrics.reset()
+        row_cache.get_cache().clear()
+
+    def server_timing(self, response):
+        # {"app": ms, "db": ms, ...}
+        parts = [part.split(";") for part in response["Server-Timing"].split(", ")]
+        return {name: float(fields[0].removeprefix("dur=")) for name, *fields in parts}
+
+    def test_server_timing(self):
+        response = self.client.get("/inventory/")
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {"app", "db", "render"})
+        # the row templates render inside the page, counted once
+        self.assertLessEqual(timing["render"], timing["app"])
+        self.assertLessEqual(timing["db"], timing["app"])
+        self.assertIn('desc="', response["Server-Timing"])
+
+    def test_nested_templates_are_timed_once(self):
+        inner = metrics.TimedTemplate(mock.Mock(render=lambda context, request: "row"))
+        outer = metrics.TimedTemplate(mock.Mock(render=lambda context, request: inner.render(context) * 2))
+        timings, token = metrics.start_request()
+        try:
+            with mock.patch.object(metrics, "section", wraps=metrics.section) as section:
+                self.assertEqual(outer.render({}), "rowrow")
+        finally:
+            metrics.end_request(token)
+        self.assertEqual(section.call_count, 1)
+        self.assertEqual(timings.render_depth, 0)
+        self.assertIn("render", timings.sections)
+
+    @override_settings(PERF_SAMPLE_RATE=0.25)
+    def test_sampling(self):
+        with mock.patch("application.middleware.random.random", return_value=0.5):
+            self.assertFalse(self.client.get("/inventory/").has_header("Server-Timing"))
+        with mock.patch("application.middleware.random.random", return_value=0.1):
+            self.assertTrue(self.client.get("/inventory/").has_header("Server-Timing"))
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_off(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: HttpResponse())
+        self.assertFalse(self.client.get("/inventory/").has_header("Server-Timing"))
+        self.assertNotIn("msys_request_seconds", self.client.get("/metrics").content.decode())
+
+    def test_metrics(self):
+        for _ in range(3):
+            self.client.get("/inventory/")
+        self.client.get("/suppliers/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        body = response.content.decode()
+        self.assertIn("# TYPE msys_request_seconds summary", body)
+        self.assertIn('msys_request_seconds_count{view="inventory_list"} 3', body)
+        self.assertIn('msys_db_queries_count{view="supplier_list"} 1', body)
+        self.assertIn('msys_render_seconds{view="inventory_list",quantile="0.99"}', body)
+        # scrapes aren't counted
+        self.assertNotIn('view="metrics"', body)
+
+    def test_metrics_are_internal(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 404)
+
+
+class SortAlgorithmTests(SimpleTestCase):
+    """merge_sort and key_sort: stable, equal to each other and to sorted()."""
+
+    def setUp(self):
+        acme = SimpleNamespace(name="Acme")
+        bolt = SimpleNamespace(name="bolt co")
+        rows = [
+            # sku, name, category, supplier, quantity, reorder_level, unit_price
+            ("A1", "Hex Bolt", "Fasteners", acme, 5, 10, "0.50"),
+            ("A2", "wing nut", "fasteners", None, 5, 2, "0.25"),
+            ("A3", "Drill", "Tools", bolt, 0, 1, "49.99"),
+            ("A4", "hex bolt", "Fasteners", bolt, 12, 10, "0.50"),
+            ("A5", "Saw", "tools", None, 5, 3, "19.00"),
+            ("A6", "Washer", "Fasteners", acme, 0, 2, "0.05"),
+            ("A7", "Clamp", "Tools", acme, 12, 1, "7.50"),
+        ]
+        self.items = [
+            SimpleNamespace(sku=sku, name=name, category=category, supplier=supplier, quantity=quantity,
+                            reorder_level=reorder, unit_price=Decimal(price))
+            for sku, name, category, supplier, quantity, reorder, price in rows
+        ]
+
+    def skus(self, items):
+        return [o.sku for o in items]
+
+    def expected(self, spec):
+        # sorted() one field at a time from the last, each pass is stable
+        items = list(self.items)
+        for name, descending in reversed(algorithms.parse_sort_spec(spec)):
+            items.sort(key=algorithms.FIELD_KEYS[name], reverse=descending)
+        return self.skus(items)
+
+    def test_same_order_as_sorted(self):
+        specs = ["sku", "name", "category", "supplier", "quantity", "reorder", "price",
+                 "-name", "-quantity", "-price", "category,-quantity,name", "-category,reorder",
+                 "supplier,-price,sku", "quantity,-reorder"]
+        for spec in specs:
+            with self.subTest(spec=spec):
+                want = self.expected(spec)
+                self.assertEqual(self.skus(algorithms.merge_sort(self.items, spec)), want)
+                self.assertEqual(self.skus(algorithms.key_sort(self.items, spec)), want)
+
+    def test_stable_on_equal_keys(self):
+        for sort in (algorithms.merge_sort, algorithms.key_sort):
+            with self.subTest(sort=sort.__name__):
+                # quantity 5: A1, A2, A5 in input order, and the same reversed input stays reversed
+                self.assertEqual(self.skus(sort(self.items, "quantity"))[2:5], ["A1", "A2", "A5"])
+                self.assertEqual(self.skus(sort(self.items[::-1], "quantity"))[2:5], ["A5", "A2", "A1"])
+                # "hex bolt" twice, case-insensitive
+                self.assertEqual(self.skus(sort(self.items, "name"))[2:4], ["A1", "A4"])
+                self.assertEqual(self.skus(sort(self.items, "-name"))[3:5], ["A1", "A4"])
+
+    @skipUnless(algorithms.np is not None, "numpy not installed")
+    def test_numpy_path(self):
+        for spec in ("quantity", "-quantity", "price", "-price", "quantity,-price", "-reorder,-quantity"):
+            with self.subTest(spec=spec):
+                with mock.patch.object(algorithms.np, "lexsort", wraps=algorithms.np.lexsort) as lexsort, \
+                        mock.patch.object(algorithms.np, "argsort", wraps=algorithms.np.argsort) as argsort:
+                    result = self.skus(algorithms.key_sort(self.items, spec))
+                self.assertEqual(lexsort.call_count + argsort.call_count, 1)
+                with mock.patch.object(algorithms, "np", None):
+                    self.assertEqual(self.skus(algorithms.key_sort(self.items, spec)), result)
+                self.assertEqual(result, self.expected(spec))
+
+    def test_unknown_fields_keep_the_order(self):
+        for spec in ("", "bogus", "-bogus,nope", None):
+            with self.subTest(spec=spec):
+                self.assertEqual(algorithms.merge_sort(self.items, spec), self.items)
+                self.assertEqual(algorithms.key_sort(self.items, spec), self.items)
+        self.assertEqual(algorithms.merge_sort([], "name"), [])
+        self.assertEqual(algorithms.key_sort([], "quantity"), [])
+
+
+@override_settings(INVENTORY_QUERY_MODE="python")
+class PythonSortSpecTests(TestCase):
+    """Multi-column ?sort= specs on the python list mode."""
+
+    @classmethod
+    def setUpTestData(cls):
+        acme = Supplier.objects.create(name="Acme")
+        zed = Supplier.objects.create(name="zed tools")
+        rows = [
+            # sku, name, category, supplier, quantity
+            ("P1", "Hex Bolt", "Fasteners", zed, 5),
+            ("P2", "Wing Nut", "fasteners", None, 9),
+            ("P3", "Drill", "Tools", acme, 2),
+            ("P4", "Anchor", "Fasteners", acme, 9),
+            ("P5", "Saw", "Tools", None, 2),
+            ("P6", "Clamp", "tools", zed, 7),
+        ]
+        for sku, name, category, supplier, quantity in rows:
+            Product.objects.create(sku=sku, name=name, category=category, supplier=supplier,
+                                   quantity=quantity, unit_price="1.00")
+
+    def skus(self, sort):
+        response = self.client.get("/inventory/", {"sort": sort})
+        self.assertEqual(response.status_code, 200)
+        return [p.sku for p in response.context["products"]]
+
+    def test_category_then_quantity_descending_then_name(self):
+        self.assertEqual(self.skus("category,-quantity,name"), ["P4", "P2", "P1", "P6", "P3", "P5"])
+
+    def test_missing_supplier_sorts_first(self):
+        self.assertEqual(self.skus("supplier,-quantity"), ["P2", "P5", "P4", "P3", "P6", "P1"])
+        self.assertEqual(self.skus("-supplier,name"), ["P6", "P1", "P4", "P3", "P5", "P2"])
+
+    def test_repeated_and_unknown_fields_are_dropped(self):
+        self.assertEqual(algorithms.parse_sort_spec(" quantity, bogus,-quantity , -name,name"),
+                         [("quantity", False), ("name", True)])
+        self.assertEqual(self.skus("quantity,bogus,-quantity,-name"), self.skus("quantity,-name"))
+        self.assertEqual(self.skus("quantity,-name"), ["P5", "P3", "P1", "P6", "P2", "P4"])
+
+
+class DashboardCacheTests(TestCase):
+    """Each write drops exactly the dashboard entries it changes, once it commits."""
+
+    ALL = {dashboard_cache.TOTALS, dashboard_cache.CATEGORY_SUMMARY, dashboard_cache.REORDER_COUNT}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = Supplier.objects.create(name="Acme")
+        cls.bolt = Product.objects.create(sku="BOLT", name="Hex Bolt", category="Fasteners",
+                                          supplier=cls.acme, quantity=50, unit_price="1.00")
+
+    def setUp(self):
+        dashboard_cache.get_cache().clear()
+        patcher = mock.patch.dict(dashboard_cache.counters, {"hits": 0, "misses": 0, "invalidations": 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fill()
+
+    def fill(self):
+        return dashboard_cache.totals(), dashboard_cache.category_summary(), dashboard_cache.reorder_count()
+
+    def cached(self):
+        cache = dashboard_cache.get_cache()
+        return {name for name in self.ALL if cache.get(dashboard_cache.KEY_PREFIX + name) is not None}
+
+    def assertBusts(self, write, expected):
+        self.fill()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+            # nothing goes before the commit
+            self.assertEqual(self.cached(), self.ALL)
+        self.assertEqual(self.ALL - self.cached(), expected)
+
+    def test_product_create(self):
+        self.assertBusts(
+            lambda: Product.objects.create(sku="NUT", name="Nut", category="Fasteners", unit_price="1.00"),
+            self.ALL,
+        )
+        self.assertEqual(self.fill()[0]["total_products"], 2)
+
+    def test_product_update(self):
+        def rename():
+            self.bolt.name = "Carriage Bolt"
+            self.bolt.save()
+        self.assertBusts(rename, {dashboard_cache.CATEGORY_SUMMARY})
+
+    def test_product_stock_change(self):
+        def sell():
+            self.bolt.quantity = 1
+            self.bolt.save()
+        self.assertBusts(sell, {dashboard_cache.CATEGORY_SUMMARY, dashboard_cache.REORDER_COUNT})
+        self.assertEqual(self.fill()[2], 1)
+
+    def test_product_delete(self):
+        self.assertBusts(self.bolt.delete, self.ALL)
+        self.assertEqual(self.fill(), ({"total_products": 0, "supplier_count": 1}, [], 0))
+
+    def test_supplier_create(self):
+        self.assertBusts(lambda: Supplier.objects.create(name="Zed"), {dashboard_cache.TOTALS})
+        self.assertEqual(self.fill()[0]["supplier_count"], 2)
+
+    def test_supplier_rename(self):
+        def rename():
+            self.acme.name = "Acme Ltd"
+            self.acme.save()
+        self.assertBusts(rename, set())
+
+    def test_alert_change(self):
+        def refresh():
+            ReorderAlert.objects.filter(product=self.bolt).update(needs_reorder=True)
+            reorder.refresh_alert(self.bolt.pk)
+        self.assertBusts(refresh, {dashboard_cache.REORDER_COUNT})
+
+    def test_counters(self):
+        self.fill()
+        with self.captureOnCommitCallbacks(execute=True):
+            dashboard_cache.invalidate(dashboard_cache.TOTALS)
+        self.fill()
+        self.assertEqual(dashboard_cache.stats(), {
+            "hits": 5, "misses": 4, "invalidations": 1, "hit_ratio": round(5 / 9, 4),
+        })
+
+
+class StaticPipelineTests(SimpleTestCase):
+    """static_pipeline.serve: encoding negotiation, cache headers, nothing outside STATIC_ROOT."""
+
+    HASHED = "css/app.0123456789ab.css"
+    FILES = {
+        HASHED: b"body { color: red }",
+        HASHED + ".gz": b"gzip bytes",
+        HASHED + ".br": b"br bytes",
+        "css/plain.css": b"p {}",
+        "img/logo.png": b"\x89PNG",
+    }
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        for name, data in self.FILES.items():
+            path = os.path.join(root.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        override = override_settings(STATIC_ROOT=root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def get(self, path, method="get", **headers):
+        request = getattr(RequestFactory(), method)(f"/static/{path}", **headers)
+        response = static_pipeline.serve(request, path)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        if hasattr(response, "file_to_stream"):
+            response.close()
+        return response, body
+
+    def test_encoding_negotiation(self):
+        cases = [
+            ("gzip, deflate, br", "br", b"br bytes"),
+            ("gzip", "gzip", b"gzip bytes"),
+            ("br;q=0, gzip;q=0.5", "gzip", b"gzip bytes"),
+            ("identity", None, b"body { color: red }"),
+            ("", None, b"body { color: red }"),
+        ]
+        for accept, encoding, body in cases:
+            with self.subTest(accept=accept):
+                response, served = self.get(self.HASHED, HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertEqual(served, body)
+                self.assertEqual(response["Content-Type"], "text/css")
+                self.assertEqual(response["Vary"], "Accept-Encoding")
+                self.assertFalse(response.has_header("Content-Disposition"))
+
+    def test_cache_headers(self):
+        response, _ = self.get(self.HASHED)
+        self.assertEqual(response["Cache-Control"], static_pipeline.IMMUTABLE)
+        response, _ = self.get("css/plain.css")
+        self.assertEqual(response["Cache-Control"], static_pipeline.REVALIDATE)
+        response, _ = self.get("img/logo.png", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_not_modified(self):
+        response, _ = self.get(self.HASHED)
+        response, _ = self.get(self.HASHED, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], static_pipeline.IMMUTABLE)
+
+    def test_not_found(self):
+        for path in ("css/missing.css", "css", "../settings.py", "css/../../manage.py",
+                     "/etc/passwd", self.HASHED + ".gz", self.HASHED + ".br"):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.get(path)
+
+    def test_only_get_and_head(self):
+        response, _ = self.get(self.HASHED, method="post")
+        self.assertEqual(response.status_code, 405)
+        response, _ = self.get(self.HASHED, method="head")
+        self.assertEqual(response.status_code, 200)
@@ -1,19 +1,41 @@
 from django.contrib import admin
 from django.urls import path
-from . import views
+from django.conf import settings
+from . import api, views
+from .db_router import reads_replica
+
+# read-heavy pages, async versions under ASGI (settings.ASYNC_VIEWS). the
+# ones wrapped in reads_replica query the read replica on GET when there is
+# one (settings.READ_REPLICA)
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', views.dashboard, name='dashboard'),
-    path('inventory/', views.inventory_list, name='inventory_list'),
+    path('', reads_replica(read_views.dashboard), name='dashboard'),
+    path('dashboard/cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('inventory/', reads_replica(read_views.inventory_list), name='inventory_list'),
     path('inventory/add/', views.add_product, name='add_product'),
     path('inventory/edit/<int:pk>/', views.edit_product, name='edit_product'),
     path('inventory/delete/<int:pk>/', views.delete_product, name='delete_product'),
-    path('suppliers/', views.supplier_list, name='supplier_list'),
-    path('reorder/', views.reorder_suggestions, name='reorder_suggestions'),
+    path('inventory/report/', reads_replica(read_views.inventory_report), name='inventory_report'),
+    path('inventory/valuation/', reads_replica(views.valuation), name='valuation'),
+    path('inventory/import/', views.import_catalog, name='import_catalog'),
+    path('inventory/export/', reads_replica(views.export_catalog), {'kind': 'products'}, name='export_products'),
+    path('suppliers/', reads_replica(read_views.supplier_list), name='supplier_list'),
+    path('reorder/', reads_replica(read_views.reorder_suggestions), name='reorder_suggestions'),
+    path('reorder/report/', reads_replica(read_views.reorder_report), name='reorder_report'),
+    path('reorder/purchase-orders/', views.purchase_orders, name='purchase_orders'),
+    path('stock/movements/', views.stock_movements, name='stock_movements'),
     path('suppliers/add/', views.add_supplier, name='add_supplier'),
     path('suppliers/add/', views.add_supplier, name='add_supplier'),
     path('suppliers/edit/<int:pk>/', views.edit_supplier, name='edit_supplier'),
     path('suppliers/delete/<int:pk>/', views.delete_supplier, name='delete_supplier'),
-
+    path('suppliers/export/', reads_replica(views.export_catalog), {'kind': 'suppliers'}, name='export_suppliers'),
+    path('api/products/', reads_replica(api.products), name='api_products'),
+    path('api/suppliers/', reads_replica(api.suppliers), name='api_suppliers'),
+    path('api/reorder/', reads_replica(api.reorder), name='api_reorder'),
 ]
@@ -1,32 +1,46 @@
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Product, Supplier, ReorderAlert
-from .algorithms import merge_sort, binary_search, safety_stock, reorder_point
-from django.db.models import Sum
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .models import Job, Product, PurchaseOrder, Supplier, StockMovement
+from .algorithms import key_sort, binary_search
+from .queries import product_list_queryset, product_queryset, supplier_queryset
+from .pagination import keyset_page, page_links
+from . import api, catalog_io, dashboard_cache, jobs, metrics, reports, rollups
+from .reorder import reorder_alerts
+from .demand import record_movement
+from .stock import InsufficientStock, StockError, adjust_stock, apply_movements
 
 def dashboard(request):
-    total_products = Product.objects.count()
-    supplier_count = Supplier.objects.count()
-    reorder_items = get_reorder_items()
-    reorder_count = len(reorder_items)
-
-    category_summary = (
-        Product.objects
-        .values("category")
-        .annotate(total_qty=Sum("quantity"))
-        .order_by("-total_qty")
-    )
-
-    recent_products = Product.objects.order_by("-id")[:10]
+    # counts, category summary and reorder count come from dashboard_cache
+    recent_products = Product.objects.only("sku", "name", "category").order_by("-id")[:10]
 
     return render(request, "myapp/dashboard.html", {
-        "total_products": total_products,
-        "supplier_count": supplier_count,
-        "reorder_count": reorder_count,
-        "category_summary": category_summary,
+        **dashboard_cache.totals(),
+        "reorder_count": dashboard_cache.reorder_count(),
+        "category_summary": dashboard_cache.category_summary(),
         "recent_products": recent_products,
     })
 
 
+def dashboard_cache_stats(request):
+    return JsonResponse(dashboard_cache.stats())
+
+
+def metrics_view(request):
+    # Prometheus scrape target, internal addresses only
+    if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(metrics.render_prometheus(),
+                        content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 def edit_supplier(request, pk):
     supplier = get_object_or_404(Supplier, pk=pk)
     if request.method == "POST":
@@ -49,50 +63,88 @@ def delete_supplier(request, pk):
 
 
 def inventory_list(request):
-    product_list = list(Product.objects.all())
+    sort_field = request.GET.get("sort", "name")
+    selected_field = request.GET.get("search_field", "name")
+    search_text = request.GET.get("search_query", "").strip()
+
+    context = {
+        "selected_field": selected_field,
+        "sort_field": sort_field,
+        "search_query": search_text,
+    }
+
+    if request.GET.get("stream"):
+        # every matching row in one streamed page, no pagination
+        return reports.streaming_page(
+            request, "myapp/inventory_list.html", context,
+            product_queryset(sort_field, selected_field, search_text),
+            "myapp/partials/product_rows.html",
+        )
 
+    if settings.INVENTORY_QUERY_MODE == "python":
+        context["products"] = python_product_list(sort_field, selected_field, search_text)
+    else:
+        page = keyset_page(
+            product_queryset(sort_field, selected_field, search_text),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            page_size=settings.INVENTORY_PAGE_SIZE,
+        )
+        context["products"] = page.rows
+        context.update(page_links(request, page))
 
-    sort_field = request.GET.get("sort", "name")
-    sorted_products = merge_sort(product_list, sort_field)
+    return render(request, "myapp/inventory_list.html", context)
 
 
+def inventory_report(request):
+    # print version of the inventory list, same sort/search, every row streamed
+    sort_field = request.GET.get("sort", "name")
     selected_field = request.GET.get("search_field", "name")
     search_text = request.GET.get("search_query", "").strip()
+    return reports.streaming_page(
+        request, "myapp/reports/inventory_report.html",
+        {"search_query": search_text, "generated_at": timezone.now()},
+        product_queryset(sort_field, selected_field, search_text),
+        "myapp/partials/product_rows.html", {"report": True},
+    )
+
+
+def valuation(request):
+    # stock value per category and per supplier, read from the rollup tables
+    categories = list(rollups.category_rows())
+    suppliers = list(rollups.supplier_rows())
+    totals = rollups.overall(categories)
+    return render(request, "myapp/valuation.html", {
+        "categories": categories,
+        "suppliers": suppliers,
+        "totals": totals,
+        "unassigned": rollups.unassigned(totals, suppliers),
+    })
+
 
-    product_map = {p.sku.upper(): p for p in sorted_products}
+def python_product_list(sort_field, selected_field, search_text):
+    # fallback: load everything and sort/search in python
+    product_list = list(product_list_queryset())
+    with metrics.section("sort"):
+        sorted_products = key_sort(product_list, sort_field)
 
     # if no search, show sorted list
     if search_text == "":
-        return render(request, "myapp/inventory_list.html", {
-            "products": sorted_products,
-            "selected_field": selected_field,
-            "sort_field": sort_field
-        })
+        return sorted_products
 
     # if sku was selected, do direct lookup 
     if selected_field == "sku":
-        key = search_text.upper()
-        found_item = product_map.get(key)
-        results = [found_item] if found_item else []
-
-        return render(request, "myapp/inventory_list.html", {
-            "products": results,
-            "selected_field": selected_field,
-            "sort_field": sort_field
-        })
-
-    # sort field by merge sort 
-    sorted_for_search = merge_sort(product_list, selected_field)
+        product_map = {p.sku.upper(): p for p in sorted_products}
+        found_item = product_map.get(search_text.upper())
+        return [found_item] if found_item else []
+
+    # sort by the search field so binary search can run on it
+    with metrics.section("sort"):
+        sorted_for_search = key_sort(product_list, selected_field)
     # Lowercase target, then do binary  
     target = search_text.lower()
-    results = binary_search(sorted_for_search, target, selected_field)
-
-
-    return render(request, "myapp/inventory_list.html", {
-        "products": results,
-        "selected_field": selected_field,
-        "sort_field": sort_field
-    })
+    with metrics.section("search"):
+        return binary_search(sorted_for_search, target, selected_field)
 
 
 def add_product(request):
@@ -107,7 +159,7 @@ def add_product(request):
 
         supplier = Supplier.objects.get(id=supplier_id) if supplier_id else None
 
-        Product.objects.create(
+        product = Product.objects.create(
             sku=sku,
             name=name,
             category=category,
@@ -116,6 +168,8 @@ def add_product(request):
             reorder_level=reorder_level,
             unit_price=unit_price
         )
+        if quantity:
+            record_movement(product, quantity, StockMovement.RECEIPT)
         return redirect('inventory_list')
 
     suppliers = Supplier.objects.all()
@@ -125,22 +179,47 @@ def add_product(request):
 
 def edit_product(request, pk):
     product = get_object_or_404(Product, pk=pk)
+    suppliers = Supplier.objects.all()
     if request.method == 'POST':
         product.sku = request.POST.get('sku')
         product.name = request.POST.get('name')
         product.category = request.POST.get('category')
         supplier_id = request.POST.get('supplier')
         product.supplier = Supplier.objects.get(id=supplier_id) if supplier_id else None
-        product.quantity = int(request.POST.get('quantity'))
         product.reorder_level = int(request.POST.get('reorder_level'))
         product.unit_price = float(request.POST.get('unit_price'))
-        product.save()
+
+        quantity = int(request.POST.get('quantity'))
+        if quantity < 0:
+            return render(request, 'myapp/edit_product.html', {
+                'product': product,
+                'suppliers': suppliers,
+                'error': "Quantity can't be negative.",
+            })
+
+        # quantity goes in as a change against what the form showed, so a
+        # stock movement that lands while the form is open isn't overwritten
+        shown_quantity = int(request.POST.get('shown_quantity', product.quantity))
+        change = quantity - shown_quantity
+        try:
+            with transaction.atomic():
+                product.save(update_fields=PRODUCT_FORM_FIELDS)
+                if change:
+                    adjust_stock(product.pk, change)
+        except InsufficientStock:
+            return render(request, 'myapp/edit_product.html', {
+                'product': product,
+                'suppliers': suppliers,
+                'error': "Stock changed while you were editing, quantity can't go below zero.",
+            })
         return redirect('inventory_list')
 
-    suppliers = Supplier.objects.all()
     return render(request, 'myapp/edit_product.html', {'product': product, 'suppliers': suppliers})
 
 
+# everything edit_product saves except quantity (see stock.adjust_stock)
+PRODUCT_FORM_FIELDS = ["sku", "name", "category", "supplier", "reorder_level", "unit_price", "last_updated"]
+
 
 def delete_product(request, pk):
     product = get_object_or_404(Product, pk=pk)
@@ -152,37 +231,49 @@ def delete_product(request, pk):
 
 
 def supplier_list(request):
-    # get all products
-    supplier_list = list(Supplier.objects.all())
     # SORT DROPDOWN
     sort_field = request.GET.get("sort", "name")
-    sorted_products = merge_sort(supplier_list, sort_field)
-
     # SEARCH DROPDOWN
     selected_field = request.GET.get("search_field", "name")
-
     # SEARCH TEXT
     search_text = request.GET.get("search_query", "").strip()
 
+    context = {
+        "selected_field": selected_field,
+        "sort_field": sort_field,
+        "search_query": search_text,
+    }
+
+    if settings.INVENTORY_QUERY_MODE == "python":
+        context["suppliers"] = python_supplier_list(sort_field, selected_field, search_text)
+    else:
+        page = keyset_page(
+            supplier_queryset(sort_field, selected_field, search_text),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            page_size=settings.INVENTORY_PAGE_SIZE,
+        )
+        context["suppliers"] = page.rows
+        context.update(page_links(request, page))
+
+    return render(request, "myapp/supplier_list.html", context)
+
+
+def python_supplier_list(sort_field, selected_field, search_text):
+    # fallback: load everything and sort/search in python
+    supplier_list = list(Supplier.objects.all())
+
     # if no search, show sorted list 
     if search_text == "":
-        return render(request, "myapp/supplier_list.html", {
-            "suppliers": sorted_products,
-            "selected_field": selected_field,
-            "sort_field": sort_field
-        })
-    
-    # do merge sort first then do binary search
-    sorted_for_search = merge_sort(supplier_list, selected_field)
-    target = search_text.lower()
-    results = binary_search(sorted_for_search, target, selected_field)
+        with metrics.section("sort"):
+            return key_sort(supplier_list, sort_field)
 
-
-    return render(request, "myapp/supplier_list.html", {
-        "suppliers": results,
-        "selected_field": selected_field,
-        "sort_field": sort_field
-    })
+    # sort by the search field first then do binary search
+    with metrics.section("sort"):
+        sorted_for_search = key_sort(supplier_list, selected_field)
+    target = search_text.lower()
+    with metrics.section("search"):
+        return binary_search(sorted_for_search, target, selected_field)
 
 
 def add_supplier(request):
@@ -205,31 +296,117 @@ def add_supplier(request):
     return render(request, 'myapp/add_supplier.html')
 
 def get_reorder_items():
-    products = Product.objects.all()
-    reorder_items = []
-
-    z = 1.65
-    sigma_demand = 2
-    lead_time = 5
-    avg_daily = 5
-
-    for p in products:
-        ss = safety_stock(z, sigma_demand, lead_time)
-        rp = reorder_point(z, sigma_demand, lead_time, avg_daily)
-
-        if p.quantity <= rp:
-            reorder_items.append({
-                "product": p,
-                "quantity": p.quantity,
-                "safety_stock": round(ss, 2),
-                "reorder_point": round(rp, 2),
-            })
-
-    return reorder_items
+    # precomputed by reorder.refresh_alert whenever stock changes
+    return [
+        {
+            "product": alert.product,
+            "quantity": alert.quantity,
+            "safety_stock": alert.safety_stock,
+            "reorder_point": alert.reorder_point,
+        }
+        for alert in reorder_alerts()
+    ]
 
 def reorder_suggestions(request):
+    if request.GET.get("stream"):
+        return reports.streaming_page(
+            request, "myapp/reorder_suggestions.html", {},
+            reorder_alerts(), "myapp/partials/reorder_rows.html",
+        )
+
     reorder_items = get_reorder_items()
 
     return render(request, "myapp/reorder_suggestions.html", {
         "reorder_items": reorder_items
     })
+
+
+def reorder_report(request):
+    # print version of the reorder page, streamed
+    return reports.streaming_page(
+        request, "myapp/reports/reorder_report.html", {"generated_at": timezone.now()},
+        reorder_alerts().select_related("product__supplier"),
+        "myapp/partials/reorder_rows.html", {"report": True},
+    )
+
+
+def purchase_orders(request):
+    # drafts are written by the purchase_orders job, the page only reads them
+    if request.method == "POST":
+        jobs.enqueue(Job.PURCHASE_ORDERS)
+        return redirect('purchase_orders')
+
+    orders = (
+        PurchaseOrder.objects
+        .filter(status=PurchaseOrder.DRAFT)
+        .select_related("supplier")
+        .annotate(line_count=Count("lines"))
+        .order_by("supplier__name", "id")
+    )
+    last_job = Job.objects.filter(kind=Job.PURCHASE_ORDERS).order_by("-id").first()
+    return render(request, "myapp/purchase_orders.html", {"orders": orders, "last_job": last_job})
+
+
+def import_catalog(request):
+    context = {"kind": request.POST.get("kind", "products")}
+    if request.method == "POST":
+        uploaded = request.FILES.get("file")
+        if uploaded is None or context["kind"] not in catalog_io.IMPORTERS:
+            context["error"] = "Choose what to import and a file."
+        else:
+            try:
+                result = catalog_io.import_upload(uploaded, context["kind"])
+            except (catalog_io.RowError, UnicodeDecodeError) as e:
+                context["error"] = f"Could not read {uploaded.name}: {e}"
+            else:
+                context["result"] = result
+                context["errors"] = result.errors[:100]
+    return render(request, "myapp/import_catalog.html", context)
+
+
+def export_catalog(request, kind):
+    fmt = request.GET.get("format", "csv")
+    if fmt == "json":
+        rows, content_type = catalog_io.export_json(kind), "application/json"
+    else:
+        fmt, rows, content_type = "csv", catalog_io.export_csv(kind), "text/csv"
+    response = StreamingHttpResponse(rows, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
+@csrf_exempt
+@require_POST
+@api.token_required
+def stock_movements(request):
+    """
+    Apply a batch of stock movements (scanners, ERP sync), all or nothing.
+
+    POST JSON: {"movements": [{"sku": "HB-M8", "quantity": -3, "kind": "issue"}, ...]}
+    "product_id" can be sent instead of "sku". kind defaults to "adjustment".
+    Responds with the new quantities, 409 if any product would go negative.
+    Needs the API token, see api.token_required.
+    """
+    try:
+        rows = json.loads(request.body)["movements"]
+        skus = {row["sku"] for row in rows if "product_id" not in row}
+        ids = dict(Product.objects.filter(sku__in=skus).values_list("sku", "id"))
+        movements = [
+            (
+                int(row["product_id"]) if "product_id" in row else ids[row["sku"]],
+                int(row["quantity"]),
+                row.get("kind", StockMovement.ADJUSTMENT),
+            )
+            for row in rows
+        ]
+    except (ValueError, KeyError, TypeError) as e:
+        return JsonResponse({"error": f"bad movement data: {e}"}, status=400)
+
+    try:
+        quantities = apply_movements(movements)
+    except InsufficientStock as e:
+        return JsonResponse({"error": str(e), "product_id": e.product_id}, status=409)
+    except StockError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"applied": len(movements), "quantities": quantities})
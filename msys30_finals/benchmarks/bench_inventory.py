@@ -0,0 +1,262 @@
+"""
+Inventory benchmark suite: the algorithm functions and the full request path.
+
+For each size it seeds a throwaway test database (never db.sqlite3) with
+application.seed, then measures:
+
+- algorithms: merge_sort, key_sort, binary_search on rows already in
+  memory, and get_reorder_items
+- requests: the dashboard, list pages, reorder page and API through the
+  Django test client. The list pages also run with ROW_CACHE_TIMEOUT=0
+  to show what the row cache saves
+
+Every case records median/min latency, query count and peak Python memory
+(tracemalloc, measured on a separate run so it doesn't skew the timings).
+Results are written as JSON; --compare prints the change against an
+earlier run and flags cases that got slower.
+
+Run from the project folder (next to manage.py):
+
+    python benchmarks/bench_inventory.py
+    python benchmarks/bench_inventory.py --sizes 1000,10000 --output before.json
+    python benchmarks/bench_inventory.py --sizes 1000,10000 --compare before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "msys30_finals.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import caches  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+from application import views  # noqa: E402
+from application.algorithms import binary_search, key_sort, merge_sort  # noqa: E402
+from application.queries import product_list_queryset  # noqa: E402
+from application.seed import clear_inventory, seed_inventory  # noqa: E402
+
+# a case this much slower than in the --compare file is flagged
+REGRESSION_RATIO = 1.2
+
+
+def counting(queries):
+    def wrapper(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Run fn once to warm up, `repeat` times for timing, once counting
+    queries and once under tracemalloc. setup() runs before
+    every call, untimed.
+    """
+    def call():
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    call()
+    times = [call() for _ in range(repeat)]
+
+    # counted with a wrapper, not connection.queries: every test client
+    # request resets the query log
+    queries = []
+    if setup:
+        setup()
+    with connection.execute_wrapper(counting(queries)):
+        fn()
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "min_ms": round(min(times) * 1000, 3),
+        "queries": len(queries),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def algorithm_cases():
+    products = list(product_list_queryset())
+    by_name = key_sort(products, "name")
+    target = by_name[len(by_name) // 2].name.lower()
+
+    return {
+        "merge_sort name": lambda: merge_sort(products, "name"),
+        "merge_sort price": lambda: merge_sort(products, "price"),
+        "key_sort name": lambda: key_sort(products, "name"),
+        "key_sort quantity": lambda: key_sort(products, "quantity"),
+        "binary_search name": lambda: binary_search(by_name, target, "name"),
+        "get_reorder_items": views.get_reorder_items,
+    }
+
+
+def request_cases(client):
+    def get(path, params=None):
+        def run():
+            response = client.get(path, params or {})
+            assert response.status_code == 200, (path, response.status_code)
+            # streamed responses only do their work when read
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return run
+
+    # a cursor a few pages in, so the deep page isn't just page 1
+    next_url = client.get("/inventory/", {"sort": "price"}).context["next_url"]
+    for _ in range(3):
+        if not next_url:
+            break
+        next_url = client.get("/inventory/" + next_url).context["next_url"] or next_url
+
+    def python_mode(run):
+        def wrapped():
+            with override_settings(INVENTORY_QUERY_MODE="python"):
+                run()
+        return wrapped
+
+    def uncached_rows(run):
+        # every row rendered again, as before row_cache.py
+        def wrapped():
+            with override_settings(ROW_CACHE_TIMEOUT=0):
+                run()
+        return wrapped
+
+    return {
+        "dashboard (cached)": (get("/"), None),
+        "dashboard (cold)": (get("/"), caches[settings.DASHBOARD_CACHE_ALIAS].clear),
+        "inventory sort=name": (get("/inventory/", {"sort": "name"}), None),
+        "inventory sort=name (rows uncached)": (uncached_rows(get("/inventory/", {"sort": "name"})), None),
+        "inventory sort=price page 5": (get("/inventory/" + (next_url or "")), None),
+        "inventory search name": (get("/inventory/", {"search_field": "name",
+                                                      "search_query": "hex bo"}), None),
+        "inventory python mode": (python_mode(get("/inventory/", {"sort": "name"})), None),
+        "suppliers sort=name": (get("/suppliers/", {"sort": "name"}), None),
+        "suppliers sort=name (rows uncached)": (uncached_rows(get("/suppliers/", {"sort": "name"})), None),
+        "reorder suggestions": (get("/reorder/"), None),
+        "api products 500 rows": (get("/api/products/", {"fields": "sku,quantity",
+                                                         "page_size": 500}), None),
+    }
+
+
+def run_size(size, suppliers, repeat, seed, skip_python_above):
+    clear_inventory()
+    start = time.perf_counter()
+    seed_inventory(suppliers, size, seed=seed)
+    seed_seconds = time.perf_counter() - start
+    caches[settings.DASHBOARD_CACHE_ALIAS].clear()
+    print(f"\n{size} products, {suppliers} suppliers (seeded in {seed_seconds:.1f}s)")
+
+    results = []
+    client = Client()
+    groups = [("algorithms", {name: (fn, None) for name, fn in algorithm_cases().items()}),
+              ("requests", request_cases(client))]
+    for group, cases in groups:
+        for name, (fn, setup) in cases.items():
+            slow = "merge_sort" in name or "python mode" in name
+            if slow and size > skip_python_above:
+                continue
+            result = {"size": size, "group": group, "name": name,
+                      **measure(fn, repeat, setup)}
+            results.append(result)
+            print(f"  {name:<38} {result['median_ms']:>10.2f} ms {result['queries']:>4} queries "
+                  f"{result['peak_kib']:>10.0f} KiB")
+    return results
+
+
+def compare(results, path):
+    with open(path) as f:
+        previous = {(r["size"], r["name"]): r for r in json.load(f)["results"]}
+
+    print(f"\nCompared with {path}:")
+    regressions = 0
+    for r in results:
+        old = previous.get((r["size"], r["name"]))
+        if not old or not old["median_ms"]:
+            continue
+        ratio = r["median_ms"] / old["median_ms"]
+        flag = ""
+        if ratio > REGRESSION_RATIO:
+            flag = "  SLOWER"
+            regressions += 1
+        if r["queries"] != old["queries"]:
+            flag += f"  queries {old['queries']} -> {r['queries']}"
+        print(f"  {r['size']:>7} {r['name']:<38} {old['median_ms']:>10.2f} -> "
+              f"{r['median_ms']:>10.2f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--suppliers-per", type=int, default=100,
+                        help="one supplier per this many products (at least 10)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=30)
+    parser.add_argument("--skip-python-above", type=int, default=10000,
+                        help="skip merge_sort and python-mode lists above this many rows")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        results = []
+        for size in [int(s) for s in args.sizes.split(",")]:
+            suppliers = max(10, size // args.suppliers_per)
+            results += run_size(size, suppliers, args.repeat, args.seed, args.skip_python_above)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "database": connection.vendor,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            print(f"{regressions} case(s) more than {REGRESSION_RATIO}x slower")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Sort engine benchmark.
+
+Compares the old merge sort (field lookup on every comparison) with the
+key-cached merge_sort and key_sort from application.algorithms.
+
+Run from the project folder (next to manage.py):
+
+    python benchmarks/bench_sort.py
+    python benchmarks/bench_sort.py --sizes 10000,100000 --fields name,quantity
+
+No database is needed, rows are plain objects with the Product attributes.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from application.algorithms import merge_sort, key_sort  # noqa: E402
+
+
+def legacy_get_field_value(obj, field):
+    # copy of the original lookup, rebuilt for every call
+    field_map = {
+        "sku": lambda o: o.sku.lower(),
+        "name": lambda o: o.name.lower(),
+        "category": lambda o: o.category.lower(),
+        "supplier": lambda o: o.supplier.name.lower(),
+        "quantity": lambda o: o.quantity,
+        "reorder": lambda o: o.reorder_level,
+        "price": lambda o: o.unit_price,
+        "contact_person": lambda o: o.contact_person.lower()
+    }
+    if field in field_map:
+        return field_map[field](obj)
+    return ""
+
+
+def legacy_merge_sort(items, field):
+    if len(items) <= 1:
+        return items
+    midpoint = len(items) // 2
+    left = legacy_merge_sort(items[:midpoint], field)
+    right = legacy_merge_sort(items[midpoint:], field)
+
+    merged = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if legacy_get_field_value(left[i], field) <= legacy_get_field_value(right[j], field):
+            merged.append(left[i])
+            i += 1
+        else:
+            merged.append(right[j])
+            j += 1
+    merged.extend(left[i:])
+    merged.extend(right[j:])
+    return merged
+
+
+def make_rows(n, seed=30):
+    rng = random.Random(seed)
+    suppliers = [SimpleNamespace(name=f"Supplier {i:03d}") for i in range(50)]
+    categories = ["Fasteners", "Tools", "Paint", "Plumbing", "Electrical", "Lumber"]
+    return [
+        SimpleNamespace(
+            sku=f"SKU{i:07d}",
+            name=f"Item {rng.randrange(n):07d}",
+            category=rng.choice(categories),
+            supplier=rng.choice(suppliers),
+            quantity=rng.randrange(500),
+            reorder_level=rng.randrange(50),
+            unit_price=Decimal(rng.randrange(100, 100000)) / 100,
+        )
+        for i in range(n)
+    ]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--fields", default="name,quantity,price")
+    parser.add_argument("--skip-legacy-above", type=int, default=100000,
+                        help="don't run the old merge sort above this many rows")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    fields = args.fields.split(",")
+
+    print(f"{'rows':>9} {'field':>9} {'legacy':>9} {'merge':>9} {'key':>9} {'speedup':>8}")
+    for n in sizes:
+        rows = make_rows(n)
+        for field in fields:
+            merge_t, merged = timed(merge_sort, rows, field)
+            key_t, keyed = timed(key_sort, rows, field)
+            assert merged == keyed, "merge_sort and key_sort disagree"
+
+            if n <= args.skip_legacy_above:
+                legacy_t, legacy = timed(legacy_merge_sort, rows, field)
+                assert legacy == merged, "legacy and new merge_sort disagree"
+                legacy_s = f"{legacy_t:9.3f}"
+                speedup = f"{legacy_t / key_t:7.1f}x"
+            else:
+                legacy_s = f"{'-':>9}"
+                speedup = f"{'-':>8}"
+
+            print(f"{n:>9} {field:>9} {legacy_s} {merge_t:9.3f} {key_t:9.3f} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
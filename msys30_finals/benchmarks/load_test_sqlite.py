@@ -0,0 +1,136 @@
+"""
+SQLite read/write load test: default settings vs the production profile.
+
+Starts reader and writer processes against a scratch copy of the product
+table for a few seconds, once with SQLite defaults (rollback journal,
+synchronous=FULL, new connection per operation, no busy timeout) and once
+with the settings.SQLITE_PRAGMAS profile (WAL, synchronous=NORMAL, reused
+connections, busy timeout). Prints reads/s, writes/s and "database is
+locked" errors for each.
+
+    python benchmarks/load_test_sqlite.py
+    python benchmarks/load_test_sqlite.py --readers 8 --writers 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "msys30_finals.settings")
+
+from django.conf import settings  # noqa: E402
+
+PROFILES = {
+    "default": {
+        "reuse_connection": False,
+        "timeout": 0.0,
+        "pragmas": {},
+    },
+    # what the app runs with, so the two can't drift apart
+    "tuned": {
+        "reuse_connection": True,
+        "timeout": settings.SQLITE_BUSY_TIMEOUT,
+        "pragmas": settings.SQLITE_PRAGMAS,
+    },
+}
+
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile["timeout"], isolation_level=None)
+    for name, value in profile["pragmas"].items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def setup(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute(
+        "CREATE TABLE product (id INTEGER PRIMARY KEY, sku TEXT UNIQUE, name TEXT, "
+        "category TEXT, quantity INTEGER CHECK (quantity >= 0), unit_price REAL)"
+    )
+    conn.execute("CREATE INDEX product_name ON product (lower(name), id)")
+    conn.executemany(
+        "INSERT INTO product (sku, name, category, quantity, unit_price) VALUES (?, ?, ?, ?, ?)",
+        ((f"SKU{i:07d}", f"Item {i}", f"Cat{i % 12}", 1000000, 9.99) for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def worker(args):
+    path, profile_name, role, seconds, rows, seed = args
+    profile = PROFILES[profile_name]
+    rng = random.Random(seed)
+    done = errors = 0
+    conn = connect(path, profile) if profile["reuse_connection"] else None
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        c = conn or connect(path, profile)
+        try:
+            if role == "read":
+                # one inventory page
+                start = f"item {rng.randrange(rows)}"
+                c.execute(
+                    "SELECT id, sku, name, quantity FROM product WHERE lower(name) >= ? "
+                    "ORDER BY lower(name), id LIMIT 50", (start,)
+                ).fetchall()
+            else:
+                # one stock movement
+                c.execute("BEGIN IMMEDIATE")
+                c.execute("UPDATE product SET quantity = quantity - 1 WHERE id = ?",
+                          (rng.randrange(1, rows + 1),))
+                c.execute("COMMIT")
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if c.in_transaction:
+                c.execute("ROLLBACK")
+        finally:
+            if conn is None:
+                c.close()
+    return role, done, errors
+
+
+def run(profile_name, readers, writers, seconds, rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "load.sqlite3")
+        setup(path, rows)
+        jobs = ([(path, profile_name, "read", seconds, rows, i) for i in range(readers)]
+                + [(path, profile_name, "write", seconds, rows, 1000 + i) for i in range(writers)])
+        with multiprocessing.Pool(len(jobs)) as pool:
+            results = pool.map(worker, jobs)
+
+    totals = {"read": [0, 0], "write": [0, 0]}
+    for role, done, errors in results:
+        totals[role][0] += done
+        totals[role][1] += errors
+    return {
+        "reads_per_s": totals["read"][0] / seconds,
+        "writes_per_s": totals["write"][0] / seconds,
+        "locked_errors": totals["read"][1] + totals["write"][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s, {args.rows} rows")
+    print(f"{'profile':>8} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for name in PROFILES:
+        r = run(name, args.readers, args.writers, args.seconds, args.rows)
+        print(f"{name:>8} {r['reads_per_s']:10.0f} {r['writes_per_s']:10.0f} {r['locked_errors']:8d}")
+
+
+if __name__ == "__main__":
+    main()
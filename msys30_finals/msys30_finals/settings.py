@@ -37,16 +37,19 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    # django.contrib.staticfiles, minus the unused bootstrap files
+    'application.static_pipeline.StaticFiles',
     'application',
 ]
 
 MIDDLEWARE = [
+    'application.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'application.middleware.ReadReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +58,8 @@ ROOT_URLCONF = 'msys30_finals.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render time in the request metrics
+        'BACKEND': 'application.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,13 +78,159 @@ WSGI_APPLICATION = 'msys30_finals.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# MSYS_DB_PROFILE picks the database:
+#   sqlite   (default) the db.sqlite3 file, tuned by SQLITE_PRAGMAS below
+#   postgres PostgreSQL from the PG* environment variables
+DB_PROFILE = os.environ.get('MSYS_DB_PROFILE', 'sqlite')
+
+# seconds a connection is reused across requests (0 = reconnect every request)
+CONN_MAX_AGE = int(os.environ.get('MSYS_CONN_MAX_AGE', '60'))
+
+# how long a write waits for the SQLite lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('MSYS_SQLITE_BUSY_TIMEOUT', '5'))
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PGDATABASE', 'msys30'),
+            'USER': os.environ.get('PGUSER', 'msys30'),
+            'PASSWORD': os.environ.get('PGPASSWORD', ''),
+            'HOST': os.environ.get('PGHOST', 'localhost'),
+            'PORT': os.environ.get('PGPORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT,
+                # take the write lock when the transaction starts instead of
+                # failing halfway through when a reader upgrades to a writer
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# MSYS_READ_REPLICA=1 adds a "replica" database for the read-heavy pages
+# (marked in application/urls.py, routed by application/db_router.py):
+#   sqlite   a copy of db.sqlite3 at MSYS_REPLICA_PATH, refreshed from it with
+#            `manage.py refresh_replica` (run it once before starting)
+#   postgres a streaming replica at PGREPLICAHOST
+# Pages read from it may lag by the refresh interval / replication delay.
+# A browser that POSTs reads from default for REPLICA_STICKY_SECONDS after,
+# so it sees its own writes. Tests use the default test database (MIRROR).
+READ_REPLICA = os.environ.get('MSYS_READ_REPLICA', '0') == '1'
+REPLICA_STICKY_SECONDS = int(os.environ.get('MSYS_REPLICA_STICKY_SECONDS', '300'))
+
+if READ_REPLICA:
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DB_PROFILE == 'postgres':
+        DATABASES['replica']['HOST'] = os.environ.get('PGREPLICAHOST', DATABASES['default']['HOST'])
+    else:
+        DATABASES['replica']['NAME'] = os.environ.get('MSYS_REPLICA_PATH', BASE_DIR / 'db-replica.sqlite3')
+
+DATABASE_ROUTERS = ['application.db_router.ReadReplicaRouter']
+
+# Applied to every new SQLite connection (signals.tune_sqlite).
+# WAL lets readers and one writer work at the same time, NORMAL sync is safe
+# with WAL and skips an fsync per commit. journal_mode is stored in the
+# database file: the first connection switches the committed db.sqlite3 to
+# WAL, a header change git shows as modified (`git checkout db.sqlite3`
+# undoes it, don't commit it), and SQLite keeps db.sqlite3-wal/-shm next to
+# it while connected (gitignored). benchmarks/load_test_sqlite.py reads this
+# dict too.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(SQLITE_BUSY_TIMEOUT * 1000),
+    'cache_size': -20000,          # KiB, ~20 MB page cache per connection
+    'mmap_size': 268435456,        # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+
+# How the inventory/supplier lists sort and search:
+# "db" = indexed ORDER BY / lookups (application/queries.py)
+# "python" = fallback, load the table and use application/algorithms.py
+INVENTORY_QUERY_MODE = os.environ.get("INVENTORY_QUERY_MODE", "db")
+
+# Rows per page on the inventory/supplier lists (db mode only)
+INVENTORY_PAGE_SIZE = 50
+
+# Serve the dashboard, inventory/supplier lists and reorder page from
+# application/async_views.py. Turn on when running under an ASGI server
+# (uvicorn msys30_finals.asgi:application), under WSGI every async view
+# pays for its own event loop.
+ASYNC_VIEWS = os.environ.get("MSYS_ASYNC_VIEWS", "0") == "1"
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process, point "default" at a shared backend (redis,
+# memcached) when running several workers so invalidations reach all of them.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'msys30-default',
     }
 }
 
+# Dashboard totals/category summary/reorder count are invalidated on writes,
+# the timeout (seconds) only bounds staleness from writes in other processes
+DASHBOARD_CACHE_ALIAS = 'default'
+DASHBOARD_CACHE_TIMEOUT = 600
+
+# Rendered inventory/supplier table rows (application/row_cache.py), keyed on
+# the row's last_updated so edits never need invalidating. 0 turns it off.
+ROW_CACHE_ALIAS = 'default'
+ROW_CACHE_TIMEOUT = int(os.environ.get("MSYS_ROW_CACHE_TIMEOUT", "86400"))
+
+
+# Request performance metrics (application/middleware.py). Fraction of
+# requests timed, 0 turns the middleware off entirely. /metrics (Prometheus
+# text format) only answers INTERNAL_IPS.
+PERF_SAMPLE_RATE = float(os.environ.get("MSYS_PERF_SAMPLE_RATE", "0"))
+INTERNAL_IPS = os.environ.get("MSYS_INTERNAL_IPS", "127.0.0.1").split(",")
+
+
+# Writes through the JSON API (application/api.py) and POST /stock/movements/
+# must send "Authorization: Bearer <MSYS_API_TOKEN>". Empty: those writes
+# are refused and the API is read-only.
+API_TOKEN = os.environ.get("MSYS_API_TOKEN", "")
+
+
+# Background jobs (application/jobs.py, manage.py run_jobs)
+JOB_WORKERS = int(os.environ.get("MSYS_JOB_WORKERS", "2"))
+# a running job whose worker hasn't touched it for this many seconds is
+# assumed lost and requeued, checked every JOB_REQUEUE_EVERY seconds
+JOB_STALE_AFTER = 600
+JOB_REQUEUE_EVERY = 60
+# claims before a job that keeps losing its worker is failed instead
+JOB_MAX_ATTEMPTS = 3
+# local time the worker schedules the nightly rollup for
+NIGHTLY_ROLLUP_TIME = os.environ.get("MSYS_NIGHTLY_ROLLUP_TIME", "02:00")
+
+
+# Reorder planning (application/reorder.py). Products with enough demand
+# history get the reorder point simulated by application/simulation.py in
+# the nightly rollup, the rest use the z-score formula.
+REORDER_SERVICE_Z = float(os.environ.get("MSYS_REORDER_SERVICE_Z", "1.65"))  # ≈95% service level
+# share of demand the simulated reorder point should serve straight from stock
+REORDER_FILL_RATE = float(os.environ.get("MSYS_REORDER_FILL_RATE", "0.95"))
+# demand/lead-time scenarios per product, and the processes running them
+# (split between the run_jobs processes when the nightly rollup runs it)
+SIMULATION_SCENARIOS = int(os.environ.get("MSYS_SIMULATION_SCENARIOS", "10000"))
+SIMULATION_WORKERS = int(os.environ.get("MSYS_SIMULATION_WORKERS", str(os.cpu_count() or 1)))
+# supplier lead times vary by this coefficient of variation around lead_time_days
+LEAD_TIME_CV = 0.25
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,6 +269,17 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+# Serve STATIC_ROOT from the app with hashed names, gzip/brotli variants and
+# immutable cache headers (application/static_pipeline.py). Run
+# `manage.py collectstatic` first, and `runserver --nostatic` so the dev
+# server's own static handler doesn't answer instead. brotli is optional.
+STATIC_PIPELINE = os.environ.get("MSYS_STATIC_PIPELINE", "0") == "1"
+if STATIC_PIPELINE:
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "application.static_pipeline.CompressedManifestStorage"},
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -14,11 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include 
+from django.urls import path, include, re_path
+
+from application import static_pipeline
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('application.urls')),
 ]
+
+if settings.STATIC_PIPELINE:
+    urlpatterns.append(
+        re_path(rf"^{re.escape(settings.STATIC_URL.lstrip('/'))}(?P<path>.*)$", static_pipeline.serve)
+    )